@@ -9,8 +9,9 @@ from .context import Context
 from .broadcast import Broadcast
 from .accumulators import Accumulator, AccumulatorParam
 from .stat_counter import StatCounter
-from .cache_manager import CacheManager, TimedCacheManager
+from .cache_manager import CacheManager, LFUCacheManager, LRUCacheManager, TimedCacheManager
 from .storagelevel import StorageLevel
+from .status import StatusTracker
 
 from . import fileio
 from . import streaming
@@ -22,9 +23,12 @@ __all__ = [
     'Broadcast',
     'StatCounter',
     'CacheManager',
+    'LFUCacheManager',
+    'LRUCacheManager',
     'Row',
     'TimedCacheManager',
     'StorageLevel',
+    'StatusTracker',
     'exceptions',
     'fileio',
     'streaming',
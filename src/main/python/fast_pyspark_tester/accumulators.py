@@ -75,9 +75,54 @@ Traceback (most recent call last):
 TypeError: No default accumulator param for type <type 'list'>
 """
 
+import itertools
+import threading
 
 __all__ = ['Accumulator', 'AccumulatorParam']
 
+_accumulator_ids = itertools.count()
+
+# accumulators deserialized by the task that runs in this thread, by id
+_task_accumulators = threading.local()
+
+
+def _get_task_accumulators():
+    if not hasattr(_task_accumulators, 'registry'):
+        _task_accumulators.registry = {}
+    return _task_accumulators.registry
+
+
+def _deserialize_accumulator(aid, zero_value, accum_param):
+    accum = Accumulator(zero_value, accum_param)
+    accum.aid = aid
+    accum._deserialized = True
+    _get_task_accumulators()[aid] = accum
+    return accum
+
+
+def reset_task_accumulators(accumulators=()):
+    """Forget the accumulators of the previous task run in this thread.
+
+    :param accumulators:
+        Deserialized accumulators that are used again by the next task.
+        They are reset to zero.
+    """
+    registry = _get_task_accumulators()
+    registry.clear()
+    for accum in accumulators:
+        accum._value = accum.accum_param.zero(accum._value)
+        registry[accum.aid] = accum
+
+
+def get_task_accumulators():
+    """Accumulators deserialized by the current task."""
+    return list(_get_task_accumulators().values())
+
+
+def get_task_accumulator_updates():
+    """Values added by the current task to its accumulators, by id."""
+    return {aid: accum._value for aid, accum in _get_task_accumulators().items()}
+
 
 class Accumulator(object):
     """
@@ -87,15 +132,27 @@ class Accumulator(object):
     The API supports accumulators for primitive data types like ``int`` and
     ``float``, users can also define accumulators for custom types by providing a custom
     ``AccumulatorParam`` object. Refer to the doctest of this module for an example.
+
+    When a task is sent to another process, the accumulator is pickled as a
+    copy that starts at zero. The values added to that copy are sent back
+    with the task result and added to the accumulator of the driver.
     """
 
     def __init__(self, value, accum_param):
         """Create a new Accumulator with a given initial value and AccumulatorParam object"""
+        self.aid = next(_accumulator_ids)
         self.accum_param = accum_param
         self._value = value
+        self._deserialized = False
+        self._lock = threading.Lock()
+
+    def __reduce__(self):
+        return _deserialize_accumulator, (self.aid, self.accum_param.zero(self._value), self.accum_param)
 
     @property
     def value(self):
+        if self._deserialized:
+            raise RuntimeError('Accumulator.value cannot be accessed inside tasks')
         return self._value
 
     @value.setter
@@ -104,7 +161,8 @@ class Accumulator(object):
 
     def add(self, term):
         """Adds a term to this accumulator's value"""
-        self._value = self.accum_param.addInPlace(self._value, term)
+        with self._lock:
+            self._value = self.accum_param.addInPlace(self._value, term)
 
     def __iadd__(self, term):
         """The += operator; adds a term to this accumulator's value"""
@@ -17,14 +17,36 @@
 # limitations under the License.
 #
 
+import os
+import pickle
+import tempfile
+import weakref
+
 __all__ = ['Broadcast']
 
+# values of the broadcast variables loaded in this process, by file path
+_loaded_values = {}
+
+
+def _remove(path):
+    _loaded_values.pop(path, None)
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
 
 class Broadcast(object):
     """
     A broadcast variable created with ``b = sc.broadcast(0)``.
     Access its value through ``b.value``.
 
+    The value is not pickled with the tasks that use it. The first time
+    the broadcast variable is pickled, its value is pickled once into a
+    temporary file and only the path of that file is sent. A worker
+    process loads the value from that file once and keeps it for the
+    following tasks.
+
     Examples:
 
     >>> from fast_pyspark_tester import Context
@@ -42,11 +64,74 @@ class Broadcast(object):
 
     def __init__(self, sc=None, value=None):
         self._value = value
+        self._path = None
+        self._remove_file = None
+        self._in_driver = True
+        self._destroyed = False
+
+    def __getstate__(self):
+        if self._destroyed:
+            raise RuntimeError('Attempted to use broadcast variable after it was destroyed')
+
+        if self._path is None:
+            fd, self._path = tempfile.mkstemp(prefix='fast_pyspark_tester_broadcast_')
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(self._value, f, pickle.HIGHEST_PROTOCOL)
+            self._remove_file = weakref.finalize(self, _remove, self._path)
+
+        return {'_path': self._path}
+
+    def __setstate__(self, state):
+        self._value = None
+        self._path = state['_path']
+        self._remove_file = None
+        self._in_driver = False
+        self._destroyed = False
 
     @property
     def value(self):
         """Returs the broadcasted value."""
-        return self._value
+        if self._destroyed:
+            raise RuntimeError('Attempted to use broadcast variable after it was destroyed')
+
+        if self._in_driver:
+            return self._value
+
+        if self._path not in _loaded_values:
+            with open(self._path, 'rb') as f:
+                _loaded_values[self._path] = pickle.load(f)
+        return _loaded_values[self._path]
+
+    def unpersist(self, blocking=False):
+        """Delete the file of the value.
+
+        The value is written again when the broadcast variable is used in
+        another job. Worker processes keep the values they loaded until
+        they end.
+
+        :param blocking: Not used.
+        """
+        if not self._in_driver:
+            raise RuntimeError('Broadcast can only be unpersisted in driver')
+
+        if self._remove_file is not None:
+            self._remove_file()
+        self._path = None
+        self._remove_file = None
+
+    def destroy(self, blocking=False):
+        """Delete the value and its file.
+
+        The broadcast variable cannot be used after that.
+
+        :param blocking: Not used.
+        """
+        if not self._in_driver:
+            raise RuntimeError('Broadcast can only be destroyed in driver')
+
+        self.unpersist()
+        self._value = None
+        self._destroyed = True
 
 
 if __name__ == '__main__':
@@ -2,43 +2,153 @@
 
 from __future__ import division, absolute_import, print_function, unicode_literals
 
+import collections
+import functools
 import logging
+import os
 import pickle
+import shutil
+import sys
+import tempfile
+import threading
 import time
+import weakref
 import zlib
 
 log = logging.getLogger(__name__)
 
+_ATOMIC_TYPES = (type(None), bool, int, float, complex, str, bytes, bytearray)
+
+
+def _deep_size(obj, seen):
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, _ATOMIC_TYPES):
+        return size
+    if isinstance(obj, dict):
+        size += sum(_deep_size(k, seen) + _deep_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(_deep_size(x, seen) for x in obj)
+    if hasattr(obj, '__dict__'):
+        size += _deep_size(vars(obj), seen)
+    return size
+
+
+def estimate_size(obj, sample_size=100):
+    """estimate the memory used by an object in bytes
+
+    The size of the elements of lists longer than ``sample_size`` is
+    extrapolated from the size of ``sample_size`` evenly spaced elements.
+    Objects shared between elements are only counted once.
+
+    :param obj: The object to measure.
+    :param int sample_size: Maximum number of list elements to measure.
+    :rtype: int
+    """
+    if not isinstance(obj, list) or len(obj) <= sample_size:
+        return _deep_size(obj, set())
+
+    sample = obj[:: len(obj) // sample_size]
+    seen = set()
+    sample_bytes = sum(_deep_size(x, seen) for x in sample)
+    return sys.getsizeof(obj) + int(sample_bytes * len(obj) / len(sample))
+
+
+def _is_in_memory(entry):
+    return entry['mem_obj'] is not None or entry['mem_ser'] is not None
+
+
+def _synchronized(method):
+    """run the method while holding the lock of the cache manager"""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
 
 class CacheManager(object):
     """cache manager
 
-    When mem_obj or disk_location are None, it means the object does not
-    exist in memory or on disk. The other variables might be set though.
+    When mem_obj, mem_ser or disk_location are None, it means the object
+    does not exist in memory, serialized in memory or on disk. The other
+    variables might be set though.
+
+    Objects with a serialized ``storageLevel`` (like
+    ``MEMORY_ONLY_SER``) are kept in memory as serialized bytes and only
+    deserialized when they are read.
+
+    The estimated size of the objects in memory is kept below ``max_mem``.
+    When a new object exceeds it, the oldest objects are evicted from
+    memory. Objects with a ``storageLevel`` that uses the disk (like
+    ``MEMORY_AND_DISK``) are then serialized to a file in ``spill_dir``
+    and read back when needed. The other objects are dropped and
+    recomputed. Objects with ``DISK_ONLY`` are written to disk right away.
+
+    The cache manager can be shared by tasks that run in several threads.
 
     :param max_mem: Memory in GB to keep in memory before spilling to disk.
     :param serializer: Use to serialize cache objects.
     :param deserializer: Use to deserialize cache objects.
     :param checksum: Function returning a checksum.
+    :param spill_dir:
+        Directory for the spilled objects. A temporary directory that is
+        removed at exit is created when needed if this is not given.
+    :param bool compress:
+        Compress serialized objects in memory and on disk with zlib.
     """
 
-    def __init__(self, max_mem=1.0, serializer=None, deserializer=None, checksum=None):
+    def __init__(
+        self, max_mem=1.0, serializer=None, deserializer=None, checksum=None, spill_dir=None, compress=False,
+    ):
         self.max_mem = max_mem
         self.serializer = serializer if serializer else pickle.dumps
         self.deserializer = deserializer if deserializer else pickle.loads
         self.checksum = checksum if checksum else zlib.crc32
+        self.spill_dir = spill_dir
+        self.compress = compress
 
         self.cache_obj = {}
         self.cache_cnt = 0
         self.cache_mem_size = 0.0
         self.cache_disk_size = 0.0
+        self._in_memory = {}  # idents of the entries in memory, the next one to evict first
+        self._borrowed_files = set()  # spill files of the manager that this one was cloned from
+        self._read_idents = None  # idents read from a clone, reported to the original manager by join()
+        self._lock = threading.RLock()
+
+    def __getstate__(self):
+        return {k: v for k, v in self.__dict__.items() if k != '_lock'}
 
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+
+    @property
+    def max_mem_bytes(self):
+        return self.max_mem * 1024 ** 3
+
+    @_synchronized
     def incr_cache_cnt(self):
         self.cache_cnt += 1
         return self.cache_cnt
 
+    def _get_spill_dir(self):
+        if self.spill_dir is None:
+            self.spill_dir = tempfile.mkdtemp(prefix='fast_pyspark_tester_cache_')
+            weakref.finalize(self, shutil.rmtree, self.spill_dir, True)
+        return self.spill_dir
+
+    @_synchronized
     def add(self, ident, obj, storageLevel=None):
-        self.cache_obj[ident] = {
+        self.delete(ident)
+
+        entry = {
             'id': self.incr_cache_cnt(),
             'storageLevel': storageLevel,
             'mem_size': None,
@@ -49,21 +159,117 @@ class CacheManager(object):
             'disk_location': None,
             'checksum': None,
         }
+        self.cache_obj[ident] = entry
+
+        if storageLevel is not None and storageLevel.useDisk and not storageLevel.useMemory:
+            self._spill(ident, entry)
+        elif storageLevel is not None and storageLevel.serialized:
+            data = self._serialize(obj)
+            entry['mem_obj'] = None
+            entry['mem_ser'] = data
+            entry['mem_ser_size'] = entry['mem_size'] = len(data)
+            entry['checksum'] = self.checksum(data)
+            self._add_to_memory(ident, entry)
+            self._free_memory()
+        else:
+            entry['mem_size'] = estimate_size(obj)
+            self._add_to_memory(ident, entry)
+            self._free_memory()
         log.debug('Added {0} to cache.'.format(ident))
 
+    def _serialize(self, obj):
+        data = self.serializer(obj)
+        return zlib.compress(data) if self.compress else data
+
+    def _deserialize(self, data):
+        return self.deserializer(zlib.decompress(data) if self.compress else data)
+
+    @_synchronized
     def get(self, ident):
         if ident not in self.cache_obj:
             log.debug('{0} not found in cache.'.format(ident))
             return None
 
-        log.debug('Returning {0} from cache.'.format(ident))
-        return self.cache_obj[ident]['mem_obj']
+        entry = self.cache_obj[ident]
+        self._touch(ident)
+        if self._read_idents is not None:
+            self._read_idents.append(ident)
+        if entry['mem_obj'] is not None:
+            log.debug('Returning {0} from cache.'.format(ident))
+            return entry['mem_obj']
+
+        if entry['mem_ser'] is not None:
+            log.debug('Deserializing {0} from cache.'.format(ident))
+            data, location = entry['mem_ser'], 'memory'
+        else:
+            log.debug('Reading {0} from {1}.'.format(ident, entry['disk_location']))
+            with open(entry['disk_location'], 'rb') as f:
+                data, location = f.read(), entry['disk_location']
+        if self.checksum(data) != entry['checksum']:
+            log.warning('Checksum mismatch in {0}. Dropping {1} from cache.'.format(location, ident))
+            self.delete(ident)
+            return None
+        return self._deserialize(data)
 
+    @_synchronized
     def has(self, ident):
-        return ident in self.cache_obj and (
-            self.cache_obj[ident]['mem_obj'] is not None or self.cache_obj[ident]['disk_location'] is not None
-        )
+        if ident not in self.cache_obj:
+            return False
 
+        entry = self.cache_obj[ident]
+        return _is_in_memory(entry) or entry['disk_location'] is not None
+
+    def _touch(self, ident):
+        """record an access to an entry"""
+
+    def _add_to_memory(self, ident, entry):
+        self.cache_mem_size += entry['mem_size'] or 0
+        self._in_memory[ident] = None
+
+    def _release_memory(self, ident, entry):
+        if _is_in_memory(entry):
+            self.cache_mem_size -= entry['mem_size'] or 0
+            self._in_memory.pop(ident, None)
+        entry['mem_obj'] = None
+        entry['mem_size'] = None
+        entry['mem_ser'] = None
+        entry['mem_ser_size'] = None
+
+    def _over_budget(self):
+        return self.cache_mem_size > self.max_mem_bytes
+
+    def _next_eviction(self):
+        """ident of the next entry to evict from memory, the oldest one"""
+        return next(iter(self._in_memory), None)
+
+    def _free_memory(self):
+        while self._over_budget():
+            ident = self._next_eviction()
+            if ident is None:
+                break
+
+            entry = self.cache_obj[ident]
+            storage_level = entry['storageLevel']
+            if storage_level is not None and storage_level.useDisk:
+                log.debug('Spilling {0} to disk.'.format(ident))
+                self._spill(ident, entry)
+            else:
+                log.debug('Evicting {0} from memory.'.format(ident))
+                self.delete(ident)
+
+    def _spill(self, ident, entry):
+        data = entry['mem_ser'] if entry['mem_ser'] is not None else self._serialize(entry['mem_obj'])
+        fd, location = tempfile.mkstemp(suffix='.data', prefix='cache_', dir=self._get_spill_dir())
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+
+        self._release_memory(ident, entry)
+        entry['checksum'] = self.checksum(data)
+        entry['disk_size'] = len(data)
+        entry['disk_location'] = location
+        self.cache_disk_size += entry['disk_size']
+
+    @_synchronized
     def get_not_in(self, idents):
         """get entries not given in idents
 
@@ -72,38 +278,88 @@ class CacheManager(object):
         """
         return {i: c for i, c in self.cache_obj.items() if i not in idents}
 
-    def join(self, cache_objects):
+    @_synchronized
+    def read_idents(self):
+        """idents of the entries that were read from this clone
+
+        :rtype: list
+        """
+        return list(self._read_idents or [])
+
+    @_synchronized
+    def join(self, cache_objects, read_idents=()):
         """join
 
         :param cache_objects:
             Objects obtained with :func:`CacheManager.get_not_in()`.
+        :param read_idents:
+            Idents obtained with :func:`CacheManager.read_idents()` of a
+            clone. They count as accesses to the entries.
         """
-        self.cache_obj.update(cache_objects)
-
+        for ident in read_idents:
+            if ident in self.cache_obj:
+                self._touch(ident)
+        for ident, entry in cache_objects.items():
+            self.delete(ident)
+            self.cache_obj[ident] = entry
+            if _is_in_memory(entry):
+                self._add_to_memory(ident, entry)
+            if entry['disk_location'] is not None:
+                self.cache_disk_size += entry['disk_size'] or 0
+        self._free_memory()
+
+    @_synchronized
     def stored_idents(self):
-        return [k for k, v in self.cache_obj.items() if (v['mem_obj'] is not None or v['disk_location'] is not None)]
+        return [k for k, v in self.cache_obj.items() if _is_in_memory(v) or v['disk_location'] is not None]
+
+    def _clone(self):
+        return CacheManager(
+            self.max_mem, self.serializer, self.deserializer, self.checksum, self._get_spill_dir(), self.compress,
+        )
 
+    @_synchronized
     def clone_contains(self, filter_id):
         """Clone the cache manager and add a subset of the cache to it.
 
+        The clone spills to the same directory. It has its own copy of every
+        entry and never removes the spill files of this cache manager, so
+        that tasks in threads can evict entries from their clone.
+
         :param filter_id:
             A function returning true for ids that should be returned.
 
         :rtype: CacheManager
         """
-        cm = CacheManager(self.max_mem, self.serializer, self.deserializer, self.checksum)
-        cm.cache_obj = {i: c for i, c in self.cache_obj.items() if filter_id(i)}
+        cm = self._clone()
+        cm.cache_obj = {i: dict(c) for i, c in self.cache_obj.items() if filter_id(i)}
+        cm._borrowed_files = {c['disk_location'] for c in cm.cache_obj.values() if c['disk_location'] is not None}
+        cm._read_idents = []
+        for ident, entry in cm.cache_obj.items():
+            if _is_in_memory(entry):
+                cm._add_to_memory(ident, entry)
         return cm
 
+    @_synchronized
     def delete(self, ident):
         if ident not in self.cache_obj:
             return False
 
-        del self.cache_obj[ident]
+        entry = self.cache_obj.pop(ident)
+        self._release_memory(ident, entry)
+        if entry['disk_location'] is not None:
+            self.cache_disk_size -= entry['disk_size'] or 0
+            if entry['disk_location'] not in self._borrowed_files:
+                try:
+                    os.remove(entry['disk_location'])
+                except OSError:
+                    pass
         return True
 
+    @_synchronized
     def clear(self):
         """empties the entire cache"""
+        for ident in list(self.cache_obj):
+            self.delete(ident)
         self.cache_obj = {}
         self.cache_cnt = 0
         self.cache_mem_size = 0.0
@@ -122,41 +378,178 @@ class TimedCacheManager(CacheManager):
     :param deserializer: Use to deserialize cache objects.
     :param checksum: Function returning a checksum.
     :param float timeout: timeout duration in seconds
+    :param spill_dir: Directory for the spilled objects.
+    :param bool compress: Compress serialized objects with zlib.
     """
 
     def __init__(
-        self, max_mem=1.0, serializer=None, deserializer=None, checksum=None, timeout=600.0,
+        self,
+        max_mem=1.0,
+        serializer=None,
+        deserializer=None,
+        checksum=None,
+        timeout=600.0,
+        spill_dir=None,
+        compress=False,
     ):
-        super().__init__(max_mem, serializer, deserializer, checksum)
+        super().__init__(max_mem, serializer, deserializer, checksum, spill_dir, compress)
 
         self.timeout = timeout
-        self._time_added = []  # pairs of (id, timestamp); oldest first
+        self._time_added = collections.deque()  # triples of (ident, cache id, timestamp); oldest first
 
+    @_synchronized
     def add(self, ident, obj, storageLevel=None):
         super().add(ident, obj, storageLevel)
-        self._time_added.append((ident, time.time()))
+        self._time_added.append((ident, self.cache_cnt, time.time()))
         self.gc()
 
-    def clone_contains(self, filter_id):
-        """Clone the timed cache manager and add a subset of the cache to it.
-
-        :param filter_id:
-            A function returning true for ids that should be returned.
-
-        :rtype: TimedCacheManager
-        """
-        cm = TimedCacheManager(self.max_mem, self.serializer, self.deserializer, self.checksum, self.timeout,)
-        cm.cache_obj = {i: c for i, c in self.cache_obj.items() if filter_id(i)}
-        return cm
+    def _clone(self):
+        return TimedCacheManager(
+            self.max_mem,
+            self.serializer,
+            self.deserializer,
+            self.checksum,
+            self.timeout,
+            self._get_spill_dir(),
+            self.compress,
+        )
 
+    @_synchronized
     def gc(self):
         """Remove timed out entries."""
         log.debug('Looking for timed out cache entries.')
         threshold_time = time.time() - self.timeout
         while self._time_added:
-            ident, timestamp = self._time_added[0]
+            ident, cache_id, timestamp = self._time_added[0]
             if timestamp > threshold_time:
                 break
-            self.delete(ident)
-            del self._time_added[0]
+            self._time_added.popleft()
+            # the ident may have been added again since
+            if ident in self.cache_obj and self.cache_obj[ident]['id'] == cache_id:
+                self.delete(ident)
         log.debug('Clear done.')
+
+
+class LRUCacheManager(CacheManager):
+    """Cache manager that evicts the least recently used entries first.
+
+    Every :func:`get` of an entry makes it the most recently used one, also
+    in the clones of tasks in a pool once their result is joined.
+    Entries are evicted from memory once their estimated size is over
+    ``max_mem`` or once more than ``max_entries`` entries are in memory.
+    Like in :class:`CacheManager`, evicted entries are spilled to
+    disk when their storage level allows it.
+
+    :param max_mem: Memory in GB to keep in memory before spilling to disk.
+    :param serializer: Use to serialize cache objects.
+    :param deserializer: Use to deserialize cache objects.
+    :param checksum: Function returning a checksum.
+    :param int max_entries: Maximum number of entries in memory or None.
+    :param spill_dir: Directory for the spilled objects.
+    :param bool compress: Compress serialized objects with zlib.
+    """
+
+    def __init__(
+        self,
+        max_mem=1.0,
+        serializer=None,
+        deserializer=None,
+        checksum=None,
+        max_entries=None,
+        spill_dir=None,
+        compress=False,
+    ):
+        super().__init__(max_mem, serializer, deserializer, checksum, spill_dir, compress)
+        self.max_entries = max_entries
+
+    def _clone(self):
+        return type(self)(
+            self.max_mem,
+            self.serializer,
+            self.deserializer,
+            self.checksum,
+            self.max_entries,
+            self._get_spill_dir(),
+            self.compress,
+        )
+
+    def _touch(self, ident):
+        # dicts keep insertion order: move the entry to the end
+        if ident in self._in_memory:
+            del self._in_memory[ident]
+            self._in_memory[ident] = None
+
+    def _over_budget(self):
+        if self.max_entries is not None and len(self._in_memory) > self.max_entries:
+            return True
+        return super()._over_budget()
+
+
+class LFUCacheManager(LRUCacheManager):
+    """Cache manager that evicts the least frequently used entries first.
+
+    Counts the :func:`get` calls of every entry in memory.
+    A new entry starts with the lowest count of the other entries so that
+    it is not evicted before them. The least recently used entry is
+    evicted among the entries with the same count. The budget is the same
+    as in :class:`LRUCacheManager`.
+
+    :param max_mem: Memory in GB to keep in memory before spilling to disk.
+    :param serializer: Use to serialize cache objects.
+    :param deserializer: Use to deserialize cache objects.
+    :param checksum: Function returning a checksum.
+    :param int max_entries: Maximum number of entries in memory or None.
+    :param spill_dir: Directory for the spilled objects.
+    :param bool compress: Compress serialized objects with zlib.
+    """
+
+    def __init__(
+        self,
+        max_mem=1.0,
+        serializer=None,
+        deserializer=None,
+        checksum=None,
+        max_entries=None,
+        spill_dir=None,
+        compress=False,
+    ):
+        super().__init__(max_mem, serializer, deserializer, checksum, max_entries, spill_dir, compress)
+        self._counts = {}  # ident -> number of accesses
+        self._by_count = {}  # number of accesses -> idents, least recently used first
+        self._min_count = 0
+
+    def _add_count(self, ident, count):
+        self._counts[ident] = count
+        self._by_count.setdefault(count, {})[ident] = None
+
+    def _remove_count(self, ident):
+        count = self._counts.pop(ident)
+        idents = self._by_count[count]
+        del idents[ident]
+        if not idents:
+            del self._by_count[count]
+        return count
+
+    def _touch(self, ident):
+        if ident in self._counts:
+            self._add_count(ident, self._remove_count(ident) + 1)
+
+    def _lowest_count(self):
+        if self._min_count not in self._by_count:
+            self._min_count = min(self._by_count, default=0)
+        return self._min_count
+
+    def _add_to_memory(self, ident, entry):
+        count = self._lowest_count()
+        super()._add_to_memory(ident, entry)
+        self._add_count(ident, count)
+
+    def _release_memory(self, ident, entry):
+        super()._release_memory(ident, entry)
+        if ident in self._counts:
+            self._remove_count(ident)
+
+    def _next_eviction(self):
+        if not self._by_count:
+            return None
+        return next(iter(self._by_count[self._lowest_count()]))
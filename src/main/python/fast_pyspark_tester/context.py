@@ -2,23 +2,49 @@
 
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+import cProfile
+import functools
+import hashlib
 import itertools
+import json
 import logging
+import os
 import pickle
+import pstats
+import shutil
 import struct
+import sys
+import tempfile
+import threading
 import time
 import traceback
-from collections import defaultdict
-
-from . import accumulators
+import weakref
+from collections import OrderedDict, defaultdict, namedtuple
+from collections.abc import Sequence, Sized
+from concurrent import futures
+
+try:
+    import cloudpickle
+except ImportError:
+    cloudpickle = None
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from . import accumulators, serializers
 from .__version__ import FAST_PYSPARK_TESTER_VERSION
 from .broadcast import Broadcast
 from .cache_manager import CacheManager
 from .exceptions import ContextIsLockedException
 from .fileio import File, TextFile
-from .partition import Partition
-from .rdd import RDD, EmptyRDD
-from .task_context import TaskContext
+from .partition import Partition, SlicePartition
+from .rdd import RDD, EmptyRDD, UnionRDD
+from .scheduler import DAGScheduler, JobFuture, Stage, TaskScheduler, TaskSetManager
+from .shuffle import ShuffleManager
+from .status import StatusTracker
+from .task_context import TaskContext, in_task, running_task
 
 log = logging.getLogger(__name__)
 
@@ -28,6 +54,16 @@ def unit_fn(arg):
     return arg
 
 
+def _raise_if_cancelled(last_tasks=False):
+    future = getattr(_job_local, 'future', None)
+    if future is not None:
+        future.raise_if_cancelled(last_tasks)
+
+
+# CPU time of the current thread, of the whole process before Python 3.7
+_thread_time = getattr(time, 'thread_time', time.process_time)
+
+
 def _run_task(task_context, rdd, func, partition):
     """Run a task, aka compute a partition.
 
@@ -36,29 +72,96 @@ def _run_task(task_context, rdd, func, partition):
     :param func: a function
     :param Partition partition: partition to process
     """
-    task_context.attempt_number += 1
-
-    log.debug(
-        'Running stage {} for partition {} of {} (id: {}).'
-        ''.format(task_context.stage_id, task_context.partition_id, rdd.name(), rdd.id())
-    )
-
+    metrics = task_context.metrics
+    metrics.pid, metrics.tid, metrics.start = os.getpid(), threading.get_ident(), time.time()
+    t_start, t_cpu_start = time.perf_counter(), _thread_time()
+    profiler = _start_profiler() if task_context.profile else None
     try:
-        return func(task_context, rdd.compute(partition, task_context))
-    except Exception as e:  # pylint: disable=broad-except
-        log.warning(
-            'Attempt {} failed for partition {} of {} (id: {}): {}'
-            ''.format(task_context.attempt_number, partition.index, rdd.name(), rdd.id(), traceback.format_exc(),)
+        return _run_task_attempts(task_context, rdd, func, partition)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            task_context.profile_stats = pstats.Stats(profiler)
+            task_context.profile_stats.stream = None  # make it picklable
+        metrics.attempt = task_context.attempt_number
+        metrics.wall_time = time.perf_counter() - t_start
+        metrics.cpu_time = _thread_time() - t_cpu_start
+
+
+def _start_profiler():
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # since Python 3.12, only one profiler can be active per process
+        log.warning('Not profiling the task because another profiler is active.')
+        return None
+    return profiler
+
+
+def _run_task_attempts(task_context, rdd, func, partition):
+    while True:
+        task_context.attempt_number += 1
+        task_context.metrics.reset_counters()
+
+        log.debug(
+            'Running stage {} for partition {} of {} (id: {}).'
+            ''.format(task_context.stage_id, task_context.partition_id, rdd.name(), rdd.id())
         )
 
-        if task_context.attempt_number == task_context.max_retries:
-            log.error('Partition {} of {} failed.' ''.format(partition.index, rdd.name()))
-            if not task_context.catch_exceptions:
-                raise e
+        try:
+            with running_task():
+                result = func(task_context, rdd.compute(partition, task_context))
+            task_context.metrics.records_out = len(result) if isinstance(result, Sized) else None
+            return result
+        except Exception as e:  # pylint: disable=broad-except
+            log.warning(
+                'Attempt {} failed for partition {} of {} (id: {}): {}'
+                ''.format(task_context.attempt_number, partition.index, rdd.name(), rdd.id(), traceback.format_exc(),)
+            )
+
+            if task_context.attempt_number == task_context.max_retries:
+                log.error('Partition {} of {} failed.' ''.format(partition.index, rdd.name()))
+                if not task_context.catch_exceptions:
+                    raise e
+
+        if task_context.retry_wait:
+            time.sleep(task_context.retry_wait)
+
+
+# Reference to the serialized (func, rdd) of a job that is stored in a file.
+JobReference = namedtuple('JobReference', ['key', 'path'])
+
+# future of the asynchronous job that runs in the current thread
+_job_local = threading.local()
+
+# (func, rdd) and accumulators of the last jobs run in this process, by key
+_job_cache = OrderedDict()
+_JOB_CACHE_SIZE = 8
+
+
+def _load_job(deserializer, serialized_func_rdd):
+    if not isinstance(serialized_func_rdd, JobReference):
+        accumulators.reset_task_accumulators()
+        return deserializer(serialized_func_rdd)
+
+    key, path = serialized_func_rdd
+    if key not in _job_cache:
+        accumulators.reset_task_accumulators()
+        with open(path, 'rb') as f:
+            func_rdd = deserializer(f.read())
+        _job_cache[key] = (func_rdd, accumulators.get_task_accumulators())
+        if len(_job_cache) > _JOB_CACHE_SIZE:
+            _job_cache.popitem(last=False)
+
+    func_rdd, job_accumulators = _job_cache[key]
+    accumulators.reset_task_accumulators(job_accumulators)
+    return func_rdd
 
-    if task_context.retry_wait:
-        time.sleep(task_context.retry_wait)
-    return _run_task(task_context, rdd, func, partition)
+
+def _nbytes(data):
+    """size of serialized data or None when it was not serialized to bytes"""
+    return len(data) if isinstance(data, (bytes, bytearray)) else None
 
 
 def runJob_map(i):  # pylint: disable=too-many-locals
@@ -71,8 +174,9 @@ def runJob_map(i):  # pylint: disable=too-many-locals
         serialized_data,
     ) = i
 
+    start, t_origin = time.time(), time.perf_counter()
     t_start = time.perf_counter()
-    func, rdd = deserializer(serialized_func_rdd)
+    func, rdd = _load_job(deserializer, serialized_func_rdd)
     t_deserialize_func = time.perf_counter() - t_start
 
     t_start = time.perf_counter()
@@ -88,41 +192,111 @@ def runJob_map(i):  # pylint: disable=too-many-locals
     result = _run_task(task_context, rdd, func, partition)
     t_exec = time.perf_counter() - t_start
 
-    return data_serializer(
-        (
-            result,
-            task_context.cache_manager.get_not_in(cm_state),
-            {
-                'map_deserialize_func': t_deserialize_func,
-                'map_deserialize_task_context': t_deserialize_task_context,
-                'map_deserialize_data': t_deserialize_data,
-                'map_exec': t_exec,
-            },
-        )
+    t_start = time.perf_counter()
+    with serializers.writing_task_result():
+        result = data_serializer(result)
+    t_serialize_result = time.perf_counter() - t_start
+
+    task_context.metrics.bytes_in = _nbytes(serialized_data)
+    task_context.metrics.bytes_out = _nbytes(result)
+    task_context.metrics.phases = [
+        ('deserialize job', start, t_deserialize_func),
+        ('deserialize data', start + t_deserialize_func, t_deserialize_data),
+        ('deserialize task context', start + t_deserialize_func + t_deserialize_data, t_deserialize_task_context),
+        ('serialize result', start + t_start - t_origin, t_serialize_result),
+    ]
+    return (
+        result,
+        (task_context.cache_manager.get_not_in(cm_state), task_context.cache_manager.read_idents()),
+        accumulators.get_task_accumulator_updates(),
+        task_context.metrics,
+        (rdd.id(), task_context.profile_stats),
+        {
+            'map_deserialize_func': t_deserialize_func,
+            'map_deserialize_task_context': t_deserialize_task_context,
+            'map_deserialize_data': t_deserialize_data,
+            'map_exec': t_exec,
+            'map_serialize_result': t_serialize_result,
+        },
     )
 
 
+# attributes of the context that are not sent to the workers
+_DRIVER_ONLY = (
+    '_pool',
+    '_accumulators',
+    '_stop_executor',
+    '_scheduler',
+    '_task_scheduler',
+    '_lock',
+    '_status_tracker',
+    '_profiles',
+)
+
+
 class Context(object):
     """Context object similar to a Spark Context.
 
     The variable `_stats` contains measured timing information about data and
     function (de)serialization and workload execution to benchmark your jobs.
 
+    Jobs can be submitted from several threads at the same time. Their
+    tasks share the pool as given by ``scheduler_mode``.
+
     :param pool: An instance with a ``map(func, iterable)`` method.
+    :param str executor:
+        Instead of a ``pool``, use ``'processes'`` to run the tasks in a
+        pool of worker processes that the context manages itself until
+        :func:`Context.stop()`. The serialized function and lineage of a
+        job are then written once to a file and every worker process
+        loads them once, so that tasks only carry their partition.
+        Functions are serialized with ``cloudpickle`` when it is installed.
+    :param int workers:
+        Number of worker processes of the ``executor`` or of the ``pool``.
+        Defaults to the number of CPUs.
+    :param str scheduler_mode:
+        ``'FIFO'`` to give the pool to the earliest submitted job first or
+        ``'FAIR'`` to give it to the job that launched the fewest tasks.
     :param serializer:
         Serializer for functions. Examples are `pickle.dumps` and
         `cloudpickle.dumps`.
     :param deserializer:
         Deserializer for functions. For example `pickle.loads`.
-    :param data_serializer: Serializer for the data.
-    :param data_deserializer: Deserializer for the data.
+    :param data_serializer:
+        Serializer for the data or the name of a serializer in the registry
+        of :mod:`~fast_pyspark_tester.serializers`: ``'pickle'``,
+        ``'framed_pickle'``, ``'marshal'``, ``'msgpack'`` (when installed),
+        ``'shared_memory'`` (Python 3.8 or newer) or ``'auto'`` to select the fastest serializer
+        for every stage from a sample of its partitions.
+    :param data_deserializer:
+        Deserializer for the data. Not needed with a named ``data_serializer``.
     :param int max_retries: maximum number a partition is retried
     :param float retry_wait: seconds to wait between retries
     :param cache_manager: custom cache manager (like `TimedCacheManager`)
+    :param shuffle_manager: custom shuffle manager (like a `ShuffleManager`
+        with a given ``spill_dir``)
     :param catch_exceptions: whether to catch and silence user space exceptions
+    :param float task_timeout:
+        Seconds after which an attempt of a task in the pool is abandoned
+        and the task is submitted again, up to ``max_retries`` times.
+    :param bool speculation:
+        Submit a second attempt of tasks that run ``speculation_multiplier``
+        times longer than the median of the finished tasks of their batch
+        once ``speculation_quantile`` of them finished. The first result
+        wins.
+    :param float speculation_multiplier: See ``speculation``.
+    :param float speculation_quantile: See ``speculation``.
+    :param bool profile:
+        Profile the tasks with :mod:`cProfile`, also in the workers of the
+        pool, and merge the statistics per RDD. See
+        :func:`Context.show_profiles()`.
+
+    Timeouts and speculation need a pool with a ``submit()`` method like the
+    executors of :mod:`concurrent.futures` and do not apply to tasks that run
+    in the driver. Their counts are reported in ``_stats``.
     """
 
-    __last_rdd_id = 0
+    __rdd_ids = itertools.count(1)
 
     def __init__(
         self,
@@ -135,21 +309,66 @@ class Context(object):
         retry_wait=0.0,
         cache_manager=None,
         catch_exceptions=False,
+        shuffle_manager=None,
+        executor=None,
+        workers=None,
+        scheduler_mode='FIFO',
+        task_timeout=None,
+        speculation=False,
+        speculation_multiplier=1.5,
+        speculation_quantile=0.75,
+        profile=False,
     ):
+        self._workers = workers or os.cpu_count() or 1
+        self._job_dir = None
+        self._stop_executor = None
+        if executor is not None:
+            if pool is not None:
+                raise ValueError('Use either a pool or an executor.')
+            if executor != 'processes':
+                raise ValueError('Unknown executor {0}.'.format(executor))
+
+            pool = futures.ProcessPoolExecutor(max_workers=self._workers)
+            self._stop_executor = weakref.finalize(self, pool.shutdown)
+            self._job_dir = tempfile.mkdtemp(prefix='fast_pyspark_tester_jobs_')
+            weakref.finalize(self, shutil.rmtree, self._job_dir, True)
+            if serializer is None:
+                serializer = cloudpickle.dumps if cloudpickle is not None else pickle.dumps
+            if deserializer is None:
+                deserializer = pickle.loads
+
         if pool is None:
             pool = DummyPool()
         if serializer is None:
             serializer = unit_fn
         if deserializer is None:
             deserializer = unit_fn
+        self._auto_data_serializer = data_serializer == 'auto'
+        if self._auto_data_serializer:
+            data_serializer = 'pickle'
+        if isinstance(data_serializer, str):
+            if data_deserializer is not None:
+                raise ValueError('A named data serializer comes with its deserializer.')
+            named_serializer = serializers.get_serializer(data_serializer)
+            data_serializer, data_deserializer = named_serializer.dumps, named_serializer.loads
         if data_serializer is None:
             data_serializer = unit_fn
         if data_deserializer is None:
             data_deserializer = unit_fn
         self.max_retries = max_retries
         self.retry_wait = retry_wait
+        self.task_timeout = task_timeout
+        self.speculation = speculation
+        self.speculation_multiplier = speculation_multiplier
+        self.speculation_quantile = speculation_quantile
+        self.profile = profile
 
         self._cache_manager = cache_manager or CacheManager()
+        self._scheduler = DAGScheduler()
+        # keep a few tasks (or chunks of tasks) per worker queued in the pool
+        self._task_scheduler = TaskScheduler(4 * self._workers, scheduler_mode)
+        self._accumulators = weakref.WeakValueDictionary()
+        self._shuffle_manager = shuffle_manager or ShuffleManager(in_memory=isinstance(pool, DummyPool))
         self._catch_exceptions = catch_exceptions
         self._pool = pool
         self._serializer = serializer
@@ -158,14 +377,47 @@ class Context(object):
         self._data_deserializer = data_deserializer
         self._s3_conn = None
         self._stats = defaultdict(float)
-        self.locked = False
+        self._status_tracker = StatusTracker()
+        self._profiles = {}  # merged pstats.Stats of the tasks by RDD id
+        self._lock = threading.Lock()  # guards _stats and the accumulators
 
         self.version = FAST_PYSPARK_TESTER_VERSION
 
     def __getstate__(self):
-        r = {k: v if k not in ('_pool',) else None for k, v in self.__dict__.items()}
+        r = {k: v if k not in _DRIVER_ONLY else None for k, v in self.__dict__.items()}
         return r
 
+    def stop(self):
+        """Shut down the worker processes started for the ``executor``.
+
+        Pools given by the user are left to the user.
+        """
+        if self._stop_executor is not None:
+            self._stop_executor()
+
+    def statusTracker(self):
+        """metrics of the stages and tasks of the last jobs
+
+        :rtype: StatusTracker
+        """
+        return self._status_tracker
+
+    def dump_trace(self, path):
+        """Write the timeline of the last jobs as Chrome trace events.
+
+        The file shows the jobs and the serialization steps of the driver
+        and the tasks with their (de)serialization phases in the processes
+        and threads that ran them. Open it in ``chrome://tracing`` or
+        https://ui.perfetto.dev.
+
+        :param str path: The JSON file to write.
+
+        .. warning::
+            Not part of PySpark API.
+        """
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': self._status_tracker.traceEvents(), 'displayTimeUnit': 'ms'}, f)
+
     def broadcast(self, x):
         return Broadcast(self, x)
 
@@ -177,8 +429,6 @@ class Context(object):
         and floating-point numbers if you do not provide one. For other types,
         a custom AccumulatorParam can be used.
         """
-        if not isinstance(self._pool, DummyPool):
-            raise NotImplementedError('Accumulators are not yet compatible with multiprocessing')
         if accum_param is None:
             if isinstance(value, int):
                 accum_param = accumulators.INT_ACCUMULATOR_PARAM
@@ -188,11 +438,13 @@ class Context(object):
                 accum_param = accumulators.COMPLEX_ACCUMULATOR_PARAM
             else:
                 raise TypeError('No default accumulator param for type {0}'.format(type(value)))
-        return accumulators.Accumulator(value, accum_param)
+        accumulator = accumulators.Accumulator(value, accum_param)
+        with self._lock:
+            self._accumulators[accumulator.aid] = accumulator
+        return accumulator
 
     def newRddId(self):
-        Context.__last_rdd_id += 1
-        return Context.__last_rdd_id
+        return next(Context.__rdd_ids)
 
     @property
     def defaultParallelism(self):
@@ -209,22 +461,22 @@ class Context(object):
             A partition is a unit of data that is processed at a time.
 
         :rtype: RDD
-        """
-        if numSlices is None or numSlices <= 1:
-            return RDD([Partition(x, 0)], self)
 
-        x_len_iter, x = itertools.tee(x, 2)
-        len_x = sum(1 for _ in x_len_iter)
+        Sequences like lists, tuples, ``range`` objects and NumPy arrays are
+        not copied: every partition slices its elements out of ``x`` when
+        it is computed. Other iterables are copied to a list once.
+        """
+        if not isinstance(x, Sequence) and not (numpy is not None and isinstance(x, numpy.ndarray)):
+            x = list(x)
 
-        def partitioned():
-            for i in range(numSlices):
-                start = int(i * len_x / numSlices)
-                end = int((i + 1) * len_x / numSlices)
-                if i + 1 == numSlices:
-                    end += 1
-                yield itertools.islice(x, end - start)
+        len_x = len(x)
+        if numSlices is None or numSlices <= 1:
+            return RDD([SlicePartition(x, 0, len_x, 0)], self)
 
-        return self._parallelize_partitions(partitioned())
+        return RDD(
+            (SlicePartition(x, i * len_x // numSlices, (i + 1) * len_x // numSlices, i) for i in range(numSlices)),
+            self,
+        )
 
     def _parallelize_partitions(self, partitions):
         """Helper to parallelize partitions.
@@ -294,86 +546,269 @@ class Context(object):
         :returns: Result of resultHandler.
         :rtype: list
         """
+        if in_task():
+            raise ContextIsLockedException
         if not partitions:
             partitions = rdd.partitions()
 
-        # acquire lock
-        if self.locked:
-            raise ContextIsLockedException
-        self.locked = True
-
-        # this is the place to insert proper schedulers
-        if allowLocal or isinstance(self._pool, DummyPool):
-            map_result = self._runJob_local(rdd, func, partitions)
-        else:
-            map_result = self._runJob_distributed(rdd, func, partitions)
-
-        result = resultHandler(map_result) if resultHandler is not None else list(map_result)
-
-        # release lock
-        self.locked = False
-
-        return result
+        with self._task_scheduler.job() as job_id, self._status_tracker.running_job(job_id):
+            if allowLocal or isinstance(self._pool, DummyPool):
+                run_stages = self._runJob_local
+            else:
+                run_stages = functools.partial(self._runJob_distributed, job_id)
+
+            # run the map stages of the missing shuffles before the final stage
+            for wave in self._scheduler.map_stage_waves(rdd):
+                with self._scheduler.missing_map_outputs(wave) as shuffles:
+                    stages = [
+                        self._new_stage(job_id, s.prev, s.map_output_writer(), s.prev.partitions()) for s in shuffles
+                    ]
+                    map_statuses = iter(list(run_stages(stages)))
+                    for shuffle, stage in zip(shuffles, stages):
+                        shuffle.set_map_output(itertools.islice(map_statuses, len(stage.partitions)))
+
+            map_result = run_stages([self._new_stage(job_id, rdd, func, partitions)], final=True)
+            return resultHandler(map_result) if resultHandler is not None else list(map_result)
+
+    def _new_stage(self, job_id, rdd, func, partitions):
+        stage = Stage(self._scheduler.new_stage_id(), rdd, func, partitions)
+        self._status_tracker.on_stage_submitted(job_id, stage)
+        return stage
+
+    def submitJob(self, rdd, func, partitions=None, allowLocal=False, resultHandler=None):
+        """Like :func:`Context.runJob()` but returns right away.
+
+        The job runs in a background thread. Several submitted jobs run
+        concurrently and share the pool.
+
+        :returns: A future of the result of the resultHandler.
+        :rtype: JobFuture
+        """
+        return self._submit(self.runJob, rdd, func, partitions, allowLocal, resultHandler)
 
-    def _runJob_local(self, rdd, func, partitions):
-        for partition in partitions:
-            task_context = TaskContext(
-                cache_manager=self._cache_manager,
-                catch_exceptions=self._catch_exceptions,
-                stage_id=0,
-                partition_id=partition.index,
-                max_retries=self.max_retries,
-                retry_wait=self.retry_wait,
-            )
-            yield _run_task(task_context, rdd, func, partition)
+    def _submit(self, action, *args):
+        """run an action in a background thread
 
-    def _runJob_distributed(self, rdd, func, partitions):
-        serialized_func_rdd = self._serializer((func, rdd))
+        :param action: A function that runs jobs on this context.
+        :rtype: JobFuture
+        """
+        future = JobFuture()
+
+        def run():
+            if not future.set_running_or_notify_cancel():
+                return
+            _job_local.future = future
+            try:
+                result = action(*args)
+            except BaseException as e:  # pylint: disable=broad-except
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+
+        threading.Thread(target=run, daemon=True).start()
+        return future
+
+    def _runJob_local(self, stages, final=False):
+        for stage in stages:
+            for partition in stage.partitions:
+                _raise_if_cancelled(final and stage is stages[-1] and partition is stage.partitions[-1])
+                task_context = TaskContext(
+                    cache_manager=self._cache_manager,
+                    catch_exceptions=self._catch_exceptions,
+                    stage_id=stage.stage_id,
+                    partition_id=partition.index,
+                    max_retries=self.max_retries,
+                    retry_wait=self.retry_wait,
+                    profile=self.profile,
+                )
+                result = _run_task(task_context, stage.rdd, stage.func, partition)
+                self._status_tracker.on_task_end(task_context.metrics)
+                self._add_profile(stage.rdd.id(), task_context.profile_stats)
+                yield result
+
+    def _serialize_job(self, stage, job_files):
+        serialized_func_rdd = self._serializer((stage.func, stage.rdd))
+        if self._job_dir is None:
+            return serialized_func_rdd
+
+        # ship the job to the workers through a file instead of in every task
+        fd, job_file = tempfile.mkstemp(dir=self._job_dir)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(serialized_func_rdd)
+        job_files.append(job_file)
+        return JobReference(hashlib.sha1(serialized_func_rdd).hexdigest(), job_file)
+
+    def _runJob_distributed(self, job_id, stages, final=False):
+        """run the tasks of all stages together in the pool
+
+        :param bool final: Whether the stages are the last of the job.
+        """
+        job_files = []
 
-        def prepare(partition):
+        def prepare(stage_id, serialized_func_rdd, data_serializer, partition):
             t_start = time.perf_counter()
             cm_clone = self._cache_manager.clone_contains(lambda i: i[1] == partition.index)
-            self._stats['driver_cache_clone'] += time.perf_counter() - t_start
+            self._add_stat('driver_cache_clone', time.perf_counter() - t_start)
 
-            t_start = time.perf_counter()
+            start, t_start = time.time(), time.perf_counter()
             task_context = TaskContext(
                 cache_manager=cm_clone,
                 catch_exceptions=self._catch_exceptions,
-                stage_id=0,
+                stage_id=stage_id,
                 partition_id=partition.index,
                 max_retries=self.max_retries,
                 retry_wait=self.retry_wait,
+                profile=self.profile,
             )
             serialized_task_context = self._serializer(task_context)
-            self._stats['driver_serialize_task_context'] += time.perf_counter() - t_start
+            self._add_stat('driver_serialize_task_context', time.perf_counter() - t_start)
 
             t_start = time.perf_counter()
-            serialized_partition = self._data_deserializer(partition)
-            self._stats['driver_serialize_data'] += time.perf_counter() - t_start
+            serialized_partition = data_serializer.dumps(partition)
+            self._add_stat('driver_serialize_data', time.perf_counter() - t_start)
+            self._status_tracker.on_driver_span(
+                stage_id, 'serialize task', start, time.time() - start, partition_id=partition.index
+            )
 
             return (
                 self._deserializer,
-                self._data_serializer,
-                self._data_deserializer,
+                data_serializer.dumps,
+                data_serializer.loads,
                 serialized_func_rdd,
                 serialized_task_context,
                 serialized_partition,
             )
 
-        prepared_partitions = (prepare(p) for p in partitions)
-        for d in self._pool.map(runJob_map, prepared_partitions):
-            t_start = time.perf_counter()
-            map_result, cache_result, s = self._data_deserializer(d)
-            self._stats['driver_deserialize_data'] += time.perf_counter() - t_start
+        try:
+            tasks = []
+            for stage in stages:
+                serialized_func_rdd = self._serialize_job(stage, job_files)
+                data_serializer = self._select_data_serializer(stage)
+                tasks += [
+                    (stage.stage_id, serialized_func_rdd, data_serializer, partition) for partition in stage.partitions
+                ]
+            # batch small tasks to fewer messages unless every task is monitored
+            chunksize = 1
+            if self._job_dir is not None and not self._monitor_tasks():
+                chunksize = max(1, len(tasks) // (4 * self._workers))
+
+            # the pool is shared with concurrent jobs: submit the chunks in batches
+            batch_size = self._task_scheduler.slots * chunksize
+            for start in range(0, len(tasks), batch_size):
+                _raise_if_cancelled(final and start + batch_size >= len(tasks))
+                batch = tasks[start:][:batch_size]
+                with self._task_scheduler.batch(job_id, -(-len(batch) // chunksize)):
+                    results = list(self._map_prepared_partitions([prepare(*task) for task in batch], chunksize))
+                yield from results
+        finally:
+            for job_file in job_files:
+                os.remove(job_file)
+
+    def _select_data_serializer(self, stage):
+        """data serializer for the tasks of a stage"""
+        if not self._auto_data_serializer:
+            return serializers.Serializer('custom', self._data_serializer, self._data_deserializer)
+
+        t_start = time.perf_counter()
+        sample = serializers.sample_elements(stage.partitions)
+        serializer, _ = serializers.select_serializer(sample)
+        self._add_stat('driver_select_data_serializer', time.perf_counter() - t_start)
+        self._add_stat('data_serializer_{0}'.format(serializer.name), 1)
+        return serializer
+
+    def _add_profile(self, rdd_id, stats):
+        if stats is None:
+            return
+        with self._lock:
+            if rdd_id in self._profiles:
+                self._profiles[rdd_id].add(stats)
+            else:
+                self._profiles[rdd_id] = stats
+
+    def show_profiles(self, top=20):
+        """Print the functions that took the most time in the tasks of every RDD.
+
+        Needs a context with ``profile=True``.
+
+        :param int top: Number of functions to print per RDD.
+        """
+        with self._lock:
+            for rdd_id, stats in sorted(self._profiles.items()):
+                print('=' * 60)
+                print('Profile of RDD<id={0}>'.format(rdd_id))
+                print('=' * 60)
+                stats.stream = sys.stdout
+                try:
+                    stats.sort_stats('time', 'cumulative').print_stats(top)
+                finally:
+                    stats.stream = None
+
+    def dump_profiles(self, path):
+        """Write the profile of every RDD to ``rdd_<id>.pstats`` in a directory.
+
+        The files can be loaded with :class:`pstats.Stats`.
+
+        :param str path: The directory. It is created when it does not exist.
+        """
+        os.makedirs(path, exist_ok=True)
+        with self._lock:
+            for rdd_id, stats in self._profiles.items():
+                stats.dump_stats(os.path.join(path, 'rdd_{0}.pstats'.format(rdd_id)))
+
+    def _add_stat(self, key, value):
+        with self._lock:
+            self._stats[key] += value
+
+    def _monitor_tasks(self):
+        """whether tasks are submitted one by one for timeouts or speculation"""
+        return (self.task_timeout is not None or self.speculation) and hasattr(self._pool, 'submit')
+
+    def _map_prepared_partitions(self, prepared_partitions, chunksize=1):
+        if self._monitor_tasks():
+            task_set = TaskSetManager(
+                self._pool,
+                self._workers,
+                task_timeout=self.task_timeout,
+                max_retries=self.max_retries,
+                speculation=self.speculation,
+                speculation_multiplier=self.speculation_multiplier,
+                speculation_quantile=self.speculation_quantile,
+            )
+            try:
+                results = task_set.run(runJob_map, prepared_partitions)
+            finally:
+                for k, v in task_set.stats.items():
+                    self._add_stat(k, v)
+        elif chunksize > 1:
+            results = self._pool.map(runJob_map, prepared_partitions, chunksize=chunksize)
+        else:
+            results = self._pool.map(runJob_map, prepared_partitions)
+
+        for prepared, result in zip(prepared_partitions, results):
+            d, cache_result, accumulator_updates, metrics, (rdd_id, profile_stats), s = result
+            self._status_tracker.on_task_end(metrics)
+            self._add_profile(rdd_id, profile_stats)
+
+            start, t_start = time.time(), time.perf_counter()
+            map_result = prepared[2](d)
+            self._add_stat('driver_deserialize_data', time.perf_counter() - t_start)
 
             # join cache
             t_start = time.perf_counter()
-            self._cache_manager.join(cache_result)
-            self._stats['driver_cache_join'] += time.perf_counter() - t_start
+            self._cache_manager.join(*cache_result)
+            self._add_stat('driver_cache_join', time.perf_counter() - t_start)
+            self._status_tracker.on_driver_span(
+                metrics.stage_id, 'deserialize result and join cache', start, time.time() - start, metrics.partition_id
+            )
+
+            with self._lock:
+                for aid, value in accumulator_updates.items():
+                    if aid in self._accumulators:
+                        self._accumulators[aid].add(value)
 
-            # collect stats
-            for k, v in s.items():
-                self._stats[k] += v
+                # collect stats
+                for k, v in s.items():
+                    self._stats[k] += v
 
             yield map_result
 
@@ -528,10 +963,11 @@ class Context(object):
         :param rdds: Iterable of RDDs.
         :rtype: RDD
         """
+        rdds = list(rdds)
         if all(isinstance(rdd, EmptyRDD) for rdd in rdds):
             return EmptyRDD(self)
 
-        return self.parallelize((x for rdd in rdds for x in rdd.collect()))
+        return UnionRDD(rdds, self)
 
     def wholeTextFiles(self, path, minPartitions=None, use_unicode=True):
         """Read text files into an RDD of pairs of file name and file content.
@@ -1,5 +1,6 @@
 from __future__ import absolute_import
 
+import itertools
 import logging
 
 log = logging.getLogger(__name__)
@@ -16,8 +17,101 @@ class Partition(object):
     def hashCode(self):
         return self.index
 
+    def head(self, n):
+        """the first n elements
+
+        :param int n: Maximum number of elements.
+        :rtype: list
+        """
+        return list(itertools.islice(self.x(), n))
+
+    def __len__(self):
+        return len(self._x)
+
     def __getstate__(self):
         return {
             'index': self.index,
             '_x': self.x(),
         }
+
+
+class SlicePartition(Partition):
+    """A partition that is a slice of a sequence.
+
+    The elements are only sliced out of the sequence when the partition is
+    computed. Slices of ``range`` objects and NumPy arrays do not copy the
+    elements. Only the slice is pickled.
+
+    :param data: a sequence like a list, a range or a NumPy array
+    :param int start: index of the first element of the partition
+    :param int stop: index after the last element of the partition
+    :param int idx: index of this partition
+    """
+
+    def __init__(self, data, start, stop, idx=None):
+        Partition.__init__(self, [], idx)
+        self._data = data
+        self._start = start
+        self._stop = stop
+
+    def x(self):
+        return self._data[self._start:self._stop]
+
+    def head(self, n):
+        return list(self._data[self._start:min(self._stop, self._start + n)])
+
+    def __len__(self):
+        return len(range(self._start, min(self._stop, len(self._data))))
+
+    def __getstate__(self):
+        return {
+            'index': self.index,
+            '_x': [],
+            '_data': self.x(),
+            '_start': 0,
+            '_stop': len(self),
+        }
+
+
+class UnionPartition(Partition):
+    """A partition of a union that is a partition of one of the united RDDs.
+
+    :param int idx: index of this partition in the union
+    :param int rdd_index: index of the RDD that contains the partition
+    :param Partition parent: the partition in that RDD
+    """
+
+    def __init__(self, idx, rdd_index, parent):
+        Partition.__init__(self, [], idx)
+        self.rdd_index = rdd_index
+        self.parent = parent
+
+    def x(self):
+        return self.parent.x()
+
+    def __getstate__(self):
+        return {
+            'index': self.index,
+            '_x': [],
+            'rdd_index': self.rdd_index,
+            'parent': self.parent,
+        }
+
+
+class ZippedPartition(Partition):
+    """A partition made of the partitions with the same index in other RDDs.
+
+    :param int idx: index of this partition
+    :param list parents: the partitions of the other RDDs
+    """
+
+    def __init__(self, idx, parents):
+        Partition.__init__(self, [], idx)
+        self.parents = parents
+
+    def __getstate__(self):
+        return {
+            'index': self.index,
+            '_x': [],
+            'parents': self.parents,
+        }
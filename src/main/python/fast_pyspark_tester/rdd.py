@@ -2,8 +2,10 @@
 
 from __future__ import division, absolute_import, print_function, unicode_literals
 
+import bisect
 import copy
 import functools
+import heapq
 import io
 import itertools
 import logging
@@ -13,8 +15,10 @@ import pickle
 import random
 import subprocess
 import sys
+import weakref
 from builtins import range, zip
 from collections import defaultdict
+from collections.abc import Sized
 from operator import itemgetter
 
 try:
@@ -23,8 +27,9 @@ except ImportError:
     numpy = None
 
 from . import fileio
-from .utils import portable_hash
+from .utils import portable_hash, get_range_bounds
 from .exceptions import FileAlreadyExistsException, ContextIsLockedException
+from .partition import Partition, UnionPartition, ZippedPartition
 from .samplers import (
     BernoulliSampler,
     PoissonSampler,
@@ -32,12 +37,16 @@ from .samplers import (
     PoissonSamplerPerKey,
 )
 from .stat_counter import StatCounter
+from .task_context import in_task
 
 maxint = sys.maxint if hasattr(sys, 'maxint') else sys.maxsize  # pylint: disable=no-member
 
 
 log = logging.getLogger(__name__)
 
+# combiners of these types cannot be modified and are not copied
+_IMMUTABLE_TYPES = (type(None), bool, int, float, complex, str, bytes)
+
 
 def _hash(v):
     return portable_hash(v) & 0xFFFFFFFF
@@ -59,7 +68,7 @@ class RDD(object):
     """
 
     def __init__(self, partitions, ctx):
-        if ctx.locked:
+        if in_task():
             raise ContextIsLockedException
         self._p = list(partitions)
         self.context = ctx
@@ -75,11 +84,18 @@ class RDD(object):
 
         :param Partition split: a partition
         """
-        return split.x()
+        data = split.x()
+        if isinstance(data, Sized):
+            task_context.metrics.records_in += len(data)
+        return data
 
     def partitions(self):
         return self._p
 
+    def _narrow_dependencies(self):
+        """parent RDDs that are computed in the same task as this RDD"""
+        return []
+
     """
 
     Public API
@@ -131,7 +147,7 @@ class RDD(object):
         """
         return self.aggregate(zeroValue, seqOp, combOp)
 
-    def aggregateByKey(self, zeroValue, seqFunc, combFunc, numPartitions=None):
+    def aggregateByKey(self, zeroValue, seqFunc, combFunc, numPartitions=None, partitionFunc=None):
         """aggregate by key
 
         :param zeroValue:
@@ -147,7 +163,8 @@ class RDD(object):
             A reference to a function that combines outputs of seqFunc.
             In the first iteration, the current state is zeroValue.
 
-        :param int numPartitions: Not used.
+        :param int numPartitions: Number of partitions in the resulting RDD.
+        :param function partitionFunc: Partition function.
 
         :returns: An RDD with the output of ``combOp`` operations.
         :rtype: RDD
@@ -165,22 +182,9 @@ class RDD(object):
         (4, 2)
         """
 
-        def seqFuncByKey(tc, i):
-            r = defaultdict(lambda: copy.deepcopy(zeroValue))
-            for k, v in i:
-                r[k] = seqFunc(r[k], v)
-            return r
-
-        def combFuncByKey(l_):
-            r = defaultdict(lambda: copy.deepcopy(zeroValue))
-            for p in l_:
-                for k, v in p.items():
-                    r[k] = combFunc(r[k], v)
-            return r
-
-        local_result = self.context.runJob(self, seqFuncByKey, resultHandler=combFuncByKey)
-
-        return self.context.parallelize(local_result.items())
+        return self.combineByKey(
+            lambda v: seqFunc(copy.deepcopy(zeroValue), v), seqFunc, combFunc, numPartitions, partitionFunc,
+        )
 
     def cache(self):
         """Once a partition is computed, cache the result.
@@ -262,12 +266,14 @@ class RDD(object):
         """coalesce
 
         :param int numPartitions: Number of partitions in the resulting RDD.
-        :param shuffle: (optional) Not used.
+        :param bool shuffle:
+            Shuffle the elements into ``numPartitions`` partitions of
+            consecutive elements instead of merging existing partitions.
         :rtype: RDD
 
         .. note::
-            This is currently implemented as a local operation requiring
-            all data to be pulled on one machine.
+            Without a shuffle, this is currently implemented as a local
+            operation requiring all data to be pulled on one machine.
 
 
         Example:
@@ -301,7 +307,17 @@ class RDD(object):
         [7, 8]
         """
         if shuffle:
-            return self.context.parallelize(self.toLocalIterator(), numPartitions)
+            # split the elements like parallelize() does: the partition of
+            # an element follows from its position in the whole dataset
+            counts = dict(self.mapPartitionsWithIndex(lambda i, x: [(i, sum(1 for _ in x))]).collect())
+            offsets = dict(zip(counts, itertools.accumulate([0] + list(counts.values()))))
+            total = max(sum(counts.values()), 1)
+
+            def key_by_slice(split_index, x):
+                offset = offsets[split_index]
+                return ((((offset + i + 1) * numPartitions - 1) // total, xx) for i, xx in enumerate(x))
+
+            return self.mapPartitionsWithIndex(key_by_slice).partitionBy(numPartitions, unit).values()
 
         current_num_partitions = self.getNumPartitions()
         new_num_partitions = min(numPartitions, current_num_partitions)
@@ -357,11 +373,20 @@ class RDD(object):
         [('house', [[1], [3]]), ('tree', [[], [2]])]
         """
 
-        d_self = defaultdict(list, self.groupByKey().collect())
-        d_other = defaultdict(list, other.groupByKey().collect())
-        return self.context.parallelize(
-            [(k, [list(d_self[k]), list(d_other[k])]) for k in set(d_self.keys()) | set(d_other.keys())]
-        )
+        if numPartitions is None:
+            numPartitions = max(self.getNumPartitions(), other.getNumPartitions())
+
+        tagged = self.mapValues(lambda v: (0, v)).union(other.mapValues(lambda v: (1, v)))
+
+        def group_partition(x):
+            groups = {}
+            for k, (i, v) in x:
+                if k not in groups:
+                    groups[k] = [[], []]
+                groups[k][i].append(v)
+            return groups.items()
+
+        return tagged.partitionBy(numPartitions).mapPartitions(group_partition, preservesPartitioning=True)
 
     def collect(self):
         """returns the entire dataset as a list
@@ -377,6 +402,21 @@ class RDD(object):
         """
         return self.context.runJob(self, unit_map, resultHandler=unit_collect,)
 
+    def collectAsync(self):
+        """same as :func:`~fast_pyspark_tester.RDD.collect()` but returns right away
+
+        :returns: A future of the list of elements.
+        :rtype: ~fast_pyspark_tester.scheduler.JobFuture
+
+
+        Example:
+
+        >>> from fast_pyspark_tester import Context
+        >>> Context().parallelize([1, 2, 3]).collectAsync().result()
+        [1, 2, 3]
+        """
+        return self.context._submit(self.collect)
+
     def collectAsMap(self):
         """returns a dictionary for a pair dataset
 
@@ -392,6 +432,94 @@ class RDD(object):
         """
         return dict(self.collect())
 
+    def combineByKey(self, createCombiner, mergeValue, mergeCombiners, numPartitions=None, partitionFunc=None):
+        """combine the values of each key
+
+        Values are first combined within each partition so only one
+        combiner per key and per partition is shuffled. The combiners of
+        a key are then merged in the partition the key is shuffled to.
+
+        :param createCombiner:
+            A function that turns the first value of a key in a partition
+            into a combiner.
+
+        :param mergeValue:
+            A function that merges a value into a combiner.
+
+        :param mergeCombiners:
+            A function that merges two combiners.
+
+        :param int numPartitions: Number of partitions in the resulting RDD.
+        :param function partitionFunc: Partition function.
+        :rtype: RDD
+
+
+        Example:
+
+        >>> from fast_pyspark_tester import Context
+        >>> rdd = Context().parallelize([('a', 1), ('b', 2), ('a', 3)], 2)
+        >>> sorted(rdd.combineByKey(
+        ...     lambda v: [v], lambda c, v: c + [v], lambda c1, c2: c1 + c2
+        ... ).collect())
+        [('a', [1, 3]), ('b', [2])]
+        """
+        if numPartitions is None:
+            numPartitions = self.getNumPartitions()
+
+        def combine_partition(x):
+            combiners = {}
+            for k, v in x:
+                if k in combiners:
+                    combiners[k] = mergeValue(combiners[k], v)
+                else:
+                    combiners[k] = createCombiner(v)
+            return combiners.items()
+
+        def merge_partition(x):
+            merged = {}
+            for k, c in x:
+                if k in merged:
+                    merged[k] = mergeCombiners(merged[k], c)
+                else:
+                    # mergeCombiners may modify its first argument and the
+                    # objects in it: do not let it modify the shuffle output
+                    # that is read again whenever this RDD is computed
+                    merged[k] = c if type(c) in _IMMUTABLE_TYPES else copy.deepcopy(c)
+            return merged.items()
+
+        return (
+            self.mapPartitions(combine_partition, preservesPartitioning=True)
+            .partitionBy(numPartitions, partitionFunc)
+            .mapPartitions(merge_partition, preservesPartitioning=True)
+        )
+
+    def _combineByKeyLocally(self, createCombiner, mergeValue, mergeCombiners):
+        """combine the values of each key within partitions then on the driver
+
+        :rtype: dict
+        """
+
+        def combine_partition(tc, x):
+            combiners = {}
+            for k, v in x:
+                if k in combiners:
+                    combiners[k] = mergeValue(combiners[k], v)
+                else:
+                    combiners[k] = createCombiner(v)
+            return combiners
+
+        def merge_partitions(partition_combiners):
+            merged = {}
+            for combiners in partition_combiners:
+                for k, c in combiners.items():
+                    if k in merged:
+                        merged[k] = mergeCombiners(merged[k], c)
+                    else:
+                        merged[k] = c
+            return merged
+
+        return self.context.runJob(self, combine_partition, resultHandler=merge_partitions)
+
     def count(self):
         """number of entries in this dataset
 
@@ -404,8 +532,26 @@ class RDD(object):
         >>> Context().parallelize([1, 2, 3], 2).count()
         3
         """
+        if type(self) is RDD:  # pylint: disable=unidiomatic-typecheck
+            # the partitions hold the elements without transformations
+            return sum(len(p) for p in self.partitions())
         return self.context.runJob(self, lambda tc, i: sum(1 for _ in i), resultHandler=sum)
 
+    def countAsync(self):
+        """same as :func:`~fast_pyspark_tester.RDD.count()` but returns right away
+
+        :returns: A future of the number of entries.
+        :rtype: ~fast_pyspark_tester.scheduler.JobFuture
+
+
+        Example:
+
+        >>> from fast_pyspark_tester import Context
+        >>> Context().parallelize([1, 2, 3], 2).countAsync().result()
+        3
+        """
+        return self.context._submit(self.count)
+
     def countApprox(self):
         """same as :func:`~fast_pyspark_tester.RDD.count()`
 
@@ -474,10 +620,7 @@ class RDD(object):
         3
         """
 
-        if numPartitions is None:
-            numPartitions = self.getNumPartitions()
-
-        return self.context.parallelize(list(set(self.toLocalIterator())), numPartitions)
+        return self.map(lambda x: (x, None)).reduceByKey(lambda a, b: a, numPartitions).keys()
 
     def filter(self, f):
         """filter elements
@@ -576,11 +719,13 @@ class RDD(object):
         """
         return self.aggregate(zeroValue, op, op)
 
-    def foldByKey(self, zeroValue, op):
+    def foldByKey(self, zeroValue, op, numPartitions=None, partitionFunc=None):
         """Fold (or aggregate) value by key.
 
         :param zeroValue: The inital value, for example ``0`` or ``0.0``.
         :param op: The reduce operation.
+        :param int numPartitions: Number of partitions in the resulting RDD.
+        :param function partitionFunc: Partition function.
         :rtype: RDD
 
 
@@ -591,7 +736,7 @@ class RDD(object):
         >>> my_rdd.foldByKey(0, lambda a, b: a+b).collectAsMap()['a']
         6
         """
-        return self.aggregateByKey(zeroValue, op, op)
+        return self.aggregateByKey(zeroValue, op, op, numPartitions, partitionFunc)
 
     def foreach(self, f):
         """applies ``f`` to every element
@@ -613,6 +758,15 @@ class RDD(object):
         """
         self.context.runJob(self, lambda tc, x: [f(xx) for xx in x], resultHandler=None)
 
+    def foreachAsync(self, f):
+        """same as :func:`~fast_pyspark_tester.RDD.foreach()` but returns right away
+
+        :param f: Apply a function to every element.
+        :returns: A future that is done when ``f`` was applied to every element.
+        :rtype: ~fast_pyspark_tester.scheduler.JobFuture
+        """
+        return self.context._submit(self.foreach, f)
+
     def foreachPartition(self, f):
         """applies ``f`` to every partition
 
@@ -634,9 +788,6 @@ class RDD(object):
         :param int numPartitions: Number of partitions in the resulting RDD.
         :rtype: RDD
 
-        .. note::
-            Creating the new RDD is currently implemented as a local operation.
-
 
         Example:
 
@@ -650,15 +801,7 @@ class RDD(object):
         [('a', (0, None)), ('b', (1, 2)), ('c', (None, 3))]
         """
 
-        grouped = self.cogroup(other, numPartitions)
-
-        return grouped.flatMap(
-            lambda kv: [
-                (kv[0], (v_self, v_other))
-                for v_self in (kv[1][0] if kv[1][0] else [None])
-                for v_other in (kv[1][1] if kv[1][1] else [None])
-            ]
-        )
+        return self._hashJoin(other, numPartitions, 'full')
 
     def getNumPartitions(self):
         """returns the number of partitions
@@ -695,24 +838,31 @@ class RDD(object):
 
         return self.keyBy(f).groupByKey(numPartitions)
 
-    def groupByKey(self, numPartitions=None):
+    def groupByKey(self, numPartitions=None, partitionFunc=None):
         """group by key
 
         :param int numPartitions: Number of partitions in the resulting RDD.
+        :param function partitionFunc: Partition function.
         :rtype: RDD
 
-        .. note::
-            Creating the new RDD is currently implemented as a local operation.
+
+        Example:
+
+        >>> from fast_pyspark_tester import Context
+        >>> rdd = Context().parallelize([('a', 1), ('b', 2), ('a', 3)], 2)
+        >>> sorted(rdd.groupByKey().collect())
+        [('a', [1, 3]), ('b', [2])]
         """
 
-        if numPartitions is None:
-            numPartitions = self.getNumPartitions()
+        def merge_value(c, v):
+            c.append(v)
+            return c
 
-        r = defaultdict(list)
-        for key, value in self.toLocalIterator():
-            r[key].append(value)
+        def merge_combiners(c1, c2):
+            c1.extend(c2)
+            return c1
 
-        return self.context.parallelize(r.items(), numPartitions)
+        return self.combineByKey(lambda v: [v], merge_value, merge_combiners, numPartitions, partitionFunc)
 
     def histogram(self, buckets):
         """histogram
@@ -761,9 +911,6 @@ class RDD(object):
         :param RDD other: The other dataset to do the intersection with.
         :rtype: RDD
 
-        .. note::
-            Creating the new RDD is currently implemented as a local operation.
-
 
         Example:
 
@@ -773,7 +920,12 @@ class RDD(object):
         >>> rdd1.intersection(rdd2).collect()
         [4, 7]
         """
-        return self.context.parallelize(list(set(self.toLocalIterator()) & set(other.toLocalIterator())))
+        return (
+            self.map(lambda x: (x, None))
+            .cogroup(other.map(lambda x: (x, None)))
+            .filter(lambda k_vs: all(k_vs[1]))
+            .keys()
+        )
 
     def isCheckpointed(self):
         return False
@@ -785,9 +937,6 @@ class RDD(object):
         :param int numPartitions: Number of partitions in the resulting RDD.
         :rtype: RDD
 
-        .. note::
-            Creating the new RDD is currently implemented as a local operation.
-
 
         Example:
 
@@ -798,13 +947,28 @@ class RDD(object):
         [(1, (1, 3))]
         """
 
+        return self._hashJoin(other, numPartitions, 'inner')
+
+    def _hashJoin(self, other, numPartitions, how):
+        """join co-partitioned RDDs with hash tables
+
+        Both RDDs are partitioned by key. In every partition, a hash table
+        is built from the side with the smaller shuffle output and the
+        other side is streamed through it.
+
+        :param RDD other: The other RDD.
+        :param int numPartitions: Number of partitions in the resulting RDD.
+        :param str how:
+            One of ``'inner'``, ``'left'``, ``'right'``, ``'full'``,
+            ``'semi'`` and ``'anti'``.
+        :rtype: RDD
+        """
         if numPartitions is None:
-            numPartitions = self.getNumPartitions()
+            numPartitions = max(self.getNumPartitions(), other.getNumPartitions())
 
-        d1 = dict(self.collect())
-        d2 = dict(other.collect())
-        keys = set(d1.keys()) & set(d2.keys())
-        return self.context.parallelize(((k, (d1[k], d2[k])) for k in keys), numPartitions)
+        left = self.partitionBy(numPartitions)
+        right = other.partitionBy(numPartitions)
+        return ZippedPartitionsRDD([left, right], HashJoin(how, left, right))
 
     def keyBy(self, f):
         """key by f
@@ -843,9 +1007,6 @@ class RDD(object):
         :param int numPartitions: Number of partitions in the resulting RDD.
         :rtype: RDD
 
-        .. note::
-            Creating the new RDD is currently implemented as a local operation.
-
 
         Example:
 
@@ -856,27 +1017,17 @@ class RDD(object):
         [(0, (1, None)), (1, (1, 3))]
         """
 
-        d_other = other.groupByKey().collectAsMap()
-
-        return self.groupByKey().flatMap(
-            lambda kv: [
-                (kv[0], (v_self, v_other))
-                for v_self in kv[1]
-                for v_other in (d_other[kv[0]] if kv[0] in d_other else [None])
-            ]
-        )
+        return self._hashJoin(other, numPartitions, 'left')
 
-    def _leftSemiJoin(self, other):
+    def _leftSemiJoin(self, other, numPartitions=None):
         """left semi join
 
         This function is not part of the official Spark API hence its leading "_"
 
         :param RDD other: The other RDD.
+        :param int numPartitions: Number of partitions in the resulting RDD.
         :rtype: RDD
 
-        .. note::
-            Creating the new RDD is currently implemented as a local operation.
-
         Example:
 
         >>> from fast_pyspark_tester import Context
@@ -886,11 +1037,9 @@ class RDD(object):
         [(1, (1, ()))]
         """
 
-        d_other = other.groupByKey().collectAsMap()
-
-        return self.groupByKey().flatMap(lambda kv: [(kv[0], (v_self, ())) for v_self in kv[1] if kv[0] in d_other])
+        return self._hashJoin(other, numPartitions, 'semi')
 
-    def _leftAntiJoin(self, other):
+    def _leftAntiJoin(self, other, numPartitions=None):
         """left anti join
 
         This function is not part of the official Spark API hence its leading "_"
@@ -899,9 +1048,6 @@ class RDD(object):
         :param int numPartitions: Number of partitions in the resulting RDD.
         :rtype: RDD
 
-        .. note::
-            Creating the new RDD is currently implemented as a local operation.
-
 
         Example:
 
@@ -912,11 +1058,7 @@ class RDD(object):
         [(0, (1, None))]
         """
 
-        d_other = other.groupByKey().collectAsMap()
-
-        return self.groupByKey().flatMap(
-            lambda kv: [(kv[0], (v_self, None)) for v_self in kv[1] if kv[0] not in d_other]
-        )
+        return self._hashJoin(other, numPartitions, 'anti')
 
     def lookup(self, key):
         """Return all the (key, value) pairs where the given key matches.
@@ -1069,17 +1211,15 @@ class RDD(object):
         if partitionFunc is None:
             partitionFunc = _hash
 
-        new_partitions = [[] for _ in range(numPartitions)]
-        for key_value in self.toLocalIterator():
-            idx = partitionFunc(key_value[0]) % numPartitions
-            new_partitions[idx].append(key_value)
-
-        return self.context._parallelize_partitions(new_partitions)
+        return ShuffledRDD(self, numPartitions, partitionFunc)
 
     def persist(self, storageLevel=None):
         """Cache the results of computed partitions.
 
-        :param storageLevel: Not used.
+        :param StorageLevel storageLevel:
+            Whether the cache manager keeps the partitions in memory, on
+            disk or in memory with a spill to disk when it runs out of
+            memory. Defaults to memory only.
         """
         return PersistedRDD(self, storageLevel=storageLevel)
 
@@ -1191,16 +1331,18 @@ class RDD(object):
 
         return result
 
-    def reduceByKey(self, f, numPartitions=None):
+    def reduceByKey(self, f, numPartitions=None, partitionFunc=None):
         """reduce by key
 
         :param f: A commutative and associative binary operator.
         :param int numPartitions: Number of partitions in the resulting RDD.
+        :param function partitionFunc: Partition function.
         :rtype: RDD
 
         .. note::
-            This operation includes a :func:`~pysparkling.RDD.groupByKey()`
-            which is a local operation.
+            Values are reduced within each partition before the partial
+            results are merged, see
+            :func:`~fast_pyspark_tester.RDD.combineByKey()`.
 
 
         Example:
@@ -1210,7 +1352,7 @@ class RDD(object):
         >>> rdd.reduceByKey(lambda a, b: a+b).collect()
         [(0, 1), (1, 4)]
         """
-        return self.groupByKey(numPartitions).mapValues(lambda x: functools.reduce(f, x))
+        return self.combineByKey(unit, f, f, numPartitions, partitionFunc)
 
     def reduceByKeyLocally(self, f):
         """reduce by key and return a dictionnary
@@ -1225,7 +1367,7 @@ class RDD(object):
         >>> sorted(rdd.reduceByKeyLocally(lambda a, b: a+b).items())
         [('a', 2), ('b', 1)]
         """
-        return dict(self.reduceByKey(f).collect())
+        return self._combineByKeyLocally(unit, f, f)
 
     def treeReduce(self, f, depth=2):
         """same internal behaviour as :func:`~pysparkling.RDD.reduce()`
@@ -1254,9 +1396,6 @@ class RDD(object):
         :param int numPartitions: Number of partitions in new RDD.
         :rtype: RDD
 
-        .. note::
-            Creating the new RDD is currently implemented as a local operation.
-
         Example:
 
         >>> from fast_pyspark_tester import Context
@@ -1304,9 +1443,6 @@ class RDD(object):
         :param int numPartitions: Number of partitions in new RDD.
         :rtype: RDD
 
-        .. note::
-            Creating the new RDD is currently implemented as a local operation.
-
 
         Example:
 
@@ -1318,15 +1454,7 @@ class RDD(object):
         [(1, (1, 3)), (2, (None, 1))]
         """
 
-        d_self = self.groupByKey().collectAsMap()
-
-        return other.groupByKey().flatMap(
-            lambda kv: [
-                (kv[0], (v_self, v_other))
-                for v_other in kv[1]
-                for v_self in (d_self[kv[0]] if kv[0] in d_self else [None])
-            ]
-        )
+        return self._hashJoin(other, numPartitions, 'right')
 
     def sample(self, withReplacement, fraction, seed=None):
         """randomly sample
@@ -1544,8 +1672,8 @@ class RDD(object):
             partitions as the input.
         :rtype: RDD
 
-        .. note::
-            Sorting is currently implemented as a local operation.
+        The elements are shuffled into ranges of keys that are bounded by
+        a sample of the keys. Then, every partition is sorted in its task.
 
 
         Examples:
@@ -1564,7 +1692,23 @@ class RDD(object):
         if numPartitions is None:
             numPartitions = self.getNumPartitions()
 
-        return self.context.parallelize(sorted(self.collect(), key=keyfunc, reverse=not ascending), numPartitions,)
+        keyed = self.keyBy(keyfunc)
+        bounds = get_range_bounds(keyed.keys(), numPartitions)
+
+        if ascending:
+
+            def range_id(key):
+                return bisect.bisect_left(bounds, key)
+
+        else:
+
+            def range_id(key):
+                return len(bounds) - bisect.bisect_right(bounds, key)
+
+        def sort_partition(x):
+            return (e for _, e in sorted(x, key=itemgetter(0), reverse=not ascending))
+
+        return keyed.partitionBy(numPartitions, range_id).mapPartitions(sort_partition, preservesPartitioning=True)
 
     def sortByKey(self, ascending=True, numPartitions=None, keyfunc=itemgetter(0)):
         """sort by key
@@ -1575,9 +1719,6 @@ class RDD(object):
         :param keyfunc: Returns the value that will be sorted.
         :rtype: RDD
 
-        .. note::
-            Sorting is currently implemented as a local operation.
-
 
         Examples:
 
@@ -1660,11 +1801,7 @@ class RDD(object):
         [('b', 4), ('b', 5)]
         """
 
-        def filter_func(pair):
-            _, (val1, val2) = pair
-            return val1 and not val2
-
-        return self.cogroup(other, numPartitions).filter(filter_func).flatMapValues(lambda x: x[0])
+        return self._leftAntiJoin(other, numPartitions).mapValues(itemgetter(0))
 
     def sum(self):
         """sum of all the elements
@@ -1716,6 +1853,22 @@ class RDD(object):
             resultHandler=lambda l: list(itertools.islice(itertools.chain.from_iterable(l), n,)),
         )
 
+    def takeAsync(self, n):
+        """same as :func:`~fast_pyspark_tester.RDD.take()` but returns right away
+
+        :param int n: Number of elements to return.
+        :returns: A future of the list of elements.
+        :rtype: ~fast_pyspark_tester.scheduler.JobFuture
+
+
+        Example:
+
+        >>> from fast_pyspark_tester import Context
+        >>> Context().parallelize([4, 7, 2], 3).takeAsync(2).result()
+        [4, 7]
+        """
+        return self.context._submit(self.take, n)
+
     def takeSample(self, withReplacement, num, seed=None):
         # The code of this function is extracted from PySpark RDD counterpart at
         # https://spark.apache.org/docs/1.5.0/api/python/_modules/pyspark/rdd.html
@@ -1843,6 +1996,9 @@ class RDD(object):
         """
         Return the first n elements of the RDD based on ascending order.
 
+        Every partition only keeps its own first n elements in a bounded heap
+        and the driver merges them.
+
         A custom key function can be supplied to customize the sort order
         >>> from fast_pyspark_tester import Context
         >>> Context().parallelize([10, 1, 2, 9, 3, 4, 5, 6, 7]).takeOrdered(6)
@@ -1850,7 +2006,15 @@ class RDD(object):
         >>> Context().parallelize([10, 1, 2, 9, 3, 4, 5, 6, 7], 2).takeOrdered(6, key=lambda x: -x)
         [10, 9, 7, 6, 5, 4]
         """
-        return self.sortBy(key).take(n)
+
+        def smallest(tc, partition):
+            return heapq.nsmallest(n, partition, key=key)
+
+        return self.context.runJob(
+            self,
+            smallest,
+            resultHandler=lambda parts: heapq.nsmallest(n, itertools.chain.from_iterable(parts), key=key),
+        )
 
     def toLocalIterator(self):
         """Returns an iterator over the dataset.
@@ -1862,11 +2026,16 @@ class RDD(object):
         >>> sum(Context().parallelize([4, 9, 7, 3, 2, 5], 3).toLocalIterator())
         30
         """
-        return self.context.runJob(self, lambda tc, i: list(i), resultHandler=lambda l: (x for p in l for x in p),)
+        return self.context.runJob(
+            self, lambda tc, i: list(i), resultHandler=lambda parts: (x for p in parts for x in p),
+        )
 
     def top(self, num, key=None):
         """Top N elements in descending order.
 
+        Every partition only keeps its own top N elements in a bounded heap
+        and the driver merges them.
+
         :param int num: number of elements
         :param key: optional key function
         :rtype: list
@@ -1880,13 +2049,14 @@ class RDD(object):
         [9, 7]
         """
 
-        def unit(x):
-            return x
-
-        if key is None:
-            key = unit
+        def largest(tc, partition):
+            return heapq.nlargest(num, partition, key=key)
 
-        return self.sortBy(key, ascending=False).take(num)
+        return self.context.runJob(
+            self,
+            largest,
+            resultHandler=lambda parts: heapq.nlargest(num, itertools.chain.from_iterable(parts), key=key),
+        )
 
     def union(self, other):
         """union
@@ -2028,6 +2198,9 @@ class MapPartitionsRDD(RDD):
     def partitions(self):
         return self.prev.partitions()
 
+    def _narrow_dependencies(self):
+        return [self.prev]
+
 
 class PartitionwiseSampledRDD(RDD):
     def __init__(self, prev, sampler, preservesPartitioning=False, seed=None):
@@ -2057,6 +2230,9 @@ class PartitionwiseSampledRDD(RDD):
     def partitions(self):
         return self.prev.partitions()
 
+    def _narrow_dependencies(self):
+        return [self.prev]
+
 
 class PersistedRDD(RDD):
     def __init__(self, prev, storageLevel=None):
@@ -2076,16 +2252,29 @@ class PersistedRDD(RDD):
         else:
             self._cid = (self._rdd_id, split.index)
 
-        if not task_context.cache_manager.has(self._cid):
+        data = None
+        if task_context.cache_manager.has(self._cid):
+            log.debug('Using cache of RDD {} partition {}.'.format(*self._cid))
+            data = task_context.cache_manager.get(self._cid)
+
+        if data is None:
+            task_context.metrics.cache_misses += 1
             data = list(self.prev.compute(split, task_context._create_child()))
             task_context.cache_manager.add(self._cid, data, self.storageLevel)
             self._cache_manager = task_context.cache_manager
         else:
-            log.debug('Using cache of RDD {} partition {}.'.format(*self._cid))
-            data = task_context.cache_manager.get(self._cid)
+            task_context.metrics.cache_hits += 1
+            task_context.metrics.records_in += len(data)
 
         return iter(data)
 
+    def _narrow_dependencies(self):
+        # noinspection PyProtectedMember
+        cache_manager = self.context._cache_manager
+        if all(cache_manager.has((self._rdd_id, p.index)) for p in self.partitions()):
+            return []
+        return [self.prev]
+
     def unpersist(self, blocking=False):
         if self._cache_manager:
             self._cache_manager.delete(self._cid)
@@ -2094,6 +2283,118 @@ class PersistedRDD(RDD):
         return unpersisted_rdd
 
 
+class ShuffledRDD(RDD):
+    def __init__(self, prev, numPartitions, partitionFunc):
+        """RDD with the key-value pairs of ``prev`` shuffled by key.
+
+        The map side of the shuffle is a stage of the first job that needs
+        this RDD: within the tasks, every partition of ``prev`` is split
+        into buckets by ``partitionFunc(key) % numPartitions`` and the
+        buckets are stored by the context's
+        :class:`~fast_pyspark_tester.shuffle.ShuffleManager`. Computing a
+        partition reads its buckets from all map outputs.
+
+        :param RDD prev: previous RDD
+        :param int numPartitions: number of partitions
+        :param partitionFunc: function that returns an int for a key
+        """
+        RDD.__init__(self, [Partition([], i) for i in range(numPartitions)], prev.context)
+        self.prev = prev
+        self.numPartitions = numPartitions
+        self.partitionFunc = partitionFunc
+
+        # noinspection PyProtectedMember
+        self._shuffle_manager = prev.context._shuffle_manager
+        self._shuffle_id = self._shuffle_manager.new_shuffle_id()
+        self._map_statuses = None
+
+    def __getstate__(self):
+        # tasks only read the map output
+        r = RDD.__getstate__(self)
+        r['prev'] = None
+        return r
+
+    def has_map_output(self):
+        return self._map_statuses is not None
+
+    def map_output_writer(self):
+        """function for the tasks of the map stage on ``prev``"""
+        return ShuffleWriter(self._shuffle_manager, self._shuffle_id, self.numPartitions, self.partitionFunc)
+
+    def set_map_output(self, map_statuses):
+        """store the result of the map stage
+
+        :param map_statuses: Results of :func:`map_output_writer()`.
+        """
+        self._map_statuses = list(map_statuses)
+        weakref.finalize(
+            self, self._shuffle_manager.remove, self._shuffle_id, [map_id for map_id, _ in self._map_statuses],
+        )
+
+    def compute(self, split, task_context):
+        return _count_records(
+            self._shuffle_manager.read(self._shuffle_id, self._map_statuses, split.index), task_context.metrics
+        )
+
+    def _bucket_size(self, index):
+        """size of the shuffle output of a partition"""
+        return sum(self._shuffle_manager.bucket_size(status, index) for _, status in self._map_statuses)
+
+
+class UnionRDD(RDD):
+    def __init__(self, rdds, ctx):
+        """union of RDDs that keeps the partitions of all RDDs
+
+        :param list rdds: the RDDs
+        :param Context ctx: the context
+        """
+        self.rdds = list(rdds)
+        RDD.__init__(
+            self,
+            (
+                UnionPartition(i, rdd_index, p)
+                for i, (rdd_index, p) in enumerate(
+                    (rdd_index, p) for rdd_index, rdd in enumerate(self.rdds) for p in rdd.partitions()
+                )
+            ),
+            ctx,
+        )
+
+    def compute(self, split, task_context):
+        return self.rdds[split.rdd_index].compute(split.parent, task_context._create_child())
+
+    def _narrow_dependencies(self):
+        return self.rdds
+
+
+class ZippedPartitionsRDD(RDD):
+    def __init__(self, rdds, f):
+        """RDD that combines the partitions with the same index of RDDs
+
+        ``rdds`` is a list of RDDs with the same number of partitions.
+
+        ``f`` is a function with the signature
+        ``(task_context, partition index, list of iterators over elements)``.
+        """
+        self.rdds = list(rdds)
+        RDD.__init__(
+            self,
+            (ZippedPartition(i, list(parents)) for i, parents in enumerate(zip(*(r.partitions() for r in self.rdds)))),
+            self.rdds[0].context,
+        )
+        self.f = f
+
+    def compute(self, split, task_context):
+        return self.f(
+            task_context,
+            split.index,
+            [rdd.compute(p, task_context._create_child()) for rdd, p in zip(self.rdds, split.parents)],
+        )
+
+    def _narrow_dependencies(self):
+        return self.rdds
+
+
 class EmptyRDD(RDD):
     def __init__(self, context):
         RDD.__init__(self, [], context)
@@ -2110,6 +2411,81 @@ class MapF(object):
         return (self.f(xx) for xx in x)
 
 
+class ShuffleWriter(object):
+    def __init__(self, shuffle_manager, shuffle_id, numPartitions, partitionFunc):
+        self.shuffle_manager = shuffle_manager
+        self.shuffle_id = shuffle_id
+        self.numPartitions = numPartitions
+        self.partitionFunc = partitionFunc
+
+    def __call__(self, tc, x):
+        buckets = [[] for _ in range(self.numPartitions)]
+        for key_value in x:
+            buckets[self.partitionFunc(key_value[0]) % self.numPartitions].append(key_value)
+        return tc.partitionId(), self.shuffle_manager.write(self.shuffle_id, tc.partitionId(), buckets)
+
+
+class HashJoin(object):
+    def __init__(self, how, left, right):
+        """join of the partitions of two co-partitioned RDDs
+
+        The hash table of a partition is built from the side with the
+        smaller shuffle output. Semi and anti joins always build a set of
+        the keys of the right side.
+
+        :param str how: type of join, see :func:`RDD._hashJoin()`
+        :param ShuffledRDD left: the left side
+        :param ShuffledRDD right: the right side
+        """
+        self.how = how
+        self.left = left
+        self.right = right
+
+    def __call__(self, tc, i, partitions):
+        left, right = partitions
+
+        if self.how in ('semi', 'anti'):
+            keys = {k for k, _ in right}
+            keep = self.how == 'semi'
+            return ((k, (v, () if keep else None)) for k, v in left if (k in keys) == keep)
+
+        left_outer = self.how in ('left', 'full')
+        right_outer = self.how in ('right', 'full')
+        # noinspection PyProtectedMember
+        if self.left._bucket_size(i) < self.right._bucket_size(i):
+            return self.probe(right, left, right_outer, left_outer, lambda v_build, v_stream: (v_build, v_stream))
+        return self.probe(left, right, left_outer, right_outer, lambda v_build, v_stream: (v_stream, v_build))
+
+    @staticmethod
+    def probe(stream, build, stream_outer, build_outer, pair):
+        table = {}
+        for k, v in build:
+            if k in table:
+                table[k].append(v)
+            else:
+                table[k] = [v]
+
+        matched = set()
+        for k, v in stream:
+            if k in table:
+                if build_outer:
+                    matched.add(k)
+                for v_build in table[k]:
+                    yield k, pair(v_build, v)
+            elif stream_outer:
+                yield k, pair(None, v)
+
+        if build_outer:
+            for k, values in table.items():
+                if k not in matched:
+                    for v_build in values:
+                        yield k, pair(v_build, None)
+
+
+def unit(x):
+    return x
+
+
 def unit_map(task_context, elements):
     return list(elements)
 
@@ -2124,3 +2500,13 @@ def sum_counts_by_keys(list_of_pairlists):
         for key, count in l_.items():
             r[key] += count
     return r
+
+
+def _count_records(iterable, metrics):
+    """iterate and add the number of elements to the ``records_in`` of the task metrics"""
+    n = 0
+    try:
+        for n, x in enumerate(iterable, 1):
+            yield x
+    finally:
+        metrics.records_in += n
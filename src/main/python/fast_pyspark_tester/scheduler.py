@@ -0,0 +1,414 @@
+"""Splits jobs into stages at shuffle boundaries."""
+
+from __future__ import division, absolute_import, print_function, unicode_literals
+
+import collections
+import contextlib
+import itertools
+import logging
+import statistics
+import threading
+import time
+import weakref
+from concurrent import futures
+from concurrent.futures import _base
+
+from .rdd import ShuffledRDD
+
+log = logging.getLogger(__name__)
+
+
+class Stage(object):
+    """tasks that apply the same function to partitions of an RDD
+
+    :param int stage_id: Obtained with :func:`DAGScheduler.new_stage_id()`.
+    :param RDD rdd: The last RDD of the stage.
+    :param func: Function applied to the elements of every partition.
+    :param list partitions: The partitions of ``rdd`` to compute.
+    """
+
+    def __init__(self, stage_id, rdd, func, partitions):
+        self.stage_id = stage_id
+        self.rdd = rdd
+        self.func = func
+        self.partitions = list(partitions)
+
+    def __repr__(self):
+        return 'Stage({0}, {1}, {2} partitions)'.format(self.stage_id, self.rdd.name(), len(self.partitions))
+
+
+class JobFuture(futures.Future):
+    """future of a job that runs in the background
+
+    Cancelling the future while the job runs stops the job before its next
+    tasks are scheduled and the future is cancelled right away. The tasks
+    that already run still finish. Once the last tasks of the job are
+    scheduled, the future can no longer be cancelled.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._last_tasks_scheduled = False
+
+    def cancel(self):
+        """cancel the job unless its last tasks are already scheduled
+
+        :returns: Whether the future is cancelled.
+        :rtype: bool
+        """
+        if super().cancel():
+            return True
+
+        # pylint: disable=protected-access
+        with self._condition:
+            if self._state != _base.RUNNING or self._last_tasks_scheduled:
+                return False
+            self._state = _base.CANCELLED_AND_NOTIFIED
+            for waiter in self._waiters:
+                waiter.add_cancelled(self)
+            self._condition.notify_all()
+        self._invoke_callbacks()
+        return True
+
+    def raise_if_cancelled(self, last_tasks=False):
+        """called by the job before it schedules tasks
+
+        :param bool last_tasks: Whether these are the last tasks of the job.
+        :raises concurrent.futures.CancelledError: When the future is cancelled.
+        """
+        with self._condition:
+            if self.cancelled():
+                raise futures.CancelledError()
+            self._last_tasks_scheduled = last_tasks
+
+    def set_result(self, result):
+        with self._condition:
+            if not self.cancelled():
+                super().set_result(result)
+
+    def set_exception(self, exception):
+        with self._condition:
+            if not self.cancelled():
+                super().set_exception(exception)
+
+
+class DAGScheduler(object):
+    """DAG scheduler
+
+    The lineage of an RDD is cut at every
+    :class:`~fast_pyspark_tester.rdd.ShuffledRDD`. The partitions of an RDD
+    and of its narrow dependencies are computed by the tasks of a single
+    stage. The map side of a shuffle is a stage of its own that must run
+    before the stages that read from the shuffle.
+
+    Jobs can be submitted from several threads. The map stage of a shuffle
+    that is needed by concurrent jobs runs only once.
+    """
+
+    def __init__(self):
+        self._stage_ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._shuffle_locks = weakref.WeakKeyDictionary()
+
+    def new_stage_id(self):
+        return next(self._stage_ids)
+
+    @contextlib.contextmanager
+    def missing_map_outputs(self, shuffles):
+        """lock shuffles while their map stages run
+
+        Waits for the map stages of the given shuffles that run in other
+        jobs.
+
+        :param list shuffles: Shuffles returned by :func:`map_stage_waves()`.
+        :returns: The shuffles that still have no map output.
+        """
+        with self._lock:
+            locks = [
+                self._shuffle_locks.setdefault(shuffle, threading.Lock())
+                for shuffle in sorted(shuffles, key=lambda shuffle: shuffle.id())
+            ]
+
+        with contextlib.ExitStack() as stack:
+            for lock in locks:
+                stack.enter_context(lock)
+            yield [shuffle for shuffle in shuffles if not shuffle.has_map_output()]
+
+    @staticmethod
+    def missing_shuffles(rdd):
+        """shuffles in the lineage of an RDD whose map stage did not run yet
+
+        :param RDD rdd: An RDD.
+        :returns:
+            A dict with the missing shuffles of every missing shuffle, in
+            the order in which their map stages can run.
+        """
+        missing = {}
+
+        def visit(root):
+            """missing shuffles that root depends on without another shuffle in between"""
+            found, seen, to_visit = [], set(), [root]
+            while to_visit:
+                current = to_visit.pop()
+                if id(current) in seen:
+                    continue
+                seen.add(id(current))
+
+                if isinstance(current, ShuffledRDD):
+                    if not current.has_map_output():
+                        if current not in missing:
+                            missing[current] = visit(current.prev)
+                        found.append(current)
+                    continue
+
+                # noinspection PyProtectedMember
+                to_visit.extend(current._narrow_dependencies())  # pylint: disable=protected-access
+            return found
+
+        visit(rdd)
+        return missing
+
+    def map_stage_waves(self, rdd):
+        """groups of shuffles whose map stages can run together
+
+        :param RDD rdd: The RDD of a job.
+        :returns: Lists of shuffles. All their dependencies ran in earlier lists.
+        """
+        pending = self.missing_shuffles(rdd)
+        while pending:
+            wave = [shuffle for shuffle, parents in pending.items() if not any(p in pending for p in parents)]
+            log.debug('Running map stages of {0}.'.format(', '.join(shuffle.name() for shuffle in wave)))
+            yield wave
+            for shuffle in wave:
+                del pending[shuffle]
+
+
+class TaskScheduler(object):
+    """shares a pool between the jobs of several threads
+
+    The tasks of a job are submitted to the pool in batches. A batch waits
+    until enough of the ``slots`` of the pool are free and until it is the
+    turn of its job. A slot holds one task or one chunk of tasks that is
+    sent to a worker at once. With the ``FIFO`` mode, the earliest submitted job
+    goes first. With the ``FAIR`` mode, the job that launched the fewest
+    tasks goes first.
+
+    :param int slots: Maximum number of tasks or chunks in the pool at a time.
+    :param str mode: ``'FIFO'`` or ``'FAIR'``.
+    """
+
+    def __init__(self, slots, mode='FIFO'):
+        if mode not in ('FIFO', 'FAIR'):
+            raise ValueError('Unknown scheduler mode {0}.'.format(mode))
+
+        self.slots = slots
+        self.mode = mode
+
+        self._condition = threading.Condition()
+        self._job_ids = itertools.count(1)
+        self._free_slots = slots
+        self._waiting = {}  # job id -> number of requested slots
+        self._launched = collections.Counter()  # job id -> number of launched tasks
+
+    @contextlib.contextmanager
+    def job(self):
+        """register a job
+
+        :returns: The id of the job to pass to :func:`TaskScheduler.batch()`.
+        """
+        job_id = next(self._job_ids)
+        try:
+            yield job_id
+        finally:
+            with self._condition:
+                self._launched.pop(job_id, None)
+
+    def _next_job(self):
+        if self.mode == 'FIFO':
+            return min(self._waiting)
+        return min(self._waiting, key=lambda job_id: (self._launched[job_id], job_id))
+
+    @contextlib.contextmanager
+    def batch(self, job_id, n_tasks):
+        """wait for the turn of a batch of tasks
+
+        :param int job_id: Obtained with :func:`TaskScheduler.job()`.
+        :param int n_tasks: Number of tasks or chunks in the batch. At most ``slots``.
+        """
+        with self._condition:
+            self._waiting[job_id] = n_tasks
+            while self._next_job() != job_id or self._free_slots < n_tasks:
+                self._condition.wait()
+            del self._waiting[job_id]
+            self._free_slots -= n_tasks
+            self._launched[job_id] += n_tasks
+            # the next job might fit in the remaining slots
+            self._condition.notify_all()
+
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._free_slots += n_tasks
+                self._condition.notify_all()
+
+
+class TaskSetManager(object):
+    """runs tasks in a pool with timeouts and speculative execution
+
+    Every task is submitted on its own to a pool with a ``submit()`` method
+    like the executors of :mod:`concurrent.futures`. At most ``workers``
+    attempts are submitted at a time, so that an attempt does not wait in
+    the queue of the pool while its time runs. An attempt of a task that
+    runs longer than ``task_timeout`` is abandoned and the task is
+    submitted again. The abandoned attempt cannot be stopped and keeps a
+    worker busy until it finishes.
+
+    With ``speculation``, once ``speculation_quantile`` of the tasks
+    finished, a task that runs longer than ``speculation_multiplier``
+    times their median duration is submitted a second time if a worker is
+    idle. The first result wins.
+
+    :param pool: A pool with a ``submit(fn, *args)`` method.
+    :param int workers: Number of workers of the pool.
+    :param float task_timeout: Seconds an attempt of a task may run or None.
+    :param int max_retries: Number of attempts of a task that may time out.
+    :param bool speculation: Launch duplicates of slow tasks.
+    :param float speculation_multiplier: How much slower than the median a task must be.
+    :param float speculation_quantile: Fraction of finished tasks before speculating.
+    :param float poll_interval: Seconds between checks of the running tasks.
+    """
+
+    def __init__(
+        self,
+        pool,
+        workers,
+        task_timeout=None,
+        max_retries=3,
+        speculation=False,
+        speculation_multiplier=1.5,
+        speculation_quantile=0.75,
+        poll_interval=0.01,
+    ):
+        self.pool = pool
+        self.workers = workers
+        self.task_timeout = task_timeout
+        self.max_retries = max_retries
+        self.speculation = speculation
+        self.speculation_multiplier = speculation_multiplier
+        self.speculation_quantile = speculation_quantile
+        self.poll_interval = poll_interval
+
+        self.stats = collections.Counter()
+
+    def run(self, func, tasks):
+        """run ``func`` on every task
+
+        :param func: A function that is applied to one task.
+        :param list tasks: The arguments of the function.
+        :returns: The list of results in the order of the tasks.
+        """
+        results = [None] * len(tasks)
+        finished = [False] * len(tasks)
+        attempts = {}  # future -> (task index, speculative)
+        started = {}  # future -> time at which the attempt was first seen running
+        pending = collections.deque(range(len(tasks)))  # tasks waiting for a free worker
+        timeouts = collections.Counter()
+        abandoned = []  # timed out attempts that still keep a worker busy
+        speculated = set()
+        durations = []
+
+        def submit(index, speculative=False):
+            attempts[self.pool.submit(func, tasks[index])] = (index, speculative)
+
+        def attempts_of(index):
+            return [f for f, (i, _) in attempts.items() if i == index]
+
+        def retry(index):
+            pending.appendleft(index)
+
+        try:
+            while not all(finished):
+                abandoned[:] = [future for future in abandoned if not future.done()]
+                while pending and len(attempts) + len(abandoned) < self.workers:
+                    submit(pending.popleft())
+
+                futures.wait(
+                    list(attempts) + abandoned, timeout=self.poll_interval, return_when=futures.FIRST_COMPLETED
+                )
+                now = time.perf_counter()
+
+                for future in list(attempts):
+                    if future not in attempts:
+                        continue
+                    if not future.done():
+                        if future.running() and future not in started:
+                            started[future] = now
+                        continue
+
+                    index, speculative = attempts.pop(future)
+                    start = started.pop(future, now)
+                    if future.exception() is not None:
+                        if not attempts_of(index):
+                            raise future.exception()
+                        continue
+
+                    results[index] = future.result()
+                    finished[index] = True
+                    durations.append(now - start)
+                    if speculative:
+                        self.stats['speculative_wins'] += 1
+                    for other in attempts_of(index):
+                        other.cancel()
+                        del attempts[other]
+                        started.pop(other, None)
+
+                if self.task_timeout is not None:
+                    self._abandon_timed_out(now, attempts, started, timeouts, abandoned, retry, attempts_of)
+                if self.speculation and not pending:
+                    idle_workers = self.workers - len(attempts) - len(abandoned)
+                    self._speculate(now, attempts, started, speculated, durations, len(tasks), idle_workers, submit)
+        except BaseException:
+            # do not leave attempts of a failed task set queued in the pool
+            for future in attempts:
+                future.cancel()
+            raise
+
+        return results
+
+    def _abandon_timed_out(self, now, attempts, started, timeouts, abandoned, retry, attempts_of):
+        for future, start in list(started.items()):
+            if now - start <= self.task_timeout:
+                continue
+
+            index, _ = attempts.pop(future)
+            del started[future]
+            abandoned.append(future)
+            timeouts[index] += 1
+            self.stats['task_timeouts'] += 1
+            log.warning('Attempt of task {0} timed out after {1:.3f}s.'.format(index, now - start))
+
+            if attempts_of(index):
+                continue
+            if timeouts[index] >= self.max_retries:
+                raise futures.TimeoutError('Task {0} timed out {1} times.'.format(index, timeouts[index]))
+            retry(index)
+
+    def _speculate(self, now, attempts, started, speculated, durations, n_tasks, idle_workers, submit):
+        # pylint: disable=too-many-arguments
+        if not durations or len(durations) < self.speculation_quantile * n_tasks:
+            return
+
+        threshold = self.speculation_multiplier * statistics.median(durations)
+        for future, start in sorted(started.items(), key=lambda item: item[1]):
+            if idle_workers <= 0:
+                break
+            index, _ = attempts[future]
+            if index in speculated or now - start <= threshold:
+                continue
+
+            log.info('Launching a speculative attempt of task {0}.'.format(index))
+            speculated.add(index)
+            submit(index, speculative=True)
+            self.stats['speculative_tasks'] += 1
+            idle_workers -= 1
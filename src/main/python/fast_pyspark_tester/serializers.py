@@ -0,0 +1,469 @@
+"""Serializers for the data sent between the driver and the workers."""
+
+from __future__ import division, absolute_import, print_function, unicode_literals
+
+import array
+import contextlib
+import io
+import logging
+import marshal
+import pickle
+import struct
+import threading
+import timeit
+import weakref
+from collections import OrderedDict
+
+try:
+    # shared memory and pickle protocol 5 need Python 3.8
+    from multiprocessing import shared_memory
+except ImportError:
+    shared_memory = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+from .partition import Partition, SlicePartition
+
+log = logging.getLogger(__name__)
+
+# buffers of at least this many bytes are sent through shared memory
+MIN_OUT_OF_BAND_SIZE = 64 * 1024
+
+# shared memory attached by the tasks of this worker process
+_attached_segments = []
+
+# whether the current thread serializes the result of a task
+_writer = threading.local()
+
+
+def _array_from_buffer(typecode, buffer):
+    a = array.array(typecode)
+    a.frombytes(buffer)
+    return a
+
+
+class _OutOfBandPickler(pickle.Pickler):
+    """pickler that places large buffers in a shared memory segment
+
+    :param file: File for the pickle without the large buffers.
+    """
+
+    def __init__(self, file):
+        pickle.Pickler.__init__(self, file, protocol=5, buffer_callback=self._out_of_band)
+        self.layout = []
+        self.buffers = []
+        self.size = 0
+
+    def _place(self, buffer):
+        """offset of a buffer in the segment"""
+        offset = self.size
+        self.buffers.append((offset, buffer))
+        # keep the buffers aligned for NumPy
+        self.size += -(-buffer.nbytes // 64) * 64
+        return offset
+
+    def _out_of_band(self, buffer):
+        raw = buffer.raw()
+        if raw.nbytes < MIN_OUT_OF_BAND_SIZE:
+            return True  # pickle in band
+        self.layout.append((self._place(raw), raw.nbytes))
+        return False
+
+    def persistent_id(self, obj):  # pylint: disable=method-hidden
+        # the C pickler neither calls reducer_override() for bytes and
+        # bytearray nor sends them out of band
+        if type(obj) in (bytes, bytearray) and len(obj) >= MIN_OUT_OF_BAND_SIZE:
+            return type(obj) is bytearray, self._place(memoryview(obj)), len(obj)
+        return None
+
+    def reducer_override(self, obj):
+        if isinstance(obj, array.array) and obj.itemsize * len(obj) >= MIN_OUT_OF_BAND_SIZE:
+            return _array_from_buffer, (obj.typecode, pickle.PickleBuffer(obj))
+        return NotImplemented
+
+
+class _SharedMemoryUnpickler(pickle.Unpickler):
+    """unpickler of the output of :class:`_OutOfBandPickler`
+
+    :param SharedMemoryPayload payload: The pickle and its layout.
+    :param segment: The attached shared memory segment.
+    """
+
+    def __init__(self, payload, segment):
+        pickle.Unpickler.__init__(
+            self, io.BytesIO(payload.data), buffers=[segment.buf[o:o + n] for o, n in payload.layout]
+        )
+        self._segment = segment
+
+    def persistent_load(self, pid):  # pylint: disable=method-hidden
+        is_bytearray, offset, size = pid
+        data = self._segment.buf[offset:offset + size]
+        return bytearray(data) if is_bytearray else bytes(data)
+
+
+@contextlib.contextmanager
+def writing_task_result():
+    """serialize the result of a task in this block
+
+    The driver reads the result of a task once, so the shared memory of
+    :func:`dumps_shared` is removed by the reader. The driver keeps the
+    shared memory of the partitions that it sends because retried and
+    speculative attempts of a task read them again.
+    """
+    _writer.task_result = True
+    try:
+        yield
+    finally:
+        _writer.task_result = False
+
+
+def _unlink(segment):
+    segment.close()
+    try:
+        segment.unlink()
+    except FileNotFoundError:
+        pass
+
+
+class SharedMemoryPayload(object):
+    """pickled data with the large buffers in a shared memory segment
+
+    :param bytes data: The pickle without the buffers.
+    :param str name: Name of the shared memory segment.
+    :param list layout:
+        Pairs of offset and size of the out-of-band buffers of the pickle in
+        the segment. Large ``bytes`` and ``bytearray`` objects are referenced
+        by persistent ids with their offset instead.
+    :param bool unlink_by_reader:
+        The reader removes the segment. Otherwise the segment is removed when
+        the payload of the writer is garbage collected.
+    """
+
+    def __init__(self, data, name, layout, unlink_by_reader):
+        self.data = data
+        self.name = name
+        self.layout = layout
+        self.unlink_by_reader = unlink_by_reader
+
+
+def dumps_shared(obj, unlink_by_reader=None):
+    """serialize with buffers of large binary data in shared memory
+
+    Uses pickle protocol 5. Buffers of ``bytes``, ``bytearray``,
+    ``array.array`` and NumPy arrays of at least
+    :data:`MIN_OUT_OF_BAND_SIZE` bytes are copied once into a shared
+    memory segment instead of being pickled and sent through the pipe of
+    the pool. Partitions of many small objects are pickled slower than by
+    :func:`dumps_pickle` because every object is checked for its size.
+
+    :param obj: The object to serialize.
+    :param bool unlink_by_reader:
+        (optional) Whether the reader removes the shared memory. By default
+        only for the results of tasks, see :func:`writing_task_result`.
+    :returns: The pickle or a :class:`SharedMemoryPayload`.
+    """
+    if shared_memory is None:
+        raise ValueError('Sending data through shared memory needs Python 3.8 or newer.')
+
+    f = io.BytesIO()
+    pickler = _OutOfBandPickler(f)
+    pickler.dump(obj)
+    if not pickler.buffers:
+        return f.getvalue()
+
+    segment = shared_memory.SharedMemory(create=True, size=pickler.size)
+    for offset, buffer in pickler.buffers:
+        segment.buf[offset:offset + buffer.nbytes] = buffer
+
+    if unlink_by_reader is None:
+        unlink_by_reader = getattr(_writer, 'task_result', False)
+    payload = SharedMemoryPayload(f.getvalue(), segment.name, pickler.layout, unlink_by_reader)
+    if payload.unlink_by_reader:
+        segment.close()
+    else:
+        weakref.finalize(payload, _unlink, segment)
+    log.debug('Wrote {0} bytes to shared memory {1}.'.format(pickler.size, segment.name))
+    return payload
+
+
+def _release_attached_segments():
+    for segment in list(_attached_segments):
+        try:
+            segment.close()
+        except BufferError:
+            continue  # objects that were loaded before still use the memory
+        _attached_segments.remove(segment)
+
+
+def loads_shared(data):
+    """deserialize the output of :func:`dumps_shared`
+
+    NumPy arrays use the shared memory without copying it. The memory is
+    released once they are not used anymore.
+
+    :param data: The pickle or a :class:`SharedMemoryPayload`.
+    """
+    if not isinstance(data, SharedMemoryPayload):
+        return pickle.loads(data)
+
+    _release_attached_segments()
+    segment = shared_memory.SharedMemory(name=data.name)
+    try:
+        return _SharedMemoryUnpickler(data, segment).load()
+    finally:
+        if data.unlink_by_reader:
+            segment.unlink()
+        _attached_segments.append(segment)
+        _release_attached_segments()
+
+
+class Serializer(object):
+    """a pair of functions to serialize and deserialize data
+
+    :param str name: Name in the registry.
+    :param dumps: Function that serializes an object.
+    :param loads: Function that deserializes the output of ``dumps``.
+    :param bool auto: Whether ``'auto'`` may select this serializer.
+    """
+
+    def __init__(self, name, dumps, loads, auto=True):
+        self.name = name
+        self.dumps = dumps
+        self.loads = loads
+        self.auto = auto
+
+    def __repr__(self):
+        return 'Serializer({0})'.format(self.name)
+
+
+_serializers = OrderedDict()
+
+
+def register_serializer(name, dumps, loads, auto=True):
+    """register a data serializer
+
+    Registered serializers can be given by name as ``data_serializer`` of a
+    :class:`~fast_pyspark_tester.Context`.
+
+    :param str name: Name of the serializer.
+    :param dumps: Function that serializes an object.
+    :param loads: Function that deserializes the output of ``dumps``.
+    :param bool auto: Whether ``'auto'`` may select this serializer.
+    """
+    _serializers[name] = Serializer(name, dumps, loads, auto)
+
+
+def get_serializer(name):
+    """registered serializer
+
+    :param str name: Name of the serializer.
+    :rtype: Serializer
+    """
+    try:
+        return _serializers[name]
+    except KeyError:
+        raise ValueError(
+            'Unknown data serializer {0}. Use one of {1}.'.format(name, ', '.join(['auto'] + list(_serializers)))
+        )
+
+
+def _elements(obj):
+    """index and elements of a partition that holds its elements
+
+    A :class:`SlicePartition` is left to pickle which only pickles its slice
+    and keeps slices of ``range`` objects small.
+    """
+    if type(obj) is Partition:  # pylint: disable=unidiomatic-typecheck
+        return obj.index, obj.x()
+    return None
+
+
+def _partition(index, elements):
+    p = Partition([], index)
+    p._x = elements  # pylint: disable=protected-access
+    return p
+
+
+def dumps_pickle(obj):
+    """pickle with the highest protocol"""
+    return pickle.dumps(obj, pickle.HIGHEST_PROTOCOL)
+
+
+# Serializers that only support some types start their output with a tag:
+# the fast format for partitions, the fast format for other objects or pickle.
+_PARTITION, _OBJECT, _PICKLE = b'P', b'O', b'X'
+
+# number of elements pickled in one frame by dumps_framed
+FRAME_SIZE = 1024
+
+
+def dumps_framed(obj):
+    """pickle the elements of a partition in frames of :data:`FRAME_SIZE`
+
+    Pickling every frame on its own keeps the memo of the pickler small
+    for partitions with many elements.
+    """
+    partition = _elements(obj)
+    if partition is None:
+        return _PICKLE + dumps_pickle(obj)
+
+    index, elements = partition
+    f = io.BytesIO()
+    f.write(_PARTITION)
+    for start in range(0, len(elements), FRAME_SIZE):
+        frame = dumps_pickle(elements[start:start + FRAME_SIZE])
+        f.write(struct.pack('<I', len(frame)))
+        f.write(frame)
+    f.write(struct.pack('<I', 0))
+    f.write(dumps_pickle(index))
+    return f.getvalue()
+
+
+def loads_framed(data):
+    """deserialize the output of :func:`dumps_framed`"""
+    view = memoryview(data)
+    if view[:1] != _PARTITION:
+        return pickle.loads(view[1:])
+
+    elements, offset = [], 1
+    while True:
+        (size,) = struct.unpack_from('<I', view, offset)
+        offset += 4
+        if not size:
+            break
+        elements += pickle.loads(view[offset:offset + size])
+        offset += size
+    return _partition(pickle.loads(view[offset:]), elements)
+
+
+def _dumps_tagged(obj, dumps_fast, errors):
+    partition = _elements(obj)
+    try:
+        if partition is not None:
+            return _PARTITION + dumps_fast(partition)
+        return _OBJECT + dumps_fast(obj)
+    except errors:
+        return _PICKLE + dumps_pickle(obj)
+
+
+def _loads_tagged(data, loads_fast):
+    tag, payload = data[:1], memoryview(data)[1:]
+    if tag == _PICKLE:
+        return pickle.loads(payload)
+    obj = loads_fast(payload)
+    return _partition(*obj) if tag == _PARTITION else obj
+
+
+def dumps_marshal(obj):
+    """serialize plain types with :mod:`marshal` and other objects with pickle"""
+    return _dumps_tagged(obj, marshal.dumps, (ValueError, TypeError))
+
+
+def loads_marshal(data):
+    """deserialize the output of :func:`dumps_marshal`"""
+    return _loads_tagged(data, lambda payload: marshal.loads(bytes(payload)))
+
+
+_MSGPACK_TUPLE = 1
+
+
+def _msgpack_default(obj):
+    # msgpack would return tuples as lists. Subclasses like Row and
+    # namedtuples are left to pickle to keep their type.
+    if type(obj) is tuple:  # pylint: disable=unidiomatic-typecheck
+        return msgpack.ExtType(_MSGPACK_TUPLE, msgpack.packb(list(obj), default=_msgpack_default, strict_types=True))
+    raise TypeError('{0} is not supported by msgpack'.format(type(obj)))
+
+
+def _msgpack_ext_hook(code, data):
+    if code == _MSGPACK_TUPLE:
+        return tuple(msgpack.unpackb(data, ext_hook=_msgpack_ext_hook, strict_map_key=False))
+    return msgpack.ExtType(code, data)
+
+
+def dumps_msgpack(obj):
+    """serialize plain types with msgpack and other objects with pickle"""
+    return _dumps_tagged(
+        obj,
+        lambda o: msgpack.packb(o, default=_msgpack_default, strict_types=True),
+        (TypeError, ValueError, OverflowError),
+    )
+
+
+def loads_msgpack(data):
+    """deserialize the output of :func:`dumps_msgpack`"""
+    return _loads_tagged(
+        data, lambda payload: msgpack.unpackb(payload, ext_hook=_msgpack_ext_hook, strict_map_key=False)
+    )
+
+
+register_serializer('pickle', dumps_pickle, pickle.loads)
+register_serializer('framed_pickle', dumps_framed, loads_framed)
+register_serializer('marshal', dumps_marshal, loads_marshal)
+if msgpack is not None:
+    register_serializer('msgpack', dumps_msgpack, loads_msgpack)
+if shared_memory is not None:
+    register_serializer('shared_memory', dumps_shared, loads_shared, auto=False)
+
+
+def sample_elements(partitions, size=100):
+    """elements of the first partitions that hold their elements
+
+    :param list partitions: Partitions of an RDD.
+    :param int size: Maximum number of elements.
+    :rtype: list
+    """
+    sample = []
+    for p in partitions:
+        if type(p) not in (Partition, SlicePartition):  # pylint: disable=unidiomatic-typecheck
+            continue
+        sample += p.head(size - len(sample))
+        if len(sample) >= size:
+            break
+    return sample
+
+
+def _same_types(a, b):
+    """whether a and b and the elements of containers have the same types"""
+    if type(a) is not type(b):  # pylint: disable=unidiomatic-typecheck
+        return False
+    if isinstance(a, (list, tuple)):
+        return len(a) == len(b) and all(map(_same_types, a, b))
+    if isinstance(a, dict):
+        return all(_same_types(ka, kb) and _same_types(va, vb) for (ka, va), (kb, vb) in zip(a.items(), b.items()))
+    return True
+
+
+def select_serializer(sample, repeat=3):
+    """the fastest serializer that can serialize the sample
+
+    Every serializer that ``'auto'`` may select serializes and deserializes
+    a partition with the sample. Serializers that do not give back equal
+    elements of the same types are skipped.
+
+    :param list sample: Elements of a partition.
+    :param int repeat: Number of measurements of every serializer.
+    :returns: The serializer and the measured seconds of every serializer by name.
+    :rtype: tuple
+    """
+    partition = _partition(0, sample)
+    timings = {}
+    for serializer in _serializers.values():
+        if not serializer.auto:
+            continue
+        try:
+            loaded = serializer.loads(serializer.dumps(partition)).x()
+            if loaded != sample or not _same_types(loaded, sample):
+                continue
+        except Exception:  # pylint: disable=broad-except
+            continue
+        timings[serializer.name] = min(
+            timeit.repeat(lambda s=serializer: s.loads(s.dumps(partition)), number=1, repeat=repeat)
+        )
+
+    name = min(timings, key=timings.get, default='pickle')
+    log.debug('Selected the {0} data serializer with timings {1}.'.format(name, timings))
+    return _serializers[name], timings
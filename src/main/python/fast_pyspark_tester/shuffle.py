@@ -0,0 +1,151 @@
+"""Stores the map output of shuffles until the reduce side reads it."""
+
+from __future__ import division, absolute_import, print_function, unicode_literals
+
+import glob
+import itertools
+import logging
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import weakref
+
+log = logging.getLogger(__name__)
+
+
+class ShuffleManager(object):
+    """shuffle manager
+
+    A map task splits its partition into one bucket per reduce partition
+    and hands the buckets to :func:`ShuffleManager.write()`. The returned
+    map status is small and is all the driver keeps of the map output. A
+    reduce task passes the map statuses to :func:`ShuffleManager.read()`
+    to stream the elements of its own bucket.
+
+    Buckets are kept in memory when all tasks run in the driver process.
+    Otherwise every attempt of a map task writes its buckets one after the
+    other into a new file of a local spill directory and the map status
+    holds the name of that file and the offsets of the buckets in it. An
+    abandoned or losing attempt that finishes late therefore cannot
+    overwrite the output of the attempt that won.
+
+    :param bool in_memory: Keep the buckets in memory.
+    :param spill_dir:
+        Directory for the bucket files. A temporary directory that is
+        removed at exit is created when needed if this is not given.
+    :param serializer: Use to serialize buckets.
+    :param deserializer: Use to deserialize buckets.
+    """
+
+    def __init__(self, in_memory=True, spill_dir=None, serializer=None, deserializer=None):
+        self.in_memory = in_memory
+        self.spill_dir = spill_dir
+        self.serializer = serializer if serializer else pickle.dumps
+        self.deserializer = deserializer if deserializer else pickle.loads
+
+        self.buckets = {}
+        self.shuffle_cnt = 0
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        return {k: v if k not in ('buckets',) else {} for k, v in self.__dict__.items() if k != '_lock'}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def new_shuffle_id(self):
+        with self._lock:
+            if not self.in_memory and self.spill_dir is None:
+                self.spill_dir = tempfile.mkdtemp(prefix='fast_pyspark_tester_shuffle_')
+                weakref.finalize(self, shutil.rmtree, self.spill_dir, True)
+
+            self.shuffle_cnt += 1
+            return self.shuffle_cnt
+
+    @staticmethod
+    def _bucket_file_prefix(shuffle_id, map_id):
+        return 'shuffle_{0}_{1}_'.format(shuffle_id, map_id)
+
+    def write(self, shuffle_id, map_id, buckets):
+        """store the buckets of one map task
+
+        :param int shuffle_id: Obtained with :func:`ShuffleManager.new_shuffle_id()`.
+        :param int map_id: Index of the map partition.
+        :param list buckets: A list of elements for every reduce partition.
+        :returns: The map status to pass to :func:`ShuffleManager.read()`.
+        """
+        if self.in_memory:
+            self.buckets[(shuffle_id, map_id)] = buckets
+            return [len(bucket) for bucket in buckets]
+
+        fd, path = tempfile.mkstemp(
+            prefix=self._bucket_file_prefix(shuffle_id, map_id), suffix='.data', dir=self.spill_dir
+        )
+        offsets = [0]
+        with os.fdopen(fd, 'wb') as f:
+            for bucket in buckets:
+                if bucket:
+                    f.write(self.serializer(bucket))
+                offsets.append(f.tell())
+        log.debug('Wrote shuffle {0} map output {1} ({2} bytes).'.format(shuffle_id, map_id, offsets[-1]))
+        return os.path.basename(path), offsets
+
+    def read(self, shuffle_id, map_statuses, reduce_id):
+        """elements of one reduce partition
+
+        :param int shuffle_id: Obtained with :func:`ShuffleManager.new_shuffle_id()`.
+        :param map_statuses: Pairs of map partition index and map status.
+        :param int reduce_id: Index of the reduce partition.
+        :returns: An iterator over the elements of all map outputs.
+        """
+        return itertools.chain.from_iterable(
+            self._read_bucket(shuffle_id, map_id, status, reduce_id) for map_id, status in map_statuses
+        )
+
+    def _read_bucket(self, shuffle_id, map_id, status, reduce_id):
+        if self.in_memory:
+            return self.buckets[(shuffle_id, map_id)][reduce_id] if status[reduce_id] else []
+
+        file_name, offsets = status
+        start, end = offsets[reduce_id], offsets[reduce_id + 1]
+        if start == end:
+            return []
+        with open(os.path.join(self.spill_dir, file_name), 'rb') as f:
+            f.seek(start)
+            return self.deserializer(f.read(end - start))
+
+    def bucket_size(self, status, reduce_id):
+        """size of a bucket in a map output
+
+        This is a number of elements for buckets in memory and a number of
+        bytes for buckets in files.
+
+        :param status: Map status returned by :func:`ShuffleManager.write()`.
+        :param int reduce_id: Index of the reduce partition.
+        :rtype: int
+        """
+        if self.in_memory:
+            return status[reduce_id]
+        _, offsets = status
+        return offsets[reduce_id + 1] - offsets[reduce_id]
+
+    def remove(self, shuffle_id, map_ids):
+        """remove the map output of a shuffle, including that of lost attempts
+
+        :param int shuffle_id: Obtained with :func:`ShuffleManager.new_shuffle_id()`.
+        :param map_ids: Indices of the map partitions.
+        """
+        for map_id in map_ids:
+            if self.in_memory:
+                self.buckets.pop((shuffle_id, map_id), None)
+            elif self.spill_dir is not None:
+                pattern = os.path.join(self.spill_dir, self._bucket_file_prefix(shuffle_id, map_id) + '*.data')
+                for path in glob.glob(pattern):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+        log.debug('Removed shuffle {0}.'.format(shuffle_id))
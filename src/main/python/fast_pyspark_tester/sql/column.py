@@ -1,5 +1,9 @@
 from fast_pyspark_tester.sql.expressions.expressions import Expression
-from fast_pyspark_tester.sql.expressions.fields import find_position_in_schema
+from fast_pyspark_tester.sql.expressions.fields import (
+    find_position_in_schema,
+    bind_position_in_schema,
+    compile_field_getter,
+)
 from fast_pyspark_tester.sql.expressions.literals import Literal
 from fast_pyspark_tester.sql.expressions.mappers import StarOperator, CaseWhen
 from fast_pyspark_tester.sql.expressions.operators import (
@@ -65,6 +69,8 @@ class Column(object):
 
     def __init__(self, expr):
         self.expr = expr
+        self.bound_schema = None
+        self.bound_position = None
 
     # arithmetic operators
     def __neg__(self):
@@ -623,8 +629,19 @@ class Column(object):
         if isinstance(self.expr, Expression):
             return self.expr.eval(row, schema)
 
+        if schema is self.bound_schema:
+            return row[self.bound_position]
+
         return row[self.find_position_in_schema(schema)]
 
+    def compile(self, schema):
+        """
+        Return a function that takes a row of schema and returns the same value as eval
+        """
+        if isinstance(self.expr, Expression):
+            return self.expr.compile(schema)
+        return compile_field_getter(self, schema, self.expr)
+
     def find_fields_in_schema(self, schema):
         if isinstance(self.expr, Expression):
             return self.expr.output_fields(schema)
@@ -673,6 +690,17 @@ class Column(object):
             self.expr.recursive_initialize(partition_index)
         return self
 
+    def bind(self, schema):
+        """
+        Resolve the position of the fields used by this column in schema,
+        evaluations on rows of this schema then use these positions directly.
+        """
+        if isinstance(self.expr, Expression):
+            self.expr.recursive_bind(schema)
+        else:
+            self.bound_schema, self.bound_position = bind_position_in_schema(schema, self.expr)
+        return self
+
     def with_pre_evaluation_schema(self, pre_evaluation_schema):
         if isinstance(self.expr, Expression):
             self.expr.recursive_pre_evaluation_schema(pre_evaluation_schema)
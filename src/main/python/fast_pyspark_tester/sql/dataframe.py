@@ -240,6 +240,18 @@ class DataFrame(object):
         """
         return self._jdf.count()
 
+    def countAsync(self):
+        """Returns a future of the number of rows in this :class:`DataFrame`.
+
+        >>> from fast_pyspark_tester import Context
+        >>> from fast_pyspark_tester.sql.session import SparkSession
+        >>> spark = SparkSession(Context())
+        >>> df = spark.range(2)
+        >>> df.countAsync().result()
+        2
+        """
+        return self.sql_ctx._sc._submit(self.count)
+
     def collect(self):
         """Returns the number of rows in this :class:`DataFrame`.
 
@@ -252,6 +264,18 @@ class DataFrame(object):
         """
         return self._jdf.collect()
 
+    def collectAsync(self):
+        """Returns a future of the rows of this :class:`DataFrame`.
+
+        >>> from fast_pyspark_tester import Context
+        >>> from fast_pyspark_tester.sql.session import SparkSession
+        >>> spark = SparkSession(Context())
+        >>> df = spark.range(2)
+        >>> df.collectAsync().result()
+        [Row(id=0), Row(id=1)]
+        """
+        return self.sql_ctx._sc._submit(self.collect)
+
     def toLocalIterator(self):
         """Returns an iterator on the content of this DataFrame
 
@@ -291,6 +315,17 @@ class DataFrame(object):
         """
         return self._jdf.take(n)
 
+    def takeAsync(self, n):
+        """Return a future of a list with the first n items of the DataFrame
+
+        >>> from fast_pyspark_tester import Context
+        >>> from fast_pyspark_tester.sql.session import SparkSession
+        >>> spark = SparkSession(Context())
+        >>> spark.range(2).takeAsync(1).result()
+        [Row(id=0)]
+        """
+        return self.sql_ctx._sc._submit(self.take, n)
+
     def foreach(self, f):
         """Execute a function for each item of the DataFrame
 
@@ -305,6 +340,21 @@ class DataFrame(object):
         """
         self._jdf.foreach(f)
 
+    def foreachAsync(self, f):
+        """Execute a function for each item of the DataFrame in the background
+
+        >>> from fast_pyspark_tester import Context
+        >>> from fast_pyspark_tester.sql.session import SparkSession
+        >>> spark = SparkSession(Context())
+        >>> rows = []
+        >>> future = spark.range(2).foreachAsync(rows.append)
+        >>> future.result() is None
+        True
+        >>> rows
+        [Row(id=0), Row(id=1)]
+        """
+        return self.sql_ctx._sc._submit(self.foreach, f)
+
     def foreachPartition(self, f):
         """Execute a function for each partition of the DataFrame
 
@@ -344,8 +394,8 @@ class DataFrame(object):
         >>> df.storageLevel == StorageLevel.MEMORY_ONLY
         True
         """
-        if storageLevel != StorageLevel.MEMORY_ONLY:
-            raise NotImplementedError('Pysparkling currently only supports memory as the storage level')
+        if storageLevel.useOffHeap:
+            raise NotImplementedError('Pysparkling does not support off-heap storage levels')
         return DataFrame(self._jdf.persist(storageLevel), self.sql_ctx)
 
     @property
@@ -1,3 +1,5 @@
+from functools import partial
+
 from fast_pyspark_tester.sql.casts import get_caster
 from fast_pyspark_tester.sql.types import (
     StructField,
@@ -16,6 +18,15 @@ class Expression(object):
     def eval(self, row, schema):
         raise NotImplementedError
 
+    def compile(self, schema):
+        """
+        Return a function that takes a row of schema and returns the same value as eval
+
+        Subclasses override it to return closures that do not walk the expression tree
+        for each row, this default falls back to eval.
+        """
+        return partial(self.eval, schema=schema)
+
     def __str__(self):
         raise NotImplementedError
 
@@ -118,6 +129,31 @@ class Expression(object):
     def initialize(self, partition_index):
         pass
 
+    def recursive_bind(self, schema):
+        """
+        This methods resolves once the position of the fields read by expressions
+        so that evaluating them on rows of schema does not search the schema again
+        """
+        self.bind(schema)
+        self.children_bind(self.children, schema)
+
+    @staticmethod
+    def children_bind(children, schema):
+        # Top level import would cause cyclic dependencies
+        # pylint: disable=import-outside-toplevel
+        from fast_pyspark_tester.sql.column import Column
+
+        for child in children:
+            if isinstance(child, Expression):
+                child.recursive_bind(schema)
+            elif isinstance(child, Column):
+                child.bind(schema)
+            elif isinstance(child, (list, set, tuple)):
+                Expression.children_bind(child, schema)
+
+    def bind(self, schema):
+        pass
+
     # Adding information about the schema that was defined in the step prior the evaluation
     def with_pre_evaluation_schema(self, schema):
         self.pre_evaluation_schema = schema
@@ -185,6 +221,26 @@ class TypeSafeBinaryOperation(BinaryOperation):
     def eval(self, row, schema):
         value_1 = self.arg1.eval(row, schema)
         value_2 = self.arg2.eval(row, schema)
+        return self.type_safe_operation(value_1, value_2)
+
+    def compile(self, schema):
+        arg1 = self.arg1.compile(schema)
+        arg2 = self.arg2.compile(schema)
+        unsafe_operation = self.unsafe_operation
+        type_safe_operation = self.type_safe_operation
+
+        def compiled(row):
+            value_1 = arg1(row)
+            value_2 = arg2(row)
+            if value_1 is None or value_2 is None:
+                return None
+            if value_1.__class__ is value_2.__class__:
+                return unsafe_operation(value_1, value_2)
+            return type_safe_operation(value_1, value_2)
+
+        return compiled
+
+    def type_safe_operation(self, value_1, value_2):
         if value_1 is None or value_2 is None:
             return None
 
@@ -229,6 +285,26 @@ class NullSafeBinaryOperation(BinaryOperation):
     def eval(self, row, schema):
         value_1 = self.arg1.eval(row, schema)
         value_2 = self.arg2.eval(row, schema)
+        return self.null_safe_operation(value_1, value_2)
+
+    def compile(self, schema):
+        arg1 = self.arg1.compile(schema)
+        arg2 = self.arg2.compile(schema)
+        unsafe_operation = self.unsafe_operation
+        null_safe_operation = self.null_safe_operation
+
+        def compiled(row):
+            value_1 = arg1(row)
+            value_2 = arg2(row)
+            if value_1 is None or value_2 is None:
+                return None
+            if value_1.__class__ is value_2.__class__:
+                return unsafe_operation(value_1, value_2)
+            return null_safe_operation(value_1, value_2)
+
+        return compiled
+
+    def null_safe_operation(self, value_1, value_2):
         if value_1 is None or value_2 is None:
             return None
 
@@ -258,6 +334,11 @@ class NullSafeColumnOperation(Expression):
         value = self.column.eval(row, schema)
         return self.unsafe_operation(value)
 
+    def compile(self, schema):
+        column = self.column.compile(schema)
+        unsafe_operation = self.unsafe_operation
+        return lambda row: unsafe_operation(column(row))
+
     def __str__(self):
         raise NotImplementedError
 
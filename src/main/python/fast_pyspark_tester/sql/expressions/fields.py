@@ -1,3 +1,5 @@
+from functools import partial
+
 from fast_pyspark_tester.sql.expressions.expressions import Expression
 from fast_pyspark_tester.sql.types import StructField
 from fast_pyspark_tester.sql.utils import AnalysisException
@@ -7,10 +9,20 @@ class FieldAsExpression(Expression):
     def __init__(self, field):
         super().__init__()
         self.field = field
+        self.bound_schema = None
+        self.bound_position = None
 
     def eval(self, row, schema):
+        if schema is self.bound_schema:
+            return row[self.bound_position]
         return row[find_position_in_schema(schema, self.field)]
 
+    def bind(self, schema):
+        self.bound_schema, self.bound_position = bind_position_in_schema(schema, self.field)
+
+    def compile(self, schema):
+        return compile_field_getter(self, schema, self.field)
+
     def __str__(self):
         return self.field.name
 
@@ -44,6 +56,31 @@ def find_position_in_schema(schema, expr):
     return get_checked_matches(matches, field_name, schema, show_id)
 
 
+def bind_position_in_schema(schema, expr):
+    """
+    Return the couple (schema, position of expr in schema) or (None, None)
+    if expr cannot be resolved in this schema: the error is then raised
+    when the expression is evaluated, as it is without binding.
+    """
+    try:
+        return schema, find_position_in_schema(schema, expr)
+    except AnalysisException:
+        return None, None
+
+
+def compile_field_getter(column, schema, expr):
+    """
+    Return a function reading the value of expr from a row of schema,
+    column.eval is used if expr cannot be resolved so that the error
+    is only raised when a row is evaluated.
+    """
+    bound_schema, position = bind_position_in_schema(schema, expr)
+    if bound_schema is None:
+        return partial(column.eval, schema=schema)
+    getter = tuple.__getitem__
+    return lambda row: getter(row, position)
+
+
 def get_checked_matches(matches, field_name, schema, show_id):
     if not matches:
         raise AnalysisException(
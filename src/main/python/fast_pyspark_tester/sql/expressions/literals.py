@@ -10,6 +10,10 @@ class Literal(Expression):
     def eval(self, row, schema):
         return self.value
 
+    def compile(self, schema):
+        value = self.value
+        return lambda row: value
+
     def __str__(self):
         if self.value is True:
             return "true"
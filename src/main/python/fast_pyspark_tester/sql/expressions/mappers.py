@@ -31,6 +31,15 @@ class StarOperator(Expression):
     def eval(self, row, schema):
         return [row[col] for col in row.__fields__]
 
+    def compile(self, schema):
+        def compiled(row):
+            fields = row.__fields__
+            if len(set(fields)) == len(fields):
+                return list(row)
+            return [row[col] for col in fields]
+
+        return compiled
+
     def __str__(self):
         return '*'
 
@@ -49,6 +58,20 @@ class CaseWhen(Expression):
                 return function.eval(row, schema)
         return None
 
+    def compile(self, schema):
+        branches = [
+            (condition.compile(schema), function.compile(schema))
+            for condition, function in zip(self.conditions, self.values)
+        ]
+
+        def compiled(row):
+            for condition, function in branches:
+                if condition(row):
+                    return function(row)
+            return None
+
+        return compiled
+
     def __str__(self):
         return 'CASE {0} END'.format(
             ' '.join(
@@ -80,6 +103,23 @@ class Otherwise(Expression):
             return self.default.eval(row, schema)
         return None
 
+    def compile(self, schema):
+        branches = [
+            (condition.compile(schema), function.compile(schema))
+            for condition, function in zip(self.conditions, self.values)
+        ]
+        default = self.default.compile(schema) if self.default is not None else None
+
+        def compiled(row):
+            for condition, function in branches:
+                if condition(row):
+                    return function(row)
+            if default is not None:
+                return default(row)
+            return None
+
+        return compiled
+
     def __str__(self):
         return 'CASE {0} ELSE {1} END'.format(
             ' '.join(
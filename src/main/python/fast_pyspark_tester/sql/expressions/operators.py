@@ -13,6 +13,10 @@ class Negate(UnaryExpression):
     def eval(self, row, schema):
         return - self.column.eval(row, schema)
 
+    def compile(self, schema):
+        column = self.column.compile(schema)
+        return lambda row: - column(row)
+
     def __str__(self):
         return '(- {0})'.format(self.column)
 
@@ -128,6 +132,17 @@ class Invert(UnaryExpression):
             return None
         return not value
 
+    def compile(self, schema):
+        column = self.column.compile(schema)
+
+        def compiled(row):
+            value = column(row)
+            if value is None:
+                return None
+            return not value
+
+        return compiled
+
     def __str__(self):
         return '(NOT {0})'.format(self.column)
 
@@ -141,6 +156,11 @@ class BitwiseOr(Expression):
     def eval(self, row, schema):
         return self.arg1.eval(row, schema) | self.arg2.eval(row, schema)
 
+    def compile(self, schema):
+        arg1 = self.arg1.compile(schema)
+        arg2 = self.arg2.compile(schema)
+        return lambda row: arg1(row) | arg2(row)
+
     def __str__(self):
         return '({0} | {1})'.format(self.arg1, self.arg2)
 
@@ -154,6 +174,11 @@ class BitwiseAnd(Expression):
     def eval(self, row, schema):
         return self.arg1.eval(row, schema) & self.arg2.eval(row, schema)
 
+    def compile(self, schema):
+        arg1 = self.arg1.compile(schema)
+        arg2 = self.arg2.compile(schema)
+        return lambda row: arg1(row) & arg2(row)
+
     def __str__(self):
         return '({0} & {1})'.format(self.arg1, self.arg2)
 
@@ -167,6 +192,11 @@ class BitwiseXor(Expression):
     def eval(self, row, schema):
         return self.arg1.eval(row, schema) ^ self.arg2.eval(row, schema)
 
+    def compile(self, schema):
+        arg1 = self.arg1.compile(schema)
+        arg2 = self.arg2.compile(schema)
+        return lambda row: arg1(row) ^ arg2(row)
+
     def __str__(self):
         return '({0} ^ {1})'.format(self.arg1, self.arg2)
 
@@ -188,6 +218,11 @@ class EqNullSafe(Expression):
     def eval(self, row, schema):
         return self.arg1.eval(row, schema) == self.arg2.eval(row, schema)
 
+    def compile(self, schema):
+        arg1 = self.arg1.compile(schema)
+        arg2 = self.arg2.compile(schema)
+        return lambda row: arg1(row) == arg2(row)
+
     def __str__(self):
         return '({0} <=> {1})'.format(self.arg1, self.arg2)
 
@@ -267,6 +302,11 @@ class IsIn(Expression):
     def eval(self, row, schema):
         return self.arg1.eval(row, schema) in self.cols
 
+    def compile(self, schema):
+        arg1 = self.arg1.compile(schema)
+        cols = self.cols
+        return lambda row: arg1(row) in cols
+
     def __str__(self):
         return '({0} IN ({1}))'.format(self.arg1, ', '.join(str(col) for col in self.cols))
 
@@ -275,6 +315,10 @@ class IsNotNull(UnaryExpression):
     def eval(self, row, schema):
         return self.column.eval(row, schema) is not None
 
+    def compile(self, schema):
+        column = self.column.compile(schema)
+        return lambda row: column(row) is not None
+
     def __str__(self):
         return '({0} IS NOT NULL)'.format(self.column)
 
@@ -283,6 +327,10 @@ class IsNull(UnaryExpression):
     def eval(self, row, schema):
         return self.column.eval(row, schema) is None
 
+    def compile(self, schema):
+        column = self.column.compile(schema)
+        return lambda row: column(row) is None
+
     def __str__(self):
         return '({0} IS NULL)'.format(self.column)
 
@@ -297,6 +345,11 @@ class Cast(Expression):
     def eval(self, row, schema):
         return self.caster(self.column.eval(row, schema))
 
+    def compile(self, schema):
+        column = self.column.compile(schema)
+        caster = self.caster
+        return lambda row: caster(column(row))
+
     def __str__(self):
         return '{0}'.format(self.column)
 
@@ -345,11 +398,17 @@ class Alias(Expression):
     def __str__(self):
         return self.alias
 
+    def compile(self, schema):
+        return self.expr.compile(schema)
+
 
 class UnaryPositive(UnaryExpression):
     def eval(self, row, schema):
         return self.column.eval(row, schema)
 
+    def compile(self, schema):
+        return self.column.compile(schema)
+
     def __str__(self):
         return "(+ {0})".format(self.column)
 
@@ -24,7 +24,7 @@ class AscNullsLast(SortOrder):
 
 
 class DescNullsFirst(SortOrder):
-    sort_order = 'DESCNULLS FIRST'
+    sort_order = 'DESC NULLS FIRST'
 
 
 class DescNullsLast(SortOrder):
@@ -1,13 +1,15 @@
 import itertools
 import json
-import math
 import warnings
 from collections import Counter
 from copy import deepcopy
 from functools import partial
 
 from fast_pyspark_tester import StorageLevel
+from fast_pyspark_tester.rdd import ZippedPartitionsRDD
 from fast_pyspark_tester.sql.column import parse
+from fast_pyspark_tester.sql.expressions.fields import FieldAsExpression, bind_position_in_schema
+from fast_pyspark_tester.sql.expressions.operators import And, Equal, EqNullSafe
 from fast_pyspark_tester.sql.functions import (
     array,
     map_from_arrays,
@@ -41,13 +43,15 @@ from fast_pyspark_tester.sql.types import (
     DataType,
     Row,
     LongType,
+    AtomicType,
+    NumericType,
 )
 from fast_pyspark_tester.sql.utils import IllegalArgumentException
 from fast_pyspark_tester.stat_counter import RowStatHelper, CovarianceCounter
 from fast_pyspark_tester.utils import (
     get_keyfunc,
-    compute_weighted_percentiles,
-    reservoir_sample_and_size,
+    get_sort_keyfunc,
+    get_range_bounds,
     pad_cell,
     str_half_width,
     format_cell,
@@ -57,6 +61,87 @@ from fast_pyspark_tester.utils import (
 )
 
 
+CODEGEN_CONF = 'spark.sql.codegen.wholeStage'
+
+
+def is_codegen_enabled():
+    """
+    Whether select and filter evaluate compiled expressions (see Expression.compile)
+    instead of interpreting the expression trees, this is disabled by setting
+    the session configuration spark.sql.codegen.wholeStage to false.
+    """
+    # Top level import would cause cyclic dependencies
+    # pylint: disable=import-outside-toplevel
+    from fast_pyspark_tester.sql.session import SparkSession
+
+    session = SparkSession.getActiveSession()
+    if session is None:
+        return True
+    return str(session.conf.get(CODEGEN_CONF, 'true')).lower() != 'false'
+
+
+def split_conjuncts(condition):
+    """
+    Return the list of the predicates that are combined with AND in condition
+    """
+    expr = condition.expr if hasattr(condition, 'expr') else condition
+    if isinstance(expr, And):
+        return split_conjuncts(expr.arg1) + split_conjuncts(expr.arg2)
+    return [condition]
+
+
+def get_equi_join_keys(condition, left_schema, merged_schema):
+    """
+    Split a join condition into the keys of a hash join and the other predicates
+
+    A predicate is a key if it is an equality (= or <=>) between a field of the left side
+    and a field of the right side whose values are equal exactly when they are equal in Python:
+    both fields must be numbers or have the same atomic type.
+
+    Return (left_positions, right_positions, null_safe, remaining) where the positions are the
+    ones of the key fields in the left and right schemas, null_safe tells for each key if None
+    values match each other and remaining is the list of the other predicates
+    """
+    left_size = len(left_schema.fields)
+    left_positions, right_positions, null_safe, remaining = [], [], [], []
+    for conjunct in split_conjuncts(condition):
+        expr = conjunct.expr if hasattr(conjunct, 'expr') else conjunct
+        if isinstance(expr, (Equal, EqNullSafe)):
+            position_1 = get_field_position(expr.arg1, merged_schema)
+            position_2 = get_field_position(expr.arg2, merged_schema)
+            if (
+                position_1 is not None
+                and position_2 is not None
+                and (position_1 < left_size) != (position_2 < left_size)
+                and are_hash_compatible(merged_schema.fields[position_1], merged_schema.fields[position_2])
+            ):
+                left_position, right_position = sorted((position_1, position_2))
+                left_positions.append(left_position)
+                right_positions.append(right_position - left_size)
+                null_safe.append(isinstance(expr, EqNullSafe))
+                continue
+        remaining.append(conjunct)
+
+    return left_positions, right_positions, null_safe, remaining
+
+
+def get_field_position(col, schema):
+    """
+    Return the position in schema of the field that col reads or None if col is not a field of schema
+    """
+    expr = col.expr if hasattr(col, 'expr') else col
+    if not isinstance(expr, (str, FieldAsExpression)):
+        return None
+    return bind_position_in_schema(schema, expr)[1]
+
+
+def are_hash_compatible(field_1, field_2):
+    type_1, type_2 = field_1.dataType, field_2.dataType
+    if isinstance(type_1, NumericType) and isinstance(type_2, NumericType):
+        return True
+    return isinstance(type_1, AtomicType) and type_1.__class__ is type_2.__class__
+
+
 class FieldIdGenerator(object):
     """
     This metaclass adds an unique ID to all instances of its classes.
@@ -140,7 +225,7 @@ class DataFrameInternal(object):
         if end is None:
             start, end = 0, start
 
-        rdd = sc.parallelize(([i] for i in range(start, end, step)), numSlices=numPartitions)
+        rdd = sc.parallelize(range(start, end, step), numSlices=numPartitions).map(lambda i: [i])
         return DataFrameInternal(sc, rdd, ['id'], True)
 
     def count(self):
@@ -204,6 +289,9 @@ class DataFrameInternal(object):
         )
 
     def repartition(self, numPartitions, cols):
+        for col in cols:
+            col.bind(self.bound_schema)
+
         def partitioner(row):
             return sum(hash(c.eval(row, self.bound_schema)) for c in cols)
 
@@ -211,96 +299,13 @@ class DataFrameInternal(object):
 
     def repartitionByRange(self, numPartitions, *cols):
         key = get_keyfunc(cols, self.bound_schema)
-        bounds = self._get_range_bounds(self._rdd, numPartitions, key=key)
+        bounds = get_range_bounds(self._rdd, numPartitions, key=key, sample_size=1e6)
 
         def get_range_id(value):
             return sum(1 for bound in bounds if key(bound) < key(value))
 
         return self.repartitionByValues(numPartitions, partitioner=get_range_id)
 
-    @staticmethod
-    def _get_range_bounds(rdd, numPartitions, key):
-        if numPartitions == 0:
-            return []
-
-        # pylint: disable=W0511
-        # todo: check if sample_size is set in SQLConf.get.rangeExchangeSampleSizePerPartition
-        # sample_size = min(
-        #   SQLConf.get.rangeExchangeSampleSizePerPartition * rdd.getNumPartitions(),
-        #   1e6
-        # )
-        sample_size = 1e6
-        sample_size_per_partition = math.ceil(3 * sample_size / numPartitions)
-        sketched_rdd = DataFrameInternal.sketch_rdd(rdd, sample_size_per_partition)
-        rdd_size = sum(partition_size for partition_size, sample in sketched_rdd.values())
-
-        if rdd_size == 0:
-            return []
-
-        fraction = sample_size / rdd_size
-
-        candidates, imbalanced_partitions = DataFrameInternal._get_initial_candidates(
-            sketched_rdd, sample_size_per_partition, fraction
-        )
-
-        additional_candidates = DataFrameInternal._get_additional_candidates(rdd, imbalanced_partitions, fraction)
-
-        candidates += additional_candidates
-        bounds = compute_weighted_percentiles(candidates, min(numPartitions, len(candidates)) + 1, key=key)[1:-1]
-        return bounds
-
-    @staticmethod
-    def _get_initial_candidates(sketched_rdd, sample_size_per_partition, fraction):
-        candidates = []
-        imbalanced_partitions = set()
-        for idx, (partition_size, sample) in sketched_rdd.items():
-            # Partition is bigger than (3 times) average and more than sample_size_per_partition
-            # is needed to get accurate information on its distribution
-            if fraction * partition_size > sample_size_per_partition:
-                imbalanced_partitions.add(idx)
-            else:
-                # The weight is 1 over the sampling probability.
-                weight = partition_size / len(sample)
-                candidates += [(key, weight) for key in sample]
-        return candidates, imbalanced_partitions
-
-    @staticmethod
-    def _get_additional_candidates(rdd, imbalanced_partitions, fraction):
-        additional_candidates = []
-        if imbalanced_partitions:
-            # Re-sample imbalanced partitions with the desired sampling probability.
-            def keep_imbalanced_partitions(partition_id, x):
-                return x if partition_id in imbalanced_partitions else []
-
-            resampled = (
-                rdd.mapPartitionsWithIndex(keep_imbalanced_partitions)
-                .sample(withReplacement=False, fraction=fraction, seed=rdd.id())
-                .collect()
-            )
-            weight = (1.0 / fraction).toFloat
-            additional_candidates += [(x, weight) for x in resampled]
-        return additional_candidates
-
-    @staticmethod
-    def sketch_rdd(rdd, sample_size_per_partition):
-        """
-        Get a subset per partition of an RDD
-
-        Sampling algorithm is reservoir sampling.
-
-        :param rdd:
-        :param sample_size_per_partition:
-        :return:
-        """
-
-        def sketch_partition(idx, x):
-            sample, original_size = reservoir_sample_and_size(x, sample_size_per_partition, seed=rdd.id() + idx)
-            return [(idx, (original_size, sample))]
-
-        sketched_rdd_content = rdd.mapPartitionsWithIndex(sketch_partition).collect()
-
-        return dict(sketched_rdd_content)
-
     def sampleBy(self, col, fractions, seed):
         fractions_as_col = map_from_arrays(array(*(map(lit, fractions.keys()))), array(*map(lit, fractions.values())))
 
@@ -322,19 +327,8 @@ class DataFrameInternal(object):
         return self._with_rdd(self._rdd.mapPartitions(partition_sort), self.bound_schema)
 
     def sort(self, cols):
-        # Pysparkling implementation of RDD.sortBy is an in-order sort,
-        # calling it multiple times allow sorting
-        # based on multiple criteria and ascending orders
-        # pylint: disable=W0511
-        # Todo: this could be optimized as it's possible to sort
-        #  together columns that are in the same ascending order
-        sorted_rdd = self._rdd
-        for col in cols[::-1]:
-            ascending = col.sort_order in ['ASC NULLS FIRST', 'ASC NULLS LAST']
-            nulls_are_smaller = col.sort_order in ['DESC NULLS LAST', 'ASC NULLS FIRST']
-            key = get_keyfunc([col], self.bound_schema, nulls_are_smaller=nulls_are_smaller)
-            sorted_rdd = sorted_rdd.sortBy(key, ascending=ascending)
-        return self._with_rdd(sorted_rdd, self.bound_schema)
+        key = get_sort_keyfunc(cols, self.bound_schema)
+        return self._with_rdd(self._rdd.sortBy(key), self.bound_schema)
 
     def select(self, *exprs):
         cols = [parse(e) for e in exprs]
@@ -343,6 +337,10 @@ class DataFrameInternal(object):
             df_as_group = InternalGroupedDataFrame(self, [])
             return df_as_group.agg(exprs)
 
+        for col in cols:
+            col.bind(self.bound_schema)
+        use_codegen = is_codegen_enabled()
+
         def select_mapper(partition_index, partition):
             # Initialize non deterministic functions so that they are reproducible
             initialized_cols = [col.initialize(partition_index) for col in cols]
@@ -356,6 +354,9 @@ class DataFrameInternal(object):
                     )
                 )
 
+            if use_codegen and not generators:
+                return self.get_compiled_select_output(partition, non_generators)
+
             return self.get_select_output_field_lists(
                 partition, non_generators, initialized_cols, generators[0] if generators else None,
             )
@@ -379,6 +380,21 @@ class DataFrameInternal(object):
                 output_rows.append(row_from_keyed_values(base_row_fields, metadata=row.get_metadata()))
         return output_rows
 
+    def get_compiled_select_output(self, partition, cols):
+        output_names = tuple(field.name for col in cols for field in col.output_fields(self.bound_schema))
+        evaluators = [(col.compile(self.bound_schema), col.may_output_multiple_cols) for col in cols]
+
+        def get_values(row):
+            values = []
+            for evaluator, may_output_multiple_cols in evaluators:
+                if may_output_multiple_cols:
+                    values += evaluator(row)
+                else:
+                    values.append(evaluator(row))
+            return values
+
+        return [create_row(output_names, get_values(row), metadata=row.get_metadata()) for row in partition]
+
     def get_generated_row_fields(self, generator, row, initialized_cols, base_row):
         additional_fields = []
         generator_position = initialized_cols.index(generator)
@@ -392,10 +408,13 @@ class DataFrameInternal(object):
         raise NotImplementedError('Pysparkling does not currently support DF.selectExpr')
 
     def filter(self, condition):
-        condition = parse(condition)
+        condition = parse(condition).bind(self.bound_schema)
+        use_codegen = is_codegen_enabled()
 
         def mapper(partition_index, partition):
             initialized_condition = condition.initialize(partition_index)
+            if use_codegen:
+                return filter(initialized_condition.compile(self.bound_schema), partition)
             return (row for row in partition if initialized_condition.eval(row, self.bound_schema))
 
         return self._with_rdd(self._rdd.mapPartitionsWithIndex(mapper), self.bound_schema)
@@ -674,6 +693,12 @@ class DataFrameInternal(object):
         :type other: DataFrameInternal
         """
 
+        on.bind(new_schema)
+
+        left_positions, right_positions, null_safe, remaining = get_equi_join_keys(on, self.bound_schema, new_schema)
+        if left_positions:
+            return self.hash_join_on_condition(other, left_positions, right_positions, null_safe, remaining, new_schema)
+
         def condition(couple):
             left, right = couple
             merged_rows = merge_rows(left, right)
@@ -690,6 +715,45 @@ class DataFrameInternal(object):
         output_rdd = joined_rdd.map(format_output)
         return output_rdd
 
+    def hash_join_on_condition(self, other, left_positions, right_positions, null_safe, remaining, new_schema):
+        """
+        Join rows whose values at left_positions and right_positions are equal
+        then keep the merged rows that match all the remaining predicates
+
+        :type other: DataFrameInternal
+        """
+
+        def key_by(positions):
+            # Null values never match with =, only with <=>
+            nullable_positions = [position for position, is_null_safe in zip(positions, null_safe) if not is_null_safe]
+
+            def key_partition(partition):
+                for row in partition:
+                    if all(row[position] is not None for position in nullable_positions):
+                        yield tuple(row[position] for position in positions), row
+
+            return key_partition
+
+        joined_rdd = (
+            self.rdd()
+            .mapPartitions(key_by(left_positions))
+            .join(other.rdd().mapPartitions(key_by(right_positions)))
+            .map(lambda entry: merge_rows(*entry[1]))
+        )
+
+        if not remaining:
+            return joined_rdd
+
+        use_codegen = is_codegen_enabled()
+
+        def filter_partition(partition):
+            if use_codegen:
+                predicates = [predicate.compile(new_schema) for predicate in remaining]
+                return (row for row in partition if all(predicate(row) for predicate in predicates))
+            return (row for row in partition if all(predicate.eval(row, new_schema) for predicate in remaining))
+
+        return joined_rdd.mapPartitions(filter_partition)
+
     def cross_join(self, other):
         """
 
@@ -816,11 +880,11 @@ class DataFrameInternal(object):
     def applyFunctionOnHashPartitionedRdds(self, other, func):
         self_prepared_rdd, other_prepared_rdd = self.hash_partition_and_sort(other)
 
-        def filter_partition(partition_id, self_partition):
-            other_partition = other_prepared_rdd.partitions()[partition_id].x()
+        def filter_partition(tc, partition_id, partitions):
+            self_partition, other_partition = partitions
             return func(iter(self_partition), iter(other_partition))
 
-        filtered_rdd = self_prepared_rdd.mapPartitionsWithIndex(filter_partition)
+        filtered_rdd = ZippedPartitionsRDD([self_prepared_rdd, other_prepared_rdd], filter_partition)
         return self._with_rdd(filtered_rdd, self.bound_schema)
 
     def hash_partition_and_sort(self, other):
@@ -904,6 +968,11 @@ class InternalGroupedDataFrame(object):
             [field for col in self.grouping_cols for field in col.find_fields_in_schema(self.jdf.bound_schema)]
         )
 
+        for col in self.grouping_cols:
+            col.bind(self.jdf.bound_schema)
+        if self.pivot_col is not None:
+            self.pivot_col.bind(self.jdf.bound_schema)
+
         aggregated_stats = self.jdf.aggregate(
             GroupedStats(self.grouping_cols, stats, pivot_col=self.pivot_col, pivot_values=self.pivot_values,),
             lambda grouped_stats, row: grouped_stats.merge(row, self.jdf.bound_schema),
@@ -0,0 +1,297 @@
+"""Metrics of the stages and tasks that a context ran."""
+
+from __future__ import division, absolute_import, print_function, unicode_literals
+
+import contextlib
+import json
+import logging
+import os
+import statistics
+import threading
+import time
+from collections import OrderedDict, deque, namedtuple
+
+log = logging.getLogger(__name__)
+
+
+class TaskMetrics(object):
+    """measurements of a task
+
+    :param int stage_id: Stage of the task.
+    :param int partition_id: Partition that the task computed.
+
+    Times are in seconds. ``records_in`` counts the elements that the
+    function of the stage read and ``records_out`` the elements of its result
+    when the result has a length. The serialized sizes of the partition and
+    of the result are only known for tasks that ran in a pool with a data
+    serializer that returns bytes. Otherwise they are ``None``. ``phases``
+    lists the name, start and duration of the (de)serialization steps of
+    tasks in a pool.
+    """
+
+    __slots__ = (
+        'stage_id',
+        'partition_id',
+        'attempt',
+        'pid',
+        'tid',
+        'start',
+        'wall_time',
+        'cpu_time',
+        'records_in',
+        'records_out',
+        'bytes_in',
+        'bytes_out',
+        'cache_hits',
+        'cache_misses',
+        'phases',
+    )
+
+    def __init__(self, stage_id=0, partition_id=0):
+        self.stage_id = stage_id
+        self.partition_id = partition_id
+        self.attempt = 0
+        self.pid = None
+        self.tid = None
+        self.start = None
+        self.wall_time = 0.0
+        self.cpu_time = 0.0
+        self.records_in = 0
+        self.records_out = None
+        self.bytes_in = None
+        self.bytes_out = None
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.phases = []
+
+    def __getstate__(self):
+        return {k: getattr(self, k) for k in self.__slots__}
+
+    def __setstate__(self, state):
+        for k, v in state.items():
+            setattr(self, k, v)
+
+    def __repr__(self):
+        return 'TaskMetrics(stage {0}, partition {1}, {2:.6f} s)'.format(
+            self.stage_id, self.partition_id, self.wall_time
+        )
+
+    def reset_counters(self):
+        """reset the counts of a task for a new attempt"""
+        self.records_in = 0
+        self.records_out = None
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def asDict(self):
+        """the metrics as a ``dict``"""
+        return self.__getstate__()
+
+
+StageInfo = namedtuple(
+    'StageInfo',
+    [
+        'stageId',
+        'jobId',
+        'rddId',
+        'name',
+        'numTasks',
+        'numCompletedTasks',
+        'wallTime',
+        'cpuTime',
+        'medianTaskWallTime',
+        'maxTaskWallTime',
+        'recordsIn',
+        'recordsOut',
+        'bytesIn',
+        'bytesOut',
+        'cacheHits',
+        'cacheMisses',
+    ],
+)
+StageInfo.__doc__ = """summary of the task metrics of a stage"""
+
+
+def _sum(values):
+    values = [v for v in values if v is not None]
+    return sum(values) if values else None
+
+
+class StatusTracker(object):
+    """metrics of the last stages of a context
+
+    Similar to PySpark's ``StatusTracker``, obtained with
+    :func:`Context.statusTracker()`.
+
+    :param int retained_stages: Number of stages to keep the metrics of.
+    """
+
+    def __init__(self, retained_stages=1000):
+        self.retained_stages = retained_stages
+        self._stages = OrderedDict()
+        self._jobs = deque(maxlen=retained_stages)
+        self._lock = threading.Lock()
+
+    def on_stage_submitted(self, job_id, stage):
+        """record a new stage"""
+        with self._lock:
+            self._stages[stage.stage_id] = (
+                {'jobId': job_id, 'rddId': stage.rdd.id(), 'name': stage.rdd.name(), 'numTasks': len(stage.partitions)},
+                [],
+                [],
+            )
+            while len(self._stages) > self.retained_stages:
+                self._stages.popitem(last=False)
+
+    def on_task_end(self, metrics):
+        """record the metrics of a finished task"""
+        with self._lock:
+            if metrics.stage_id in self._stages:
+                self._stages[metrics.stage_id][1].append(metrics)
+
+    @contextlib.contextmanager
+    def running_job(self, job_id):
+        """record the time of a job in the driver
+
+        :param int job_id: Id of the job.
+        """
+        start, t_start = time.time(), time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._jobs.append((job_id, start, time.perf_counter() - t_start, threading.get_ident()))
+
+    def on_driver_span(self, stage_id, name, start, duration, partition_id=None):
+        """record a step of the driver for a task of a stage
+
+        :param int stage_id: Id of the stage.
+        :param str name: Name of the step, like ``'serialize task'``.
+        :param float start: Start as seconds since the epoch.
+        :param float duration: Seconds.
+        :param int partition_id: (optional) Partition of the task.
+        """
+        with self._lock:
+            if stage_id in self._stages:
+                self._stages[stage_id][2].append((name, start, duration, threading.get_ident(), partition_id))
+
+    def getStageIds(self):
+        """ids of the retained stages
+
+        :rtype: list
+        """
+        with self._lock:
+            return list(self._stages)
+
+    def getStageInfo(self, stageId):
+        """summary of a stage
+
+        :param int stageId: Id of the stage.
+        :returns: The summary or ``None`` when the stage is not retained.
+        :rtype: StageInfo
+        """
+        with self._lock:
+            if stageId not in self._stages:
+                return None
+            info, tasks, _ = self._stages[stageId]
+            tasks = list(tasks)
+
+        wall_times = [t.wall_time for t in tasks]
+        return StageInfo(
+            stageId=stageId,
+            numCompletedTasks=len(tasks),
+            wallTime=sum(wall_times),
+            cpuTime=sum(t.cpu_time for t in tasks),
+            medianTaskWallTime=statistics.median(wall_times) if tasks else None,
+            maxTaskWallTime=max(wall_times, default=None),
+            recordsIn=sum(t.records_in for t in tasks),
+            recordsOut=_sum(t.records_out for t in tasks),
+            bytesIn=_sum(t.bytes_in for t in tasks),
+            bytesOut=_sum(t.bytes_out for t in tasks),
+            cacheHits=sum(t.cache_hits for t in tasks),
+            cacheMisses=sum(t.cache_misses for t in tasks),
+            **info
+        )
+
+    def getTaskMetrics(self, stageId):
+        """metrics of the finished tasks of a stage
+
+        :param int stageId: Id of the stage.
+        :rtype: list
+        """
+        with self._lock:
+            if stageId not in self._stages:
+                return []
+            return list(self._stages[stageId][1])
+
+    def toJSON(self, path=None):
+        """the stages with their tasks as JSON
+
+        :param str path: (optional) Also write the JSON to this file.
+        :rtype: str
+        """
+        stages = []
+        for stage_id in self.getStageIds():
+            stage = self.getStageInfo(stage_id)
+            if stage is None:
+                continue
+            stage = stage._asdict()
+            stage['tasks'] = [t.asDict() for t in self.getTaskMetrics(stage_id)]
+            stages.append(stage)
+
+        result = json.dumps({'stages': stages}, indent=2)
+        if path is not None:
+            with open(path, 'w') as f:
+                f.write(result)
+        return result
+
+    def traceEvents(self):
+        """jobs, driver steps, tasks and their phases as Chrome trace events
+
+        Every process is a row group of the timeline and every thread a row:
+        the jobs and driver steps are in the driver process, the tasks in the
+        process and thread that ran them.
+
+        :rtype: list
+        """
+        driver_pid = os.getpid()
+        with self._lock:
+            jobs = list(self._jobs)
+            stages = [(stage_id, list(tasks), list(spans)) for stage_id, (_, tasks, spans) in self._stages.items()]
+
+        events = [
+            _span('job {0}'.format(job_id), 'job', start, duration, driver_pid, tid)
+            for job_id, start, duration, tid in jobs
+        ]
+        pids = {driver_pid}
+        for stage_id, tasks, spans in stages:
+            for name, start, duration, tid, partition_id in spans:
+                args = {'stageId': stage_id, 'partitionId': partition_id}
+                events.append(_span(name, 'driver', start, duration, driver_pid, tid, args))
+            for t in tasks:
+                pids.add(t.pid)
+                args = {k: v for k, v in t.asDict().items() if k != 'phases'}
+                name = 'stage {0} partition {1}'.format(stage_id, t.partition_id)
+                events.append(_span(name, 'task', t.start, t.wall_time, t.pid, t.tid, args))
+                for phase, start, duration in t.phases:
+                    args = {'stageId': stage_id, 'partitionId': t.partition_id}
+                    events.append(_span(phase, 'serialization', start, duration, t.pid, t.tid, args))
+
+        events += [
+            {
+                'name': 'process_name',
+                'ph': 'M',
+                'pid': pid,
+                'args': {'name': 'driver' if pid == driver_pid else 'worker {0}'.format(pid)},
+            }
+            for pid in sorted(pids)
+        ]
+        return events
+
+
+def _span(name, category, start, duration, pid, tid, args=None):
+    """complete event of the Chrome trace event format with times in microseconds"""
+    event = {'name': name, 'cat': category, 'ph': 'X', 'ts': start * 1e6, 'dur': duration * 1e6, 'pid': pid, 'tid': tid}
+    if args is not None:
+        event['args'] = args
+    return event
@@ -27,16 +27,29 @@ class StorageLevel(object):
     nodes. Also contains static constants for some commonly used storage levels, MEMORY_ONLY.
     Since the data is always serialized on the Python side, all the constants use the serialized
     formats.
+
+    Pysparkling keeps cached partitions as Python objects. The levels ending
+    in _SER keep them pickled in memory instead, which uses less memory but
+    costs a deserialization on every read.
     """
 
-    def __init__(self, useDisk, useMemory, useOffHeap, deserialized, replication=1):
+    def __init__(self, useDisk, useMemory, useOffHeap, deserialized, replication=1, serialized=False):
         self.useDisk = useDisk
         self.useMemory = useMemory
         self.useOffHeap = useOffHeap
         self.deserialized = deserialized
         self.replication = replication
+        self.serialized = serialized
 
     def __repr__(self):
+        if self.serialized:
+            return 'StorageLevel(%s, %s, %s, %s, %s, serialized=True)' % (
+                self.useDisk,
+                self.useMemory,
+                self.useOffHeap,
+                self.deserialized,
+                self.replication,
+            )
         return 'StorageLevel(%s, %s, %s, %s, %s)' % (
             self.useDisk,
             self.useMemory,
@@ -61,4 +74,8 @@ StorageLevel.MEMORY_ONLY = StorageLevel(False, True, False, False)
 StorageLevel.MEMORY_ONLY_2 = StorageLevel(False, True, False, False, 2)
 StorageLevel.MEMORY_AND_DISK = StorageLevel(True, True, False, False)
 StorageLevel.MEMORY_AND_DISK_2 = StorageLevel(True, True, False, False, 2)
+StorageLevel.MEMORY_ONLY_SER = StorageLevel(False, True, False, False, serialized=True)
+StorageLevel.MEMORY_ONLY_SER_2 = StorageLevel(False, True, False, False, 2, serialized=True)
+StorageLevel.MEMORY_AND_DISK_SER = StorageLevel(True, True, False, False, serialized=True)
+StorageLevel.MEMORY_AND_DISK_SER_2 = StorageLevel(True, True, False, False, 2, serialized=True)
 StorageLevel.OFF_HEAP = StorageLevel(True, True, True, False, 1)
@@ -1,11 +1,32 @@
+import contextlib
 import logging
+import threading
+
+from .status import TaskMetrics
 
 log = logging.getLogger(__name__)
 
+_local = threading.local()
+
+
+def in_task():
+    """whether the current thread is running a task"""
+    return getattr(_local, 'in_task', False)
+
+
+@contextlib.contextmanager
+def running_task():
+    """mark the current thread as running a task"""
+    previous, _local.in_task = in_task(), True
+    try:
+        yield
+    finally:
+        _local.in_task = previous
+
 
 class TaskContext(object):
     def __init__(
-        self, cache_manager, catch_exceptions, stage_id=0, partition_id=0, max_retries=3, retry_wait=0,
+        self, cache_manager, catch_exceptions, stage_id=0, partition_id=0, max_retries=3, retry_wait=0, profile=False,
     ):
         self.cache_manager = cache_manager
         self.catch_exceptions = catch_exceptions
@@ -13,16 +34,27 @@ class TaskContext(object):
         self.partition_id = partition_id
         self.max_retries = max_retries
         self.retry_wait = retry_wait
+        self.profile = profile
 
         self.attempt_number = 0
         self.is_completed = False
         self.is_running_locally = True
         self.task_completion_listeners = []
+        self.metrics = TaskMetrics(stage_id, partition_id)
+        self.profile_stats = None
 
     def _create_child(self):
-        return TaskContext(
-            self.cache_manager, self.catch_exceptions, stage_id=self.stage_id + 1, partition_id=self.partition_id,
+        child = TaskContext(
+            self.cache_manager,
+            self.catch_exceptions,
+            stage_id=self.stage_id,
+            partition_id=self.partition_id,
+            max_retries=self.max_retries,
+            retry_wait=self.retry_wait,
+            profile=self.profile,
         )
+        child.metrics = self.metrics
+        return child
 
     def attemptNumber(self):
         return self.attempt_number
@@ -1,5 +1,6 @@
 import collections
 import datetime
+import functools
 import itertools
 import json
 import math
@@ -90,9 +91,9 @@ def reservoir_sample_and_size(iterable, k, seed):
         # There are k elements in the reservoir, and the l-th element has been
         # consumed. It should be chosen with probability k/l. The expression
         # below is a random int chosen uniformly from [0, l)
-        replacementIndex = random.randint(0, reservoir_size)
+        replacementIndex = random.randint(0, reservoir_size - 1)
         if replacementIndex < k:
-            reservoir[replacementIndex.toInt] = item
+            reservoir[replacementIndex] = item
 
     return reservoir, reservoir_size
 
@@ -150,10 +151,99 @@ def compute_weighted_percentiles(weighted_values, number_of_percentiles, key=lam
     return bounds
 
 
+def get_range_bounds(rdd, numPartitions, key=lambda x: x, sample_size=None):
+    """
+    Return at most numPartitions - 1 values of rdd that split it in ranges of similar sizes
+
+    The values are weighted percentiles of a sample of each partition of the RDD,
+    partitions that are much bigger than the others are sampled again
+    so that they are not under-represented.
+
+    :param sample_size: Approximate number of sampled values,
+        by default 20 per range but at most one million.
+    :rtype: list
+    """
+    if numPartitions == 0:
+        return []
+
+    if sample_size is None:
+        sample_size = min(20 * numPartitions, 1e6)
+    sample_size_per_partition = math.ceil(3 * sample_size / max(rdd.getNumPartitions(), 1))
+    sketched_rdd = sketch_rdd(rdd, sample_size_per_partition)
+    rdd_size = sum(partition_size for partition_size, sample in sketched_rdd.values())
+
+    if rdd_size == 0:
+        return []
+
+    fraction = sample_size / rdd_size
+
+    candidates, imbalanced_partitions = get_initial_candidates(sketched_rdd, sample_size_per_partition, fraction)
+
+    additional_candidates = get_additional_candidates(rdd, imbalanced_partitions, fraction)
+
+    candidates += additional_candidates
+    bounds = compute_weighted_percentiles(candidates, min(numPartitions, len(candidates)) + 1, key=key)[1:-1]
+    return bounds
+
+
+def get_initial_candidates(sketched_rdd, sample_size_per_partition, fraction):
+    candidates = []
+    imbalanced_partitions = set()
+    for idx, (partition_size, sample) in sketched_rdd.items():
+        # Partition is bigger than (3 times) average and more than sample_size_per_partition
+        # is needed to get accurate information on its distribution
+        if fraction * partition_size > sample_size_per_partition:
+            imbalanced_partitions.add(idx)
+        elif sample:
+            # The weight is 1 over the sampling probability.
+            weight = partition_size / len(sample)
+            candidates += [(key, weight) for key in sample]
+    return candidates, imbalanced_partitions
+
+
+def get_additional_candidates(rdd, imbalanced_partitions, fraction):
+    additional_candidates = []
+    if imbalanced_partitions:
+        # Re-sample imbalanced partitions with the desired sampling probability.
+        def keep_imbalanced_partitions(partition_id, x):
+            return x if partition_id in imbalanced_partitions else []
+
+        resampled = (
+            rdd.mapPartitionsWithIndex(keep_imbalanced_partitions)
+            .sample(withReplacement=False, fraction=fraction, seed=rdd.id())
+            .collect()
+        )
+        weight = 1.0 / fraction
+        additional_candidates += [(x, weight) for x in resampled]
+    return additional_candidates
+
+
+def sketch_rdd(rdd, sample_size_per_partition):
+    """
+    Get a subset per partition of an RDD
+
+    Sampling algorithm is reservoir sampling.
+
+    :param rdd:
+    :param sample_size_per_partition:
+    :return: a dict mapping each partition index to its size and its sample
+    """
+
+    def sketch_partition(idx, x):
+        sample, original_size = reservoir_sample_and_size(x, sample_size_per_partition, seed=rdd.id() + idx)
+        return [(idx, (original_size, sample))]
+
+    sketched_rdd_content = rdd.mapPartitionsWithIndex(sketch_partition).collect()
+
+    return dict(sketched_rdd_content)
+
+
 def get_keyfunc(cols, schema, nulls_are_smaller=False):
     """
     Return a function that maps a row to a tuple of some of its columns values
     """
+    for col in cols:
+        col.bind(schema)
 
     def key(row):
         """
@@ -175,6 +265,49 @@ def get_keyfunc(cols, schema, nulls_are_smaller=False):
     return key
 
 
+@functools.total_ordering
+class DescendingKey(object):
+    """
+    Wrap a value so that it sorts in the opposite order of the value
+    """
+
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+    def __hash__(self):
+        return hash(self.value)
+
+
+def get_sort_keyfunc(cols, schema):
+    """
+    Return a function that maps a row to a single key that sorts rows
+    according to the sort order (ASC/DESC, NULLS FIRST/LAST) of every column
+
+    Sorting in ascending order on this key gives the same order
+    as sorting on each column, from the last one to the first one.
+    """
+    for col in cols:
+        col.bind(schema)
+    orders = [(col, col.sort_order.startswith('ASC'), col.sort_order.endswith('NULLS FIRST')) for col in cols]
+
+    def key(row):
+        values = []
+        for col, ascending, nulls_first in orders:
+            value = col.eval(row, schema)
+            values += ((value is None) != nulls_first, value if ascending else DescendingKey(value))
+        return tuple(values)
+
+    return key
+
+
 FULL_WIDTH_REGEX = re.compile(
     '['
     + r'\u1100-\u115F'
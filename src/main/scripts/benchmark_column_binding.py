@@ -0,0 +1,34 @@
+"""Benchmark the per row cost of column references against the schema width."""
+
+import argparse
+import timeit
+
+import fast_pyspark_tester
+from fast_pyspark_tester.sql.functions import col
+from fast_pyspark_tester.sql.session import SparkSession
+
+
+def create_df(spark, width, rows):
+    names = ['c{0}'.format(i) for i in range(width)]
+    data = [tuple(r + i for i in range(width)) for r in range(rows)]
+    return spark.createDataFrame(data, names).cache()
+
+
+def run(df, width):
+    last = 'c{0}'.format(width - 1)
+    return df.filter(col(last) >= 0).select(col('c0'), col(last) + 1).count()
+
+
+if __name__ == '__main__':
+    p = argparse.ArgumentParser(description=__doc__)
+    p.add_argument('--rows', default=20000, type=int, help='number of rows')
+    p.add_argument('--widths', default='5,50,150', help='comma separated schema widths')
+    p.add_argument('--number', default=5, type=int, help='number of repetitions')
+    args = p.parse_args()
+
+    session = SparkSession(fast_pyspark_tester.Context())
+    for w in (int(w) for w in args.widths.split(',')):
+        dataframe = create_df(session, w, args.rows)
+        run(dataframe, w)  # fill the cache
+        duration = timeit.timeit(lambda: run(dataframe, w), number=args.number)
+        print('{0:>4} columns: {1:.3f} us per row'.format(w, 1e6 * duration / args.number / args.rows))
@@ -0,0 +1,37 @@
+"""Benchmark compiled against interpreted expressions in select and filter."""
+
+import argparse
+import timeit
+
+import fast_pyspark_tester
+from fast_pyspark_tester.sql.functions import col, when
+from fast_pyspark_tester.sql.session import SparkSession
+
+
+def create_df(spark, rows):
+    data = [(i, i % 7, float(i) / 3, 'name{0}'.format(i % 13)) for i in range(rows)]
+    return spark.createDataFrame(data, ['a', 'b', 'c', 'd']).cache()
+
+
+def run(df):
+    return (
+        df.filter((col('a') % 3 == 0) & col('d').isNotNull())
+        .withColumn('e', col('a') * 2 + col('b') - col('c') / 4)
+        .select('a', 'e', when(col('b') > 3, col('e')).otherwise(-col('e')).alias('f'), (col('c') >= 10).alias('g'))
+        .count()
+    )
+
+
+if __name__ == '__main__':
+    p = argparse.ArgumentParser(description=__doc__)
+    p.add_argument('--rows', default=30000, type=int, help='number of rows')
+    p.add_argument('--number', default=5, type=int, help='number of repetitions')
+    args = p.parse_args()
+
+    session = SparkSession(fast_pyspark_tester.Context())
+    dataframe = create_df(session, args.rows)
+    run(dataframe)  # fill the cache
+    for codegen in ('false', 'true'):
+        session.conf.set('spark.sql.codegen.wholeStage', codegen)
+        duration = timeit.timeit(lambda: run(dataframe), number=args.number)
+        print('codegen={0}: {1:.3f} us per row'.format(codegen, 1e6 * duration / args.number / args.rows))
@@ -0,0 +1,32 @@
+"""Benchmark DataFrame joins on an equality condition against a non-equi condition."""
+
+import argparse
+import timeit
+
+import fast_pyspark_tester
+from fast_pyspark_tester.sql.session import SparkSession
+
+
+def create_dfs(spark, rows):
+    left = spark.createDataFrame([(i, i % 7) for i in range(rows)], ['a', 'b']).cache()
+    right = spark.createDataFrame([(i, i % 5) for i in range(0, 2 * rows, 2)], ['c', 'd']).cache()
+    return left, right
+
+
+def run(left, right, equi):
+    # a <= c AND a >= c is the same condition as a = c but cannot be hashed
+    condition = (left.a == right.c) if equi else ((left.a <= right.c) & (left.a >= right.c))
+    return left.join(right, on=condition & (left.b != right.d)).count()
+
+
+if __name__ == '__main__':
+    p = argparse.ArgumentParser(description=__doc__)
+    p.add_argument('--rows', default=1000, type=int, help='number of rows on each side')
+    p.add_argument('--number', default=3, type=int, help='number of repetitions')
+    args = p.parse_args()
+
+    session = SparkSession(fast_pyspark_tester.Context())
+    left_df, right_df = create_dfs(session, args.rows)
+    for is_equi in (False, True):
+        duration = timeit.timeit(lambda: run(left_df, right_df, is_equi), number=args.number)
+        print('equi-join={0}: {1:.3f} s per join'.format(is_equi, duration / args.number))
@@ -0,0 +1,35 @@
+"""Benchmark the registered data serializers on partitions of different types of records."""
+
+import argparse
+import timeit
+
+from fast_pyspark_tester import serializers
+from fast_pyspark_tester.partition import Partition
+
+
+RECORDS = {
+    'ints': lambda i: i,
+    'floats': lambda i: i / 7.0,
+    'strings': lambda i: 'record {0}'.format(i),
+    'pairs': lambda i: (i % 100, 'value {0}'.format(i)),
+    'dicts': lambda i: {'id': i, 'name': 'record {0}'.format(i), 'score': i / 7.0},
+}
+
+
+if __name__ == '__main__':
+    p = argparse.ArgumentParser(description=__doc__)
+    p.add_argument('--records', default=100000, type=int, help='number of records in a partition')
+    p.add_argument('--number', default=5, type=int, help='number of repetitions')
+    args = p.parse_args()
+
+    for record_type, record in RECORDS.items():
+        partition = Partition([record(i) for i in range(args.records)], 0)
+        selected, _ = serializers.select_serializer(partition.x()[:100])
+        print('{0} (auto selects {1}):'.format(record_type, selected.name))
+        for name in serializers._serializers:  # pylint: disable=protected-access
+            serializer = serializers.get_serializer(name)
+            data = serializer.dumps(partition)
+            dumps = timeit.timeit(lambda: serializer.dumps(partition), number=args.number) / args.number
+            loads = timeit.timeit(lambda: serializer.loads(data), number=args.number) / args.number
+            size = len(data) if isinstance(data, bytes) else len(data.data)
+            print('    {0:<14} dumps {1:.4f} s, loads {2:.4f} s, {3} bytes'.format(name, dumps, loads, size))
@@ -0,0 +1,41 @@
+"""Benchmark sending large binary partitions to worker processes with and without shared memory."""
+
+import argparse
+import os
+import timeit
+
+import fast_pyspark_tester
+
+
+def create_context(workers, shared):
+    if not shared:
+        return fast_pyspark_tester.Context(executor='processes', workers=workers)
+    return fast_pyspark_tester.Context(executor='processes', workers=workers, data_serializer='shared_memory')
+
+
+def identity(x):
+    return x
+
+
+if __name__ == '__main__':
+    p = argparse.ArgumentParser(description=__doc__)
+    p.add_argument('--records', default=64, type=int, help='number of records')
+    p.add_argument('--record-size', default=4, type=int, help='size of a record in MiB')
+    p.add_argument('--workers', default=4, type=int, help='number of worker processes')
+    p.add_argument('--number', default=3, type=int, help='number of repetitions')
+    args = p.parse_args()
+
+    records = [os.urandom(args.record_size << 20) for _ in range(args.records)]
+    total_mib = args.records * args.record_size
+    for is_shared in (False, True):
+        sc = create_context(args.workers, is_shared)
+        rdd = sc.parallelize(records, args.workers * 4)
+        rdd.map(len).count()  # start the workers
+
+        for name, func in (('to workers', len), ('to workers and back', identity)):
+            duration = timeit.timeit(lambda: rdd.map(func).collect(), number=args.number) / args.number
+            print(
+                'shared memory={0}, {1}: {2:.3f} s per job, {3:.0f} MiB/s'
+                ''.format(is_shared, name, duration, total_mib / duration)
+            )
+        sc.stop()
@@ -0,0 +1,81 @@
+from unittest import TestCase
+
+from fast_pyspark_tester import Context
+from fast_pyspark_tester.sql.functions import col, lit, when
+from fast_pyspark_tester.sql.session import SparkSession
+from fast_pyspark_tester.sql.types import Row
+
+
+class ColumnBindingTests(TestCase):
+    spark = SparkSession(sparkContext=Context())
+
+    def wide_df(self, width=150, rows=5):
+        names = ['c{0}'.format(i) for i in range(width)]
+        return self.spark.createDataFrame([tuple(r * width + i for i in range(width)) for r in range(rows)], names)
+
+    def test_select_and_filter_on_wide_schema(self):
+        df = self.wide_df()
+        result = df.filter(df.c149 > 300).select(df.c0, col('c75') + 1).collect()
+        self.assertListEqual([tuple(row) for row in result], [(300, 376), (450, 526), (600, 676)])
+        self.assertEqual(result[0].__fields__, ('c0', '(c75 + 1)'))
+
+    def test_bind_resolves_position_once(self):
+        df = self.wide_df()
+        column = (col('c120') * 2).bind(df._jdf.bound_schema)
+        name_column = column.expr.arg1
+        self.assertIs(name_column.bound_schema, df._jdf.bound_schema)
+        self.assertEqual(name_column.bound_position, 120)
+
+    def test_column_reused_on_another_schema(self):
+        column = col('b')
+        df1 = self.spark.createDataFrame([(1, 2)], ['a', 'b'])
+        df2 = self.spark.createDataFrame([(3, 4, 5)], ['c', 'b', 'a'])
+        selected_1 = df1.select(column)
+        selected_2 = df2.select(column)
+        self.assertListEqual(selected_1.collect(), [Row(b=2)])
+        self.assertListEqual(selected_2.collect(), [Row(b=4)])
+
+
+class CompiledExpressionTests(TestCase):
+    spark = SparkSession(sparkContext=Context())
+
+    def setUp(self):
+        self.df = self.spark.createDataFrame(
+            [(1, 2.5, 'a', None), (4, None, 'b', True), (7, 8.0, None, False)], ['i', 'f', 's', 'b']
+        )
+
+    def tearDown(self):
+        self.spark.conf.unset('spark.sql.codegen.wholeStage')
+
+    def collect_both_ways(self, build):
+        self.spark.conf.set('spark.sql.codegen.wholeStage', 'false')
+        interpreted = build(self.df).collect()
+        self.spark.conf.set('spark.sql.codegen.wholeStage', 'true')
+        compiled = build(self.df).collect()
+        return interpreted, compiled
+
+    def test_select_matches_interpreter(self):
+        interpreted, compiled = self.collect_both_ways(
+            lambda df: df.select(
+                '*',
+                (col('i') * 2 + col('f')).alias('sum'),
+                (col('i') == '4').alias('cast_compare'),
+                col('s').isNull(),
+                ~col('b'),
+                -col('i'),
+                when(col('i') > 3, lit('big')).when(col('i') > 0, lit('small')).otherwise(lit(None)),
+                col('i').isin(1, 7),
+                col('i').cast('string'),
+            )
+        )
+        self.assertListEqual(interpreted, compiled)
+        self.assertEqual(compiled[0].__fields__, interpreted[0].__fields__)
+        self.assertEqual(compiled[1]['sum'], None)
+        self.assertEqual(compiled[1]['cast_compare'], True)
+
+    def test_filter_matches_interpreter(self):
+        interpreted, compiled = self.collect_both_ways(
+            lambda df: df.filter((col('i') >= 4) | col('f').isNull()).filter(col('s') != 'c')
+        )
+        self.assertListEqual(interpreted, compiled)
+        self.assertListEqual([row.i for row in compiled], [4])
@@ -0,0 +1,60 @@
+from unittest import TestCase
+
+from fast_pyspark_tester import Context
+from fast_pyspark_tester.sql.internals import get_equi_join_keys
+from fast_pyspark_tester.sql.schema_utils import merge_schemas
+from fast_pyspark_tester.sql.session import SparkSession
+
+
+class EquiJoinTests(TestCase):
+    spark = SparkSession(sparkContext=Context())
+
+    def setUp(self):
+        self.left = self.spark.createDataFrame(
+            [(1, 'a', 10), (2, 'b', 20), (None, 'c', 30), (2, 'd', 40)], ['k', 'l', 'v']
+        )
+        self.right = self.spark.createDataFrame([(2, 'x', 25), (None, 'y', 35), (3, 'z', 45)], ['k', 'r', 'w'])
+
+    def join_keys(self, condition):
+        left_schema = self.left._jdf.bound_schema
+        merged_schema = merge_schemas(left_schema, self.right._jdf.bound_schema, 'inner')
+        return get_equi_join_keys(condition.bind(merged_schema), left_schema, merged_schema)
+
+    def test_equality_conjuncts_are_keys(self):
+        left, right = self.left, self.right
+        left_positions, right_positions, null_safe, remaining = self.join_keys(
+            (right.k == left.k) & left.l.eqNullSafe(right.r) & (left.v < right.w)
+        )
+
+        self.assertListEqual(left_positions, [0, 1])
+        self.assertListEqual(right_positions, [0, 1])
+        self.assertListEqual(null_safe, [False, True])
+        self.assertListEqual([str(predicate) for predicate in remaining], ['(v < w)'])
+
+    def test_other_conditions_are_not_keys(self):
+        left, right = self.left, self.right
+        for condition in (left.k == left.v, left.k == right.r, (left.k == right.k) | (left.v == right.w)):
+            left_positions, _, _, remaining = self.join_keys(condition)
+            self.assertListEqual(left_positions, [])
+            self.assertEqual(len(remaining), 1)
+
+    def test_hash_join_with_remaining_predicate(self):
+        left, right = self.left, self.right
+        result = left.join(right, on=(left.k == right.k) & (left.v < right.w)).collect()
+
+        self.assertListEqual([tuple(row) for row in result], [(2, 'b', 20, 2, 'x', 25)])
+
+    def test_null_values_only_match_with_eq_null_safe(self):
+        left, right = self.left, self.right
+
+        self.assertEqual(left.join(right, on=left.k == right.k).count(), 2)
+        self.assertListEqual(
+            sorted(tuple(row) for row in left.join(right, on=left.k.eqNullSafe(right.k)).select('l', 'r').collect()),
+            [('b', 'x'), ('c', 'y'), ('d', 'x')],
+        )
+
+    def test_incompatible_types_are_compared_with_casts(self):
+        left = self.spark.createDataFrame([(1,), (2,)], ['i'])
+        right = self.spark.createDataFrame([('1',), ('3',)], ['s'])
+
+        self.assertListEqual([tuple(row) for row in left.join(right, on=left.i == right.s).collect()], [(1, '1')])
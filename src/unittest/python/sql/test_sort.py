@@ -0,0 +1,41 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+from fast_pyspark_tester import Context
+from fast_pyspark_tester.rdd import RDD
+from fast_pyspark_tester.sql.session import SparkSession
+
+
+class SortTests(TestCase):
+    spark = SparkSession(sparkContext=Context())
+
+    def setUp(self):
+        self.df = self.spark.createDataFrame(
+            [(1, 'a', 2.0), (None, 'b', None), (2, None, 1.0), (1, 'b', None), (2, 'a', 3.0), (None, None, 0.5)],
+            ['a', 'b', 'c'],
+        )
+
+    def test_mixed_sort_orders(self):
+        df = self.df
+        result = df.orderBy(df.a.desc(), df.b, df.c.asc_nulls_last()).collect()
+
+        self.assertListEqual(
+            [tuple(row) for row in result],
+            [(2, None, 1.0), (2, 'a', 3.0), (1, 'a', 2.0), (1, 'b', None), (None, None, 0.5), (None, 'b', None)],
+        )
+
+    def test_nulls_placement(self):
+        df = self.df
+        self.assertListEqual(
+            [row.c for row in df.orderBy(df.c.desc_nulls_first()).collect()], [None, None, 3.0, 2.0, 1.0, 0.5]
+        )
+        self.assertListEqual(
+            [row.b for row in df.orderBy(df.b.desc_nulls_last(), 'c').collect()], ['b', 'b', 'a', 'a', None, None]
+        )
+
+    def test_single_sort_pass(self):
+        df = self.df
+        with patch.object(RDD, 'sortBy', autospec=True, side_effect=RDD.sortBy) as sort_by:
+            df.orderBy(df.a.desc(), df.b, df.c.asc_nulls_last()).collect()
+
+        self.assertEqual(sort_by.call_count, 1)
@@ -1,7 +1,9 @@
 from __future__ import print_function
 
 import logging
+import os
 import time
+from concurrent import futures
 
 import fast_pyspark_tester
 
@@ -54,6 +56,192 @@ def test_timed_cache():
     assert m.count > count_after
 
 
+def test_memory_and_disk_spills_over_max_mem():
+    m = Manip()
+
+    cm = fast_pyspark_tester.CacheManager(max_mem=2e-6)  # about 2 kB
+    c = fast_pyspark_tester.Context(cache_manager=cm)
+    rdd = c.parallelize(range(300), 3).map(m.trivial_manip_with_debug)
+    rdd = rdd.persist(fast_pyspark_tester.StorageLevel.MEMORY_AND_DISK)
+    assert rdd.collect() == list(range(300))
+    assert cm.cache_mem_size <= cm.max_mem_bytes
+    assert cm.cache_disk_size > 0
+    assert len(os.listdir(cm.spill_dir)) >= 1
+
+    count = m.count
+    assert rdd.collect() == list(range(300))
+    assert m.count == count
+
+    cm.clear()
+    assert os.listdir(cm.spill_dir) == []
+
+
+def test_memory_only_is_recomputed_over_max_mem():
+    m = Manip()
+
+    cm = fast_pyspark_tester.CacheManager(max_mem=2e-6)
+    c = fast_pyspark_tester.Context(cache_manager=cm)
+    rdd = c.parallelize(range(300), 3).map(m.trivial_manip_with_debug).cache()
+    assert rdd.collect() == list(range(300))
+    assert cm.spill_dir is None
+    assert len(cm.stored_idents()) < 3
+
+    rdd.collect()
+    assert m.count > 300
+
+
+def test_disk_only_detects_corrupted_files():
+    m = Manip()
+
+    cm = fast_pyspark_tester.CacheManager()
+    c = fast_pyspark_tester.Context(cache_manager=cm)
+    rdd = c.parallelize(range(10), 2).map(m.trivial_manip_with_debug)
+    rdd = rdd.persist(fast_pyspark_tester.StorageLevel.DISK_ONLY)
+    assert rdd.collect() == list(range(10))
+    assert cm.cache_mem_size == 0
+    assert all(e['mem_obj'] is None for e in cm.cache_obj.values())
+
+    location = next(iter(cm.cache_obj.values()))['disk_location']
+    with open(location, 'wb') as f:
+        f.write(cm.serializer([42]))
+    assert rdd.collect() == list(range(10))
+    assert m.count == 15
+
+
+def test_memory_only_ser_keeps_checked_bytes():
+    m = Manip()
+
+    cm = fast_pyspark_tester.CacheManager(compress=True)
+    c = fast_pyspark_tester.Context(cache_manager=cm)
+    rdd = c.parallelize(range(1000), 2).map(m.trivial_manip_with_debug)
+    rdd = rdd.persist(fast_pyspark_tester.StorageLevel.MEMORY_ONLY_SER)
+    assert rdd.collect() == list(range(1000))
+
+    entries = list(cm.cache_obj.values())
+    assert all(e['mem_obj'] is None and isinstance(e['mem_ser'], bytes) for e in entries)
+    assert cm.cache_mem_size == sum(e['mem_ser_size'] for e in entries)
+    assert rdd.collect() == list(range(1000))
+    assert m.count == 1000
+
+    entries[0]['mem_ser'] = entries[0]['mem_ser'][:-1] + b'x'
+    assert rdd.collect() == list(range(1000))
+    assert m.count == 1500
+
+
+def test_memory_and_disk_ser_spills_bytes():
+    cm = fast_pyspark_tester.CacheManager(max_mem=1e-9)
+    cm.add('a', list(range(100)), fast_pyspark_tester.StorageLevel.MEMORY_AND_DISK_SER)
+    assert cm.cache_mem_size == 0
+    assert cm.cache_obj['a']['mem_ser'] is None
+    assert cm.get('a') == list(range(100))
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cm = fast_pyspark_tester.LRUCacheManager(max_entries=2)
+    cm.add('a', [1])
+    cm.add('b', [2])
+    assert cm.get('a') == [1]
+    cm.add('c', [3])
+    assert sorted(cm.stored_idents()) == ['a', 'c']
+
+    assert cm.has('c')
+    cm.add('d', [4])
+    assert sorted(cm.stored_idents()) == ['c', 'd']
+
+
+def test_lru_cache_in_context():
+    m = Manip()
+
+    cm = fast_pyspark_tester.LRUCacheManager(max_entries=2)
+    c = fast_pyspark_tester.Context(cache_manager=cm)
+    rdd = c.parallelize(range(10), 3).map(m.trivial_manip_with_debug).cache()
+    assert rdd.collect() == list(range(10))
+    assert len(cm.stored_idents()) == 2
+    assert rdd.collect() == list(range(10))
+    assert m.count > 10
+
+
+def test_eviction_in_thread_pool():
+    max_mem = 2.5 * fast_pyspark_tester.cache_manager.estimate_size([0]) / 1024 ** 3
+    levels = fast_pyspark_tester.StorageLevel.MEMORY_ONLY, fast_pyspark_tester.StorageLevel.MEMORY_AND_DISK
+    for storage_level in levels:
+        for cm in (fast_pyspark_tester.CacheManager(max_mem), fast_pyspark_tester.LRUCacheManager(max_entries=2)):
+            with futures.ThreadPoolExecutor(2) as pool:
+                c = fast_pyspark_tester.Context(pool=pool, cache_manager=cm)
+                rdds = [c.parallelize([i], 1).persist(storage_level) for i in range(4)]
+                assert [r.count() for r in rdds] == [1] * 4
+                assert [r.collect() for r in rdds] == [[i] for i in range(4)]
+
+            assert len(cm._in_memory) == 2
+            assert all(ident in cm.cache_obj for ident in cm._in_memory)
+            for entry in cm.cache_obj.values():
+                assert entry['disk_location'] is None or os.path.exists(entry['disk_location'])
+
+    cm = fast_pyspark_tester.CacheManager()
+    cm.add('a', [1], fast_pyspark_tester.StorageLevel.DISK_ONLY)
+    clone = cm.clone_contains(lambda ident: True)
+    clone.delete('a')
+    assert cm.get('a') == [1]
+
+
+def test_lfu_cache_evicts_least_frequently_used():
+    cm = fast_pyspark_tester.LFUCacheManager(max_entries=2, max_mem=1.0)
+    cm.add('a', [1])
+    cm.add('b', [2])
+    cm.get('a')
+    cm.get('a')
+    cm.add('c', [3])
+    assert sorted(cm.stored_idents()) == ['a', 'c']
+
+    cm.get('c')
+    cm.get('c')
+    cm.get('c')
+    cm.add('d', [4])
+    assert sorted(cm.stored_idents()) == ['c', 'd']
+
+
+def test_lfu_cache_counts_reads_only():
+    cm = fast_pyspark_tester.LFUCacheManager(max_entries=2)
+    cm.add('a', [1])
+    cm.add('b', [2])
+    cm.get('a')
+    assert all(cm.has('b') for _ in range(3))
+    cm.add('c', [3])
+    assert sorted(cm.stored_idents()) == ['a', 'c']
+
+    cm = fast_pyspark_tester.LFUCacheManager()
+    rdd = fast_pyspark_tester.Context(cache_manager=cm).parallelize(range(10), 2).cache()
+    assert rdd.collect() == list(range(10))
+    assert rdd.map(lambda x: x + 1).sum() == 55
+    assert sorted(cm._counts.values()) == [1, 1]
+
+
+def test_eviction_order_with_pool():
+    with futures.ThreadPoolExecutor(2) as pool:
+        for kwargs in ({'pool': pool}, {'executor': 'processes', 'workers': 2}):
+            for manager in (fast_pyspark_tester.LRUCacheManager, fast_pyspark_tester.LFUCacheManager):
+                cm = manager(max_entries=2)
+                c = fast_pyspark_tester.Context(cache_manager=cm, **kwargs)
+                try:
+                    a, b, d = [c.parallelize([i], 1).cache() for i in range(3)]
+                    assert a.count() + b.count() == 2
+                    assert a.count() == 1
+                    assert d.count() == 1
+                    assert sorted(cm.stored_idents()) == [(a.id(), 0), (d.id(), 0)]
+                finally:
+                    c.stop()
+
+
+def test_timed_cache_keeps_entries_added_again():
+    cm = fast_pyspark_tester.TimedCacheManager(timeout=0.5)
+    cm.add('a', [1])
+    time.sleep(0.3)
+    cm.add('a', [2])
+    time.sleep(0.3)
+    cm.gc()
+    assert cm.get('a') == [2]
+
+
 if __name__ == '__main__':
     logging.basicConfig(level=logging.DEBUG)
     # test_cache_empty_partition()
@@ -1,16 +1,46 @@
 from __future__ import print_function
 
+import contextlib
+import io
+import json
 import logging
+import os
+import pickle
+import pstats
+import tempfile
+import threading
 import unittest
+from concurrent import futures
 
 import fast_pyspark_tester
 
 
+def square(x):
+    return x * x
+
+
 class Context(unittest.TestCase):
     def test_broadcast(self):
         b = fast_pyspark_tester.Context().broadcast([1, 2, 3])
         self.assertEqual(b.value[0], 1)
 
+    def test_broadcast_destroy(self):
+        b = fast_pyspark_tester.Context().broadcast(list(range(1000)))
+        copy = pickle.loads(pickle.dumps(b))
+        self.assertEqual(copy.value[999], 999)
+        self.assertLess(len(pickle.dumps(b)), 200)
+
+        path = b._path
+        self.assertTrue(os.path.exists(path))
+        b.unpersist()
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(b.value[999], 999)
+        self.assertEqual(pickle.loads(pickle.dumps(b)).value[999], 999)
+
+        b.destroy()
+        self.assertRaises(RuntimeError, lambda: b.value)
+        self.assertRaises(RuntimeError, lambda: pickle.dumps(b))
+
     def test_lock1(self):
         """Should not be able to create a new RDD inside a map operation."""
         sc = fast_pyspark_tester.Context()
@@ -31,6 +61,143 @@ class Context(unittest.TestCase):
             fast_pyspark_tester.exceptions.ContextIsLockedException, parallelize_in_parallelize,
         )
 
+    def test_jobs_from_threads(self):
+        sc = fast_pyspark_tester.Context()
+        rdd = sc.parallelize(range(10), 2)
+
+        with futures.ThreadPoolExecutor(4) as submitters:
+            counts = list(submitters.map(lambda i: rdd.map(lambda x: x * i).distinct().count(), range(1, 9)))
+
+        self.assertEqual(counts, [10] * 8)
+
+    def test_async_actions(self):
+        sc = fast_pyspark_tester.Context()
+        rdd = sc.parallelize(range(10), 3).cache()
+
+        count, elements, first = rdd.countAsync(), rdd.collectAsync(), rdd.takeAsync(2)
+        job = sc.submitJob(rdd, lambda tc, x: sum(x), resultHandler=sum)
+        self.assertEqual(count.result(), 10)
+        self.assertEqual(elements.result(), list(range(10)))
+        self.assertEqual(first.result(), [0, 1])
+        self.assertEqual(job.result(), 45)
+
+        acc = sc.accumulator(0)
+        self.assertIsNone(rdd.foreachAsync(acc.add).result())
+        self.assertEqual(acc.value, 45)
+
+    def test_cancel_async_action(self):
+        started, release = threading.Event(), threading.Event()
+        computed = []
+
+        def slow(x):
+            computed.append(x)
+            started.set()
+            release.wait(5)
+            return x
+
+        sc = fast_pyspark_tester.Context()
+        running = set(threading.enumerate())
+        future = sc.parallelize(range(10), 10).map(slow).collectAsync()
+        job_threads = set(threading.enumerate()) - running
+        self.assertTrue(started.wait(5))
+        self.assertTrue(future.cancel())
+        self.assertTrue(future.cancelled())
+        self.assertRaises(futures.CancelledError, future.result, 0)
+        release.set()
+        for thread in job_threads:
+            thread.join(5)
+        self.assertEqual(computed, [0])
+
+        # the last task is already scheduled
+        started.clear()
+        release.clear()
+        future = sc.parallelize(range(10), 1).map(slow).collectAsync()
+        self.assertTrue(started.wait(5))
+        self.assertFalse(future.cancel())
+        release.set()
+        self.assertEqual(future.result(5), list(range(10)))
+        self.assertFalse(future.cancel())
+        self.assertFalse(future.cancelled())
+
+    def test_status_tracker(self):
+        sc = fast_pyspark_tester.Context()
+        rdd = sc.parallelize(range(10), 2).cache()
+        self.assertEqual(rdd.collect(), list(range(10)))
+        self.assertEqual(len(rdd.map(lambda x: (x % 3, x)).reduceByKey(lambda a, b: a + b).collect()), 3)
+
+        tracker = sc.statusTracker()
+        collect_stage, map_stage, reduce_stage = [tracker.getStageInfo(i) for i in tracker.getStageIds()]
+        self.assertEqual((collect_stage.numTasks, collect_stage.numCompletedTasks), (2, 2))
+        self.assertEqual((collect_stage.recordsIn, collect_stage.recordsOut), (10, 10))
+        self.assertEqual((collect_stage.cacheHits, collect_stage.cacheMisses), (0, 2))
+        self.assertEqual((map_stage.recordsIn, map_stage.cacheHits), (10, 2))
+        self.assertEqual(map_stage.jobId, reduce_stage.jobId)
+        self.assertEqual(reduce_stage.recordsOut, 3)
+        self.assertGreaterEqual(reduce_stage.maxTaskWallTime, reduce_stage.medianTaskWallTime)
+        self.assertIsNone(reduce_stage.bytesIn)
+
+        tasks = tracker.getTaskMetrics(collect_stage.stageId)
+        self.assertEqual([(t.partition_id, t.attempt, t.records_in) for t in tasks], [(0, 1, 5), (1, 1, 5)])
+        exported = json.loads(tracker.toJSON())
+        self.assertEqual([s['stageId'] for s in exported['stages']], tracker.getStageIds())
+        self.assertEqual(exported['stages'][0]['tasks'][1]['partition_id'], 1)
+
+        # only the successful attempt of a retried task counts
+        failed = []
+
+        def fail_once(index, elements):
+            elements = list(elements)
+            if index == 0 and not failed:
+                failed.append(index)
+                raise ValueError('first attempt fails')
+            return elements
+
+        self.assertEqual(rdd.mapPartitionsWithIndex(fail_once).collect(), list(range(10)))
+        retried_stage = tracker.getStageInfo(tracker.getStageIds()[-1])
+        self.assertEqual((retried_stage.recordsIn, retried_stage.recordsOut), (10, 10))
+        self.assertEqual((retried_stage.cacheHits, retried_stage.cacheMisses), (2, 0))
+        tasks = tracker.getTaskMetrics(retried_stage.stageId)
+        self.assertEqual([(t.attempt, t.records_in) for t in tasks], [(2, 5), (1, 5)])
+
+    def test_dump_trace(self):
+        sc = fast_pyspark_tester.Context()
+        sc.parallelize(range(10), 2).map(lambda x: (x % 3, x)).groupByKey().collect()
+
+        with tempfile.TemporaryDirectory() as tmp:
+            sc.dump_trace(os.path.join(tmp, 'trace.json'))
+            with open(os.path.join(tmp, 'trace.json')) as f:
+                events = json.load(f)['traceEvents']
+
+        jobs = [e for e in events if e.get('cat') == 'job']
+        tasks = [e for e in events if e.get('cat') == 'task']
+        self.assertEqual(len(jobs), 1)
+        self.assertEqual(len(tasks), 4)
+        for task in tasks:
+            self.assertEqual((task['ph'], task['pid'], task['tid']), ('X', jobs[0]['pid'], jobs[0]['tid']))
+            self.assertGreaterEqual(task['ts'], jobs[0]['ts'])
+            self.assertLessEqual(task['ts'] + task['dur'], jobs[0]['ts'] + jobs[0]['dur'])
+        self.assertIn({'name': 'process_name', 'ph': 'M', 'pid': os.getpid(), 'args': {'name': 'driver'}}, events)
+
+    def test_profile(self):
+        sc = fast_pyspark_tester.Context(profile=True)
+        squares = sc.parallelize(range(10), 2).map(square)
+        self.assertEqual(squares.sum(), 285)
+
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            sc.show_profiles()
+        self.assertIn('Profile of RDD<id={0}>'.format(squares.id()), output.getvalue())
+        self.assertIn('function calls', output.getvalue())
+
+        with tempfile.TemporaryDirectory() as tmp:
+            sc.dump_profiles(tmp)
+            self.assertEqual(os.listdir(tmp), ['rdd_{0}.pstats'.format(squares.id())])
+            stats = pstats.Stats(os.path.join(tmp, 'rdd_{0}.pstats'.format(squares.id())))
+        self.assertEqual([v[0] for k, v in stats.stats.items() if k[2] == 'square'], [10])
+
+        self.assertEqual(fast_pyspark_tester.Context().parallelize(range(10), 2).map(square).sum(), 285)
+        self.assertEqual(fast_pyspark_tester.Context()._profiles, {})
+
     def test_parallelize_single_element(self):
         my_rdd = fast_pyspark_tester.Context().parallelize([7], 100)
         self.assertEqual(my_rdd.collect(), [7])
@@ -39,6 +206,19 @@ class Context(unittest.TestCase):
         my_rdd = fast_pyspark_tester.Context().parallelize([1, 2, 3, 4, 5], 5)
         self.assertEqual(my_rdd.collect(), [1, 2, 3, 4, 5])
 
+    def test_parallelize_slices_lazily(self):
+        sc = fast_pyspark_tester.Context()
+        huge = sc.parallelize(range(10 ** 12), 4)
+        self.assertEqual(huge.count(), 10 ** 12)
+        self.assertEqual(huge.take(2), [0, 1])
+        self.assertLess(len(pickle.dumps(huge.partitions()[3])), 200)
+
+        data = list(range(10))
+        rdd = sc.parallelize(data, 3)
+        self.assertIs(rdd.partitions()[0]._data, data)
+        self.assertEqual(rdd.glom().collect(), [[0, 1, 2], [3, 4, 5], [6, 7, 8, 9]])
+        self.assertEqual(sc.parallelize((x for x in data), 3).map(lambda x: x * 2).sum(), 90)
+
     def test_parallelize_empty_partitions_at_end(self):
         my_rdd = fast_pyspark_tester.Context().parallelize(range(3529), 500)
         print(my_rdd.getNumPartitions())
@@ -1,5 +1,7 @@
 from __future__ import division, print_function
 
+import array
+import collections
 import logging
 import math
 import multiprocessing
@@ -8,6 +10,9 @@ import pickle
 import platform
 import pprint
 import random
+import subprocess
+import sys
+import threading
 import time
 import timeit
 import unittest
@@ -16,6 +21,19 @@ from concurrent import futures
 import cloudpickle
 
 import fast_pyspark_tester
+from fast_pyspark_tester import Row, serializers
+
+Point = collections.namedtuple('Point', ['x', 'y'])
+
+
+def shared_memory_readers():
+    """how often data and task results in shared memory can be read"""
+    data = [array.array('b', bytes(serializers.MIN_OUT_OF_BAND_SIZE))]
+    payload = serializers.dumps_shared(data)
+    reads = sum(serializers.loads_shared(payload) == data for _ in range(2))
+    with serializers.writing_task_result():
+        result = serializers.dumps_shared(data)
+    return reads, result.unlink_by_reader
 
 
 class Processor(object):
@@ -99,6 +117,86 @@ class ThreadPool(unittest.TestCase, LazyTestInjection):
         r = self.sc.parallelize([1, 3, 4]).map(math.sqrt).collect()
         self.assertIn(2, r)
 
+    def test_concurrent_jobs(self):
+        sc = fast_pyspark_tester.Context(pool=self.pool, workers=2, scheduler_mode='FAIR')
+        acc = sc.accumulator(0)
+        pairs = sc.parallelize(range(100), 10).map(lambda x: (x % 3, x)).cache()
+        sums = pairs.reduceByKey(lambda a, b: a + b)
+
+        def job(i):
+            pairs.foreach(lambda _: acc.add(1))
+            return sorted(sums.collect()), pairs.map(lambda kv: kv[1] * i).sum()
+
+        with futures.ThreadPoolExecutor(4) as submitters:
+            results = list(submitters.map(job, range(8)))
+
+        expected = sorted((k, sum(x for x in range(100) if x % 3 == k)) for k in range(3))
+        self.assertEqual(results, [(expected, 4950 * i) for i in range(8)])
+        self.assertEqual(acc.value, 800)
+        self.assertEqual(len(sc._cache_manager.stored_idents()), 10)
+
+    def test_speculation(self):
+        sc = fast_pyspark_tester.Context(pool=self.pool, workers=4, speculation=True)
+        release = threading.Event()
+        attempts = collections.Counter()
+
+        def straggle_once(x):
+            attempts[x] += 1
+            if x == 7 and attempts[x] == 1:
+                release.wait(10)
+            return x
+
+        try:
+            self.assertEqual(sc.parallelize(range(8), 8).map(straggle_once).collect(), list(range(8)))
+        finally:
+            release.set()
+        self.assertEqual(sc._stats['speculative_tasks'], 1)
+        self.assertEqual(sc._stats['speculative_wins'], 1)
+
+    def test_task_timeout(self):
+        sc = fast_pyspark_tester.Context(pool=self.pool, workers=4, task_timeout=0.1, max_retries=2)
+        release = threading.Event()
+        attempts = collections.Counter()
+
+        def hang(x, times):
+            attempts[x] += 1
+            if attempts[x] <= times:
+                release.wait(10)
+            return x
+
+        try:
+            self.assertEqual(sc.parallelize(range(4), 4).map(lambda x: hang(x, x == 0)).collect(), list(range(4)))
+            self.assertEqual(sc._stats['task_timeouts'], 1)
+
+            attempts.clear()
+            self.assertRaises(futures.TimeoutError, sc.parallelize(range(2), 2).map(lambda x: hang(x, 2)).collect)
+        finally:
+            release.set()
+
+    def test_late_attempt_keeps_shuffle_output(self):
+        sc = fast_pyspark_tester.Context(pool=self.pool, workers=4, task_timeout=0.3)
+        release, slow_done = threading.Event(), threading.Event()
+        attempts = collections.Counter()
+
+        def produce(index, elements):
+            attempts[index] += 1
+            if index == 0 and attempts[index] == 1:
+                # the abandoned first attempt finishes late with a larger output
+                release.wait(10)
+                slow_done.set()
+                return [(x, 'late' * 100) for x in elements]
+            return [(x, 'v') for x in elements]
+
+        pairs = sc.parallelize(range(8), 2).mapPartitionsWithIndex(produce).partitionBy(2)
+        try:
+            expected = sorted((x, 'v') for x in range(8))
+            self.assertEqual(sorted(pairs.collect()), expected)
+        finally:
+            release.set()
+        self.assertTrue(slow_done.wait(10))
+        time.sleep(0.1)  # let the late attempt write its map output
+        self.assertEqual(sorted(pairs.collect()), expected)
+
 
 class ProcessPool(unittest.TestCase):  # cannot work here: LazyTestInjection):
     def setUp(self):
@@ -121,6 +219,36 @@ class ProcessPool(unittest.TestCase):  # cannot work here: LazyTestInjection):
         r = self.sc.parallelize([1, 3, 4, 9, 15, 25, 50, 75, 100], 3).zipWithIndex().collect()
         self.assertIn((4, 2), r)
 
+    def test_shuffle(self):
+        r = self.sc.parallelize([('a', 1), ('b', 2), ('a', 3), ('c', 4)], 3)
+        self.assertEqual(sorted(r.groupByKey(2).collect()), [('a', [1, 3]), ('b', [2]), ('c', [4])])
+        self.assertEqual(sorted(r.reduceByKey(lambda a, b: a + b).collect()), [('a', 4), ('b', 2), ('c', 4)])
+        self.assertEqual(r.repartition(2).glom().collect(), [[('a', 1), ('b', 2)], [('a', 3), ('c', 4)]])
+
+    def test_broadcast(self):
+        b = self.sc.broadcast({i: str(i) for i in range(10000)})
+        self.assertLess(len(cloudpickle.dumps(lambda x: b.value[x])), 1000)
+        r = self.sc.parallelize(range(0, 10000, 1000), 4).map(lambda x: b.value[x])
+        self.assertEqual(r.collect(), [str(i) for i in range(0, 10000, 1000)])
+
+    def test_accumulators(self):
+        bad_records = self.sc.accumulator(0)
+        total = self.sc.accumulator(0.0)
+
+        def check(x):
+            if x % 7 == 0:
+                bad_records.add(1)
+            total.add(x)
+            return x
+
+        r = self.sc.parallelize(range(100), 8).map(check)
+        self.assertEqual(r.count(), 100)
+        self.assertEqual(bad_records.value, 15)
+        self.assertEqual(total.value, 4950.0)
+
+        r.foreach(lambda x: bad_records.add(1))
+        self.assertEqual(bad_records.value, 130)
+
     def test_cache(self):
         r = self.sc.parallelize(range(3), 3)
 
@@ -142,6 +270,196 @@ class ProcessPool(unittest.TestCase):  # cannot work here: LazyTestInjection):
             self.assertLess(end - start, 0.5)
 
 
+class ProcessExecutor(unittest.TestCase):
+    def setUp(self):
+        self.sc = fast_pyspark_tester.Context(executor='processes', workers=2)
+
+    def tearDown(self):
+        self.sc.stop()
+
+    def test_basic(self):
+        r = self.sc.parallelize([1, 3, 4]).map(math.sqrt).collect()
+        self.assertIn(2, r)
+        self.assertEqual(os.listdir(self.sc._job_dir), [])
+
+    def test_jobs_loaded_once_per_worker(self):
+        lookup = list(range(100000))
+        r = self.sc.parallelize(range(200), 100).map(lambda x: lookup[x] + os.getpid())
+        self.assertEqual(len(r.collect()), 200)
+
+        # the workers reuse the job they loaded and reset its accumulators
+        counter = self.sc.accumulator(0)
+        self.sc.parallelize(range(200), 100).foreach(lambda x: counter.add(1))
+        self.sc.parallelize(range(200), 100).foreach(lambda x: counter.add(1))
+        self.assertEqual(counter.value, 400)
+
+    @unittest.skipIf(serializers.shared_memory is None, 'needs Python 3.8')
+    def test_shared_memory_serializer(self):
+        sc = fast_pyspark_tester.Context(
+            executor='processes',
+            workers=2,
+            data_serializer=serializers.dumps_shared,
+            data_deserializer=serializers.loads_shared,
+        )
+        large = serializers.MIN_OUT_OF_BAND_SIZE
+        data = [os.urandom(large), bytearray(large), array.array('b', bytes(large)), b'small', 1]
+        self.assertIsInstance(serializers.dumps_shared(data), serializers.SharedMemoryPayload)
+        self.assertIsInstance(serializers.dumps_shared(data[3:]), bytes)
+        for value in data[:3]:
+            payload = serializers.dumps_shared([value, value[:1]])
+            self.assertIsInstance(payload, serializers.SharedMemoryPayload)
+            self.assertLess(len(payload.data), 200)
+            loaded = serializers.loads_shared(payload)
+            self.assertEqual(loaded, [value, value[:1]])
+            self.assertEqual([type(x) for x in loaded], [type(value)] * 2)
+
+        try:
+            self.assertEqual(sc.parallelize(data, 2).collect(), data)
+            self.assertEqual(sc.parallelize(data[:4], 2).map(len).sum(), 3 * large + 5)
+        finally:
+            sc.stop()
+
+    @unittest.skipIf(serializers.shared_memory is None, 'needs Python 3.8')
+    def test_shared_memory_writer_role(self):
+        self.assertEqual(shared_memory_readers(), (2, True))
+
+        # also when the driver runs in a child process
+        with futures.ProcessPoolExecutor(1) as pool:
+            self.assertEqual(pool.submit(shared_memory_readers).result(), (2, True))
+
+    def test_named_data_serializers(self):
+        data = [1, 2.5, 'a', b'b', (1, 'c'), [None, True], {'d': (2,)}, {3}, 4 + 1j, Row(a=1), Point(2, 3), Processor()]
+        partition = fast_pyspark_tester.partition.Partition(data[:-1], 3)
+        for name in serializers._serializers:
+            serializer = serializers.get_serializer(name)
+            loaded = serializer.loads(serializer.dumps(partition))
+            self.assertEqual((loaded.index, loaded.x()), (3, data[:-1]), name)
+            self.assertEqual([type(x) for x in loaded.x()], [type(x) for x in data[:-1]], name)
+
+            sc = fast_pyspark_tester.Context(executor='processes', workers=2, data_serializer=name)
+            try:
+                self.assertEqual(sc.parallelize(data[:-1], 3).collect(), data[:-1], name)
+                self.assertEqual(sc.parallelize(data[-3:-1], 2).map(lambda r: r[0]).collect(), [1, 2], name)
+                self.assertEqual(sc.parallelize([Row(a=1)] * 4, 2).map(lambda r: r.a).sum(), 4, name)
+                self.assertEqual(len(sc.parallelize(data, 3).map(lambda x: (x, x)).collect()), len(data), name)
+            finally:
+                sc.stop()
+
+        self.assertRaises(ValueError, fast_pyspark_tester.Context, data_serializer='unknown')
+
+    def test_import_without_shared_memory(self):
+        code = (
+            'import sys; sys.modules["multiprocessing.shared_memory"] = None; '
+            'from fast_pyspark_tester import serializers; '
+            'print(sorted(serializers._serializers))'
+        )
+        output = subprocess.check_output([sys.executable, '-c', code], env=os.environ)
+        self.assertNotIn(b'shared_memory', output)
+        self.assertIn(b'pickle', output)
+
+    def test_auto_data_serializer_keeps_types(self):
+        rows = [Row(a=i) for i in range(200)]
+        points = [Point(i, i) for i in range(200)]
+
+        def as_tuples(partition):
+            return pickle.dumps((partition.index, [tuple(x) for x in partition.x()]))
+
+        def from_tuples(data):
+            index, elements = pickle.loads(data)
+            return fast_pyspark_tester.partition.Partition(elements, index)
+
+        serializers.register_serializer('as_tuples', as_tuples, from_tuples)
+        try:
+            for sample in (rows[:100], points[:100]):
+                serializer, timings = serializers.select_serializer(sample)
+                self.assertNotIn('as_tuples', timings)
+                self.assertNotEqual(serializer.name, 'as_tuples')
+        finally:
+            del serializers._serializers['as_tuples']
+
+        sc = fast_pyspark_tester.Context(executor='processes', workers=2, data_serializer='auto')
+        try:
+            self.assertEqual(sc.parallelize(rows, 4).map(lambda r: r.a).sum(), 19900)
+            self.assertEqual(sc.parallelize(points, 4).map(lambda p: p.y).sum(), 19900)
+        finally:
+            sc.stop()
+
+    def test_data_serializers_keep_slices_lazy(self):
+        partitions = self.sc.parallelize(range(10 ** 12), 4).partitions()
+        self.assertEqual(serializers.sample_elements(partitions), list(range(100)))
+        for name in serializers._serializers:
+            serializer = serializers.get_serializer(name)
+            data = serializer.dumps(partitions[3])
+            self.assertLess(len(data) if isinstance(data, bytes) else len(data.data), 300, name)
+            self.assertEqual(serializer.loads(data).x()[:2], range(750000000000, 750000000002), name)
+
+        class RecordingList(list):
+            def __getitem__(self, key):
+                slices.append(key)
+                return list.__getitem__(self, key)
+
+        slices = []
+        partitions = self.sc.parallelize(RecordingList(range(1000)), 2).partitions()
+        self.assertEqual(serializers.sample_elements(partitions, 10), list(range(10)))
+        self.assertEqual(slices, [slice(0, 10)])
+
+    def test_auto_data_serializer(self):
+        sc = fast_pyspark_tester.Context(executor='processes', workers=2, data_serializer='auto')
+        try:
+            self.assertEqual(sc.parallelize(range(1000), 4).map(lambda x: (x, str(x))).count(), 1000)
+            self.assertEqual(sc.parallelize([Processor()] * 4, 2).map(lambda p: p.executed).count(), 4)
+        finally:
+            sc.stop()
+        self.assertGreater(sc._stats['driver_select_data_serializer'], 0)
+        self.assertEqual(sum(v for k, v in sc._stats.items() if k.startswith('data_serializer_')), 2)
+        self.assertGreater(sc._stats['map_serialize_result'], 0)
+
+    def test_task_metrics(self):
+        sc = fast_pyspark_tester.Context(executor='processes', workers=2, data_serializer='pickle')
+        try:
+            self.assertEqual(sc.parallelize(range(100), 4).map(lambda x: x * 2).collect(), list(range(0, 200, 2)))
+        finally:
+            sc.stop()
+
+        tracker = sc.statusTracker()
+        tasks = tracker.getTaskMetrics(tracker.getStageIds()[-1])
+        self.assertEqual(sorted(t.partition_id for t in tasks), [0, 1, 2, 3])
+        self.assertNotIn(os.getpid(), {t.pid for t in tasks})
+        self.assertTrue(all(t.bytes_in > 0 and t.bytes_out > 0 and t.records_out == 25 for t in tasks))
+        self.assertEqual(tracker.getStageInfo(tracker.getStageIds()[-1]).recordsIn, 100)
+
+    def test_dump_trace(self):
+        self.assertEqual(self.sc.parallelize(range(100), 4).map(lambda x: x * 2).sum(), 9900)
+        events = self.sc.statusTracker().traceEvents()
+
+        worker_pids = {e['pid'] for e in events if e.get('cat') == 'task'}
+        self.assertNotIn(os.getpid(), worker_pids)
+        self.assertEqual(
+            collections.Counter(e['name'] for e in events if e.get('cat') == 'serialization'),
+            {'deserialize job': 4, 'deserialize data': 4, 'deserialize task context': 4, 'serialize result': 4},
+        )
+        self.assertEqual(len([e for e in events if e.get('cat') == 'driver']), 8)
+        self.assertEqual({e['pid'] for e in events if e['ph'] == 'M'}, worker_pids | {os.getpid()})
+
+    def test_profile(self):
+        sc = fast_pyspark_tester.Context(executor='processes', workers=2, profile=True)
+        try:
+            pairs = sc.parallelize(range(100), 4).map(lambda x: (x % 2, square_op(x)))
+            self.assertEqual(sorted(pairs.reduceByKey(lambda a, b: a + b).collect()), [(0, 161700), (1, 166650)])
+        finally:
+            sc.stop()
+
+        # one profile for the map stage and one for the result stage
+        self.assertEqual(len(sc._profiles), 2)
+        calls = [v[0] for p in sc._profiles.values() for k, v in p.stats.items() if k[2] == 'square_op']
+        self.assertEqual(calls, [100])
+
+    def test_pool_and_executor(self):
+        pool = fast_pyspark_tester.context.DummyPool()
+        self.assertRaises(ValueError, fast_pyspark_tester.Context, pool=pool, executor='processes')
+        self.assertRaises(ValueError, fast_pyspark_tester.Context, executor='gpus')
+
+
 class ProcessPoolIdlePerformance(unittest.TestCase):
     """Idle performance tests.
 
@@ -1,5 +1,7 @@
+import gc
+import random
 import unittest
-from operator import add
+from operator import add, itemgetter
 
 from fast_pyspark_tester import Context
 
@@ -249,6 +251,166 @@ class RDDTest(unittest.TestCase):
         for k, v in expected_group:
             self.assertEqual(grouped_dict[k], v)
 
+    def test_combineByKey_combines_within_partitions(self):
+        merged_combiners = []
+
+        def merge_combiners(c1, c2):
+            merged_combiners.append((c1, c2))
+            return c1 + c2
+
+        rdd = self.context.parallelize([('a', 1), ('a', 2), ('b', 3), ('a', 4), ('b', 5), ('a', 6)], 2)
+        result = rdd.combineByKey(lambda v: v, add, merge_combiners).collectAsMap()
+
+        self.assertEqual(result, {'a': 13, 'b': 8})
+        # one combiner per key and per partition reached the merge step
+        self.assertCountEqual(merged_combiners, [(3, 10), (3, 5)])
+
+    def test_aggregateByKey_applies_zero_value_once_per_partition(self):
+        rdd = self.context.parallelize([('a', 1), ('a', 2), ('a', 3), ('b', 4)], 2)
+        result = rdd.aggregateByKey(10, add, add, numPartitions=3)
+
+        self.assertEqual(result.getNumPartitions(), 3)
+        self.assertEqual(result.collectAsMap(), {'a': 26, 'b': 14})
+
+    def test_foldByKey_and_reduceByKeyLocally(self):
+        rdd = self.context.parallelize([('a', 1), ('b', 2), ('a', 3), ('b', 4), ('c', 5)], 3)
+
+        self.assertEqual(rdd.foldByKey(0, add).collectAsMap(), {'a': 4, 'b': 6, 'c': 5})
+        self.assertEqual(rdd.reduceByKeyLocally(add), {'a': 4, 'b': 6, 'c': 5})
+
+    def test_partitionBy_buckets_keys_within_tasks(self):
+        rdd = self.context.parallelize([(1, 'a'), (2, 'b'), (3, 'c'), (4, 'd'), (5, 'e')], 2)
+        partitioned = rdd.partitionBy(3, lambda k: k * 2)
+
+        self.assertEqual(partitioned.getNumPartitions(), 3)
+        self.assertListEqual(
+            partitioned.glom().collect(), [[(3, 'c')], [(2, 'b'), (5, 'e')], [(1, 'a'), (4, 'd')]],
+        )
+
+    def test_shuffled_operations(self):
+        rdd = self.context.parallelize([('a', 1), ('b', 2), ('a', 3), ('c', 4)], 3)
+        other = self.context.parallelize([('a', 5), ('d', 6)], 2)
+
+        self.assertEqual(sorted(rdd.groupByKey(2).collect()), [('a', [1, 3]), ('b', [2]), ('c', [4])])
+        self.assertEqual(
+            sorted(rdd.cogroup(other).collect()),
+            [('a', [[1, 3], [5]]), ('b', [[2], []]), ('c', [[4], []]), ('d', [[], [6]])],
+        )
+        self.assertEqual(sorted(rdd.keys().distinct(2).collect()), ['a', 'b', 'c'])
+        self.assertEqual(sorted(rdd.keys().intersection(other.keys()).collect()), ['a'])
+        self.assertEqual(rdd.union(other).getNumPartitions(), 5)
+        self.assertEqual(rdd.repartition(2).glom().collect(), [[('a', 1), ('b', 2)], [('a', 3), ('c', 4)]])
+
+    def test_combineByKey_does_not_modify_shuffle_output(self):
+        rdd = self.context.parallelize([('a', 1), ('a', 2), ('a', 3)], 2).groupByKey(1)
+
+        self.assertEqual(rdd.collect(), [('a', [1, 2, 3])])
+        self.assertEqual(rdd.collect(), [('a', [1, 2, 3])])
+
+        def merge_value(c, v):
+            c['values'].append(v)
+            return c
+
+        def merge_combiners(c1, c2):
+            c1['values'].extend(c2['values'])
+            return c1
+
+        pairs = self.context.parallelize([('a', 1), ('a', 2), ('a', 3), ('a', 4)], 2)
+        nested = pairs.combineByKey(lambda v: {'values': [v]}, merge_value, merge_combiners, 1)
+        self.assertEqual(nested.collect(), [('a', {'values': [1, 2, 3, 4]})])
+        self.assertEqual(nested.collect(), [('a', {'values': [1, 2, 3, 4]})])
+
+    def test_shuffle_output_is_removed_with_the_rdd(self):
+        # noinspection PyProtectedMember
+        shuffle_manager = self.context._shuffle_manager
+        rdd = self.context.parallelize([(1, 1), (2, 2)], 2).partitionBy(2)
+        self.assertEqual(shuffle_manager.buckets, {})
+        rdd.count()
+        self.assertEqual(len(shuffle_manager.buckets), 2)
+
+        del rdd
+        gc.collect()
+        self.assertEqual(shuffle_manager.buckets, {})
+
+    def test_map_stages_run_before_the_result_stage(self):
+        def stage_ids(rdd):
+            return self.context.runJob(rdd, lambda tc, x: tc.stageId(), resultHandler=set)
+
+        left = self.context.parallelize([(1, 'a'), (2, 'b')], 2).partitionBy(2)
+        right = self.context.parallelize([(1, 'c')], 1).partitionBy(2)
+        # noinspection PyProtectedMember
+        shuffle_manager = self.context._shuffle_manager
+        self.assertEqual(shuffle_manager.buckets, {})
+
+        first_stage_ids = stage_ids(left.join(right))
+        self.assertEqual(len(first_stage_ids), 1)
+        self.assertEqual(len(shuffle_manager.buckets), 3)
+
+        # the map output is reused, only a new result stage runs
+        second_stage_ids = stage_ids(left.union(right))
+        self.assertEqual(len(second_stage_ids), 1)
+        self.assertGreater(min(second_stage_ids), max(first_stage_ids))
+        self.assertEqual(sorted(left.join(right).collect()), [(1, ('a', 'c'))])
+
+    def test_join_keeps_duplicate_keys(self):
+        x = self.context.parallelize([('a', 1), ('a', 2), ('b', 3)], 2)
+        y = self.context.parallelize([('a', 4), ('a', 5), ('c', 6)], 3)
+
+        self.assertEqual(sorted(x.join(y).collect()), [('a', (1, 4)), ('a', (1, 5)), ('a', (2, 4)), ('a', (2, 5))])
+
+    def test_outer_joins_build_from_either_side(self):
+        small = self.context.parallelize([('a', 1), ('c', 2)])
+        large = self.context.parallelize([('a', 3), ('b', 4), ('b', 5), ('d', 6)])
+        expected = [('a', (1, 3)), ('b', (None, 4)), ('b', (None, 5)), ('c', (2, None)), ('d', (None, 6))]
+
+        self.assertEqual(sorted(small.fullOuterJoin(large).collect(), key=str), expected)
+        self.assertEqual(
+            sorted(large.fullOuterJoin(small).collect(), key=str), [(k, (v[1], v[0])) for k, v in expected],
+        )
+        self.assertEqual(sorted(small.leftOuterJoin(large).collect()), [('a', (1, 3)), ('c', (2, None))])
+        self.assertEqual(sorted(large.rightOuterJoin(small).collect()), [('a', (3, 1)), ('c', (None, 2))])
+
+    def test_semi_and_anti_joins(self):
+        x = self.context.parallelize([('a', 1), ('b', 2), ('a', 3)], 2)
+        y = self.context.parallelize([('a', None), ('c', 4)], 2)
+
+        self.assertEqual(sorted(x._leftSemiJoin(y).collect()), [('a', (1, ())), ('a', (3, ()))])
+        self.assertEqual(x._leftAntiJoin(y).collect(), [('b', (2, None))])
+        self.assertEqual(x.subtractByKey(y).collect(), [('b', 2)])
+
+    def test_sortBy_partitions_by_range(self):
+        values = list(range(1000))
+        random.Random(42).shuffle(values)
+        rdd = self.context.parallelize(values, 4)
+
+        ascending = rdd.sortBy(lambda x: x, numPartitions=5)
+        partitions = ascending.glom().collect()
+        self.assertEqual(len(partitions), 5)
+        self.assertTrue(all(partition for partition in partitions))
+        self.assertListEqual([x for partition in partitions for x in partition], sorted(values))
+
+        self.assertListEqual(rdd.sortBy(lambda x: x, ascending=False).collect(), sorted(values, reverse=True))
+
+    def test_sortBy_is_stable(self):
+        pairs = [(i % 3, i) for i in range(30)]
+        rdd = self.context.parallelize(pairs, 3)
+
+        self.assertListEqual(rdd.sortByKey(numPartitions=2).collect(), sorted(pairs, key=lambda p: p[0]))
+        self.assertListEqual(
+            rdd.sortByKey(ascending=False).collect(), sorted(pairs, key=lambda p: p[0], reverse=True),
+        )
+        self.assertListEqual(self.context.parallelize([], 2).sortBy(lambda x: x).collect(), [])
+
+    def test_takeOrdered_and_top_keep_bounded_heaps(self):
+        pairs = [(random.randint(0, 20), i) for i in range(500)]
+        rdd = self.context.parallelize(pairs, 7)
+
+        self.assertListEqual(rdd.takeOrdered(15, key=itemgetter(0)), sorted(pairs, key=itemgetter(0))[:15])
+        self.assertListEqual(rdd.top(15, key=itemgetter(0)), sorted(pairs, key=itemgetter(0), reverse=True)[:15])
+        self.assertListEqual(rdd.top(3), sorted(pairs, reverse=True)[:3])
+        self.assertListEqual(rdd.takeOrdered(0), [])
+        self.assertListEqual(self.context.parallelize([3, 1, 2], 5).takeOrdered(10), [1, 2, 3])
+
 
 if __name__ == '__main__':
     unittest.main()
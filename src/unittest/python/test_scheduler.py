@@ -0,0 +1,67 @@
+import threading
+import time
+import unittest
+from concurrent import futures
+
+from fast_pyspark_tester.scheduler import TaskScheduler, TaskSetManager
+
+
+class TaskSchedulerTest(unittest.TestCase):
+    def run_waiting_batches(self, mode):
+        """order of two jobs waiting for a pool with one slot"""
+        scheduler = TaskScheduler(1, mode)
+        order = []
+
+        def run_batch(job_id, name):
+            with scheduler.batch(job_id, 1):
+                order.append(name)
+
+        with scheduler.job() as first, scheduler.job() as second:
+            with scheduler.batch(first, 1):
+                threads = [
+                    threading.Thread(target=run_batch, args=(first, 'first')),
+                    threading.Thread(target=run_batch, args=(second, 'second')),
+                ]
+                for thread in threads:
+                    thread.start()
+                while len(scheduler._waiting) < 2:
+                    time.sleep(0.001)
+            for thread in threads:
+                thread.join()
+        return order
+
+    def test_fifo(self):
+        self.assertEqual(self.run_waiting_batches('FIFO'), ['first', 'second'])
+
+    def test_fair(self):
+        self.assertEqual(self.run_waiting_batches('FAIR'), ['second', 'first'])
+
+    def test_unknown_mode(self):
+        self.assertRaises(ValueError, TaskScheduler, 1, 'RANDOM')
+
+
+class TaskSetManagerTest(unittest.TestCase):
+    def test_failure_cancels_pending_attempts(self):
+        started = []
+
+        def fail_first(i):
+            started.append(i)
+            if i == 0:
+                raise ValueError('first task fails')
+            return i
+
+        with futures.ThreadPoolExecutor(1) as pool:
+            task_set = TaskSetManager(pool, 1, task_timeout=10)
+            self.assertRaises(ValueError, task_set.run, fail_first, list(range(20)))
+        self.assertLess(len(started), 20)
+
+    def test_queued_attempts_do_not_time_out(self):
+        # a process pool marks a call as running while it waits for a worker
+        with futures.ProcessPoolExecutor(1) as pool:
+            task_set = TaskSetManager(pool, 1, task_timeout=0.5, max_retries=1)
+            self.assertEqual(task_set.run(time.sleep, [0.3] * 4), [None] * 4)
+        self.assertEqual(task_set.stats['task_timeouts'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()